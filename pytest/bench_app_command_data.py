@@ -0,0 +1,37 @@
+"""
+Time write_json_files on a synthetic system with different numbers of jobs.
+
+Run with `python bench_app_command_data.py`. The command data of every
+app is built with make_app_command_data, then written out with both
+JSON output formats. Outside of a DUNE-DAQ environment the moo types
+are the stand-ins of offline_env.py, whose pod() is much cheaper than
+moo's, so the speedup measured here is a lower bound.
+"""
+
+import offline_env
+offline_env.install()
+
+import os
+import tempfile
+import time
+
+from daqconf.core.conf_utils import make_system_connections, make_app_command_data, write_json_files
+from synthetic_system import make_synthetic_system
+
+
+def bench_app_command_data(n_ru=200, n_streams=10):
+    system = make_synthetic_system(n_ru=n_ru, n_streams=n_streams)
+    make_system_connections(system, use_connectivity_service=False)
+    app_command_datas = {name: make_app_command_data(system, app, name) for name, app in system.apps.items()}
+    print(f"{len(system.apps)} apps, {os.cpu_count()} CPUs")
+    print(f"{'jobs':>6} {'format':>10} {'time [s]':>10}")
+    for jobs in (1, 2, 4, 8):
+        for output_format in ("indented", "compact"):
+            with tempfile.TemporaryDirectory() as json_dir:
+                start = time.perf_counter()
+                write_json_files(app_command_datas, {}, json_dir, output_format=output_format, jobs=jobs)
+                print(f"{jobs:>6} {output_format:>10} {time.perf_counter() - start:>10.4f}")
+
+
+if __name__ == "__main__":
+    bench_app_command_data()
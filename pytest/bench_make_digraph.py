@@ -0,0 +1,38 @@
+"""
+Scaling benchmark for `System.make_digraph`.
+
+Run with `python bench_make_digraph.py`. The app graph is built with a
+hash join on the endpoints' external names, so the time should grow
+roughly linearly with the number of endpoints (plus the number of
+edges, which networkx has to insert anyway).
+"""
+
+import offline_env
+offline_env.install()
+
+import time
+
+from synthetic_system import make_synthetic_system
+
+
+def time_make_digraph(n_ru, n_streams=10, repeat=3, for_toposort=False):
+    system = make_synthetic_system(n_ru=n_ru, n_streams=n_streams)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        deps = system.make_digraph(for_toposort=for_toposort)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    n_endpoints = sum(len(app.modulegraph.endpoints) for app in system.apps.values())
+    return best, n_endpoints, deps.number_of_edges()
+
+
+def bench_make_digraph():
+    print(f"{'RUs':>6} {'endpoints':>10} {'edges':>8} {'time [s]':>10} {'us/endpoint':>12}")
+    for n_ru in (25, 50, 100, 200, 400):
+        elapsed, n_endpoints, n_edges = time_make_digraph(n_ru)
+        print(f"{n_ru:>6} {n_endpoints:>10} {n_edges:>8} {elapsed:>10.4f} {1e6*elapsed/n_endpoints:>12.2f}")
+
+
+if __name__ == "__main__":
+    bench_make_digraph()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of ModuleGraph construction and lookups.
+
+Run with `python bench_modulegraph.py`. Builds a graph of 5,000 modules
+the way the generators do (add_module, connect_modules, add_endpoint),
+then looks up and reconfigures every module, and finally builds a graph
+from a queue list in which every module feeds one shared queue. All of these go
+through the ModuleGraph lookup tables or the queue membership sets, so
+each step should take time linear in the number of modules.
+"""
+
+import offline_env
+offline_env.install()
+
+import time
+
+from daqconf.core.app import ModuleGraph
+from daqconf.core.conf_utils import Direction, Queue
+
+
+def bench_modulegraph(n_modules=5000):
+    timings = {}
+    mgraph = ModuleGraph()
+
+    start = time.perf_counter()
+    for i in range(n_modules):
+        mgraph.add_module(f"module_{i}", plugin="Plugin")
+    timings["add_module"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(1, n_modules):
+        mgraph.connect_modules(f"module_{i-1}.output", f"module_{i}.input", "Data", size_hint=1000)
+        mgraph.connect_modules(f"module_{i}.merged_output", "module_0.merged_input", "Data", queue_name="merged", size_hint=1000)
+    timings["connect_modules"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n_modules):
+        mgraph.add_endpoint(f"endpoint_{i}", f"module_{i}.external_output", "Data", Direction.OUT)
+    timings["add_endpoint"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n_modules):
+        mgraph.get_module(f"module_{i}")
+    timings["get_module"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n_modules):
+        mgraph.reset_module_conf(f"module_{i}", None)
+    timings["reset_module_conf"] = time.perf_counter() - start
+
+    queues = [Queue(f"module_{i}.fragments", "module_0.fragments_in", "Fragment", "fragment_queue") for i in range(n_modules)]
+    queues += [Queue(f"module_{i}.output", f"module_{i+1}.input", "Data") for i in range(n_modules - 1)]
+    start = time.perf_counter()
+    ModuleGraph(queues=queues)
+    timings["combine_queues"] = time.perf_counter() - start
+
+    print(f"ModuleGraph with {n_modules} modules")
+    for step, elapsed in timings.items():
+        print(f"  {step:<20} {elapsed:8.4f} s")
+    print(f"  {'total':<20} {sum(timings.values()):8.4f} s")
+
+
+if __name__ == "__main__":
+    bench_modulegraph()
@@ -0,0 +1,191 @@
+"""
+Scale benchmark suite for the configuration core.
+
+Run with `python bench_scale.py`. For each scenario, a synthetic system
+(see synthetic_system.py) is built and put through the steps of a
+configuration generation: building the ModuleGraphs, Apps and System,
+the app dependency graph, set_mlt_links, make_system_connections,
+building the command data of every app and writing it out as
+write_json_files does. The best time of each step over a few runs, and its
+peak memory (in a separate run, with tracemalloc), are compared with
+the baselines in scale_baselines.json, and the script exits with 1 if
+any step got slower or bigger than the thresholds allow, and with 2 if
+there are no baselines to compare a scenario with.
+
+Baselines depend on the machine: record them with `--update` before
+making a change, on the machine that will be used to check it. Outside
+of a DUNE-DAQ environment, the moo types are replaced by the stand-ins
+of offline_env.py, which don't validate anything. Baselines record
+which kind of environment they were taken in, and are only compared
+with runs in the same kind.
+"""
+
+import offline_env
+OFFLINE = offline_env.install()
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from daqconf.core.conf_utils import make_system_connections, make_app_command_data, write_apps_json
+from daqconf.core.fragment_producers import set_mlt_links
+from synthetic_system import make_synthetic_system, make_tp_infos
+
+BASELINES_FILE = Path(__file__).parent / "scale_baselines.json"
+
+# n_tpwriters is the pub/sub fan-out: each TP writer subscribes to every TPSet publisher
+SCENARIOS = {
+    "small":     dict(n_ru=10, n_streams=4, tpg=True, n_dataflow=1, n_tpwriters=1),
+    "medium":    dict(n_ru=50, n_streams=10, tpg=True, n_dataflow=2, n_tpwriters=2),
+    "large":     dict(n_ru=200, n_streams=10, tpg=True, n_dataflow=4, n_tpwriters=4),
+    "no_tpg":    dict(n_ru=200, n_streams=10, tpg=False, n_dataflow=2, n_tpwriters=0),
+    "fanout":    dict(n_ru=100, n_streams=10, tpg=True, n_dataflow=2, n_tpwriters=16),
+}
+
+STEPS = ("build_system", "make_digraph", "set_mlt_links", "make_system_connections", "make_app_command_data", "write_json_files")
+
+# Differences smaller than these are noise, whatever the ratio
+MIN_TIME_DIFFERENCE = 0.005
+MIN_MEMORY_DIFFERENCE = 256 * 1024
+
+
+def run_steps(scenario, json_dir, measure):
+    """Run every step of `scenario`, each wrapped in measure(step name, function), and return what measure returned, as {step: result}"""
+    results = {}
+    state = {}
+
+    def build_system():
+        state["system"] = make_synthetic_system(**scenario)
+
+    def make_digraph():
+        state["system"].make_digraph()
+
+    def mlt_links():
+        set_mlt_links(state["system"], make_tp_infos(scenario["n_ru"], scenario["n_streams"], scenario["tpg"]))
+
+    def system_connections():
+        make_system_connections(state["system"], use_connectivity_service=False)
+
+    def app_command_data():
+        system = state["system"]
+        state["command_data"] = {name: make_app_command_data(system, app, name) for name, app in system.apps.items()}
+
+    def json_files():
+        data_dir = Path(json_dir) / "data"
+        data_dir.mkdir(exist_ok=True)
+        write_apps_json(state["command_data"], data_dir)
+
+    for step, function in zip(STEPS, (build_system, make_digraph, mlt_links, system_connections, app_command_data, json_files)):
+        results[step] = measure(step, function)
+    return results
+
+
+def timed(step, function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def traced(step, function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_scenario(scenario, repeat=3):
+    """{step: {"time": best time [s], "peak_memory": peak [B]}} for `scenario`"""
+    times = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as json_dir:
+            run_times = run_steps(scenario, json_dir, timed)
+        times = run_times if times is None else {step: min(times[step], run_times[step]) for step in STEPS}
+    with tempfile.TemporaryDirectory() as json_dir:
+        peaks = run_steps(scenario, json_dir, traced)
+    return {step: {"time": times[step], "peak_memory": peaks[step]} for step in STEPS}
+
+
+def environment():
+    return {"offline": OFFLINE, "python": platform.python_version(), "machine": platform.node()}
+
+
+def compare(name, results, baseline, threshold, memory_threshold):
+    """The regressions of `results` with respect to `baseline`, as a list of strings"""
+    regressions = []
+    for step, result in results.items():
+        if step not in baseline:
+            continue
+        old_time, old_memory = baseline[step]["time"], baseline[step]["peak_memory"]
+        if result["time"] > old_time * threshold and result["time"] - old_time > MIN_TIME_DIFFERENCE:
+            regressions.append(f"{name}/{step}: time {old_time:.4f} s -> {result['time']:.4f} s")
+        if result["peak_memory"] > old_memory * memory_threshold and result["peak_memory"] - old_memory > MIN_MEMORY_DIFFERENCE:
+            regressions.append(f"{name}/{step}: peak memory {old_memory/1e6:.2f} MB -> {result['peak_memory']/1e6:.2f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scale benchmark suite for the configuration core")
+    parser.add_argument("--update", action="store_true", help="Record the results as the new baselines")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS.keys(), help="Scenario to run (default: all of them)")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Fail if a step takes longer than this times its baseline")
+    parser.add_argument("--memory-threshold", type=float, default=1.2, help="Fail if a step's peak memory is more than this times its baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of each scenario")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_FILE, help="Baselines file")
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if args.baselines.exists():
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    elif not args.update:
+        print(f"No baselines: {args.baselines} doesn't exist, record them with --update")
+        return 2
+    comparable = baselines.get("environment", {}).get("offline") == OFFLINE
+    if baselines and not comparable:
+        print(f"The baselines in {args.baselines} were taken in a different kind of environment, they are not compared")
+
+    regressions = []
+    unchecked = []
+    all_results = {}
+    print(f"{'scenario':>10} {'step':>24} {'time [s]':>10} {'baseline':>10} {'peak [MB]':>10} {'baseline':>10}")
+    for name in args.scenario or SCENARIOS.keys():
+        results = measure_scenario(SCENARIOS[name], args.repeat)
+        all_results[name] = results
+        baseline = baselines.get("scenarios", {}).get(name, {}) if comparable else {}
+        if not baseline:
+            unchecked.append(name)
+        for step, result in results.items():
+            old = baseline.get(step)
+            old_time = f"{old['time']:.4f}" if old else "-"
+            old_memory = f"{old['peak_memory']/1e6:.2f}" if old else "-"
+            print(f"{name:>10} {step:>24} {result['time']:>10.4f} {old_time:>10} {result['peak_memory']/1e6:>10.2f} {old_memory:>10}")
+        regressions += compare(name, results, baseline, args.threshold, args.memory_threshold)
+
+    if args.update:
+        scenarios = baselines.get("scenarios", {}) if comparable else {}
+        scenarios.update(all_results)
+        with open(args.baselines, "w") as f:
+            json.dump({"environment": environment(), "scenarios": scenarios}, f, indent=4, sort_keys=True)
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    if unchecked:
+        print(f"No baselines for {', '.join(unchecked)} in {args.baselines}, record them with --update")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Compare the size and load time of command data written as indented
+JSON, compact JSON and MessagePack sidecar files.
+
+Run with `python bench_sidecar.py`. The data is made to look like the
+conf data of a readout app with many streams: the same big block of
+parameters repeated per stream, with a few numbers changed.
+"""
+
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from daqconf.core.json_output import orjson, write_json_file, load_json_file, sidecar_path
+
+
+def make_conf_data(n_streams):
+    modules = []
+    for i in range(n_streams):
+        modules.append({
+            "match": f"datahandler_{i}",
+            "data": {
+                "rawdataprocessorconf": {"source_id": i, "crate_id": 1, "slot_id": i // 4, "link_id": i % 4,
+                                         "enable_tpg": True, "channel_map_name": "PD2HDChannelMap",
+                                         "emulator_mode": False, "clock_speed_hz": 62500000.0},
+                "latencybufferconf": {"latency_buffer_size": 139008, "source_id": i, "numa_aware": False,
+                                      "numa_node": 0, "intrinsic_allocator": False, "alignment_size": 4096},
+                "requesthandlerconf": {"latency_buffer_size": 139008, "pop_limit_pct": 0.8, "pop_size_pct": 0.1,
+                                       "source_id": i, "det_id": 3, "output_file": f"output_{i}.out",
+                                       "stream_buffer_size": 8388608, "request_timeout_ms": 1000,
+                                       "warn_on_timeout": False, "enable_raw_recording": False},
+                "links": [{"geo_id": {"det_id": 3, "crate_id": 1, "slot_id": i // 4, "stream_id": j}} for j in range(16)],
+            },
+        })
+    return {"modules": modules}
+
+
+def time_load(load, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_sidecar(n_streams=(100, 1000, 5000)):
+    print(f"{'streams':>8} {'file':>10} {'size [kB]':>10} {'load [ms]':>10}")
+    for n in n_streams:
+        data = make_conf_data(n)
+        with tempfile.TemporaryDirectory() as json_dir:
+            indented = Path(json_dir) / "indented.json"
+            compact = Path(json_dir) / "compact.json"
+            write_json_file(indented, data)
+            write_json_file(compact, data, "compact", sidecar=True)
+            binary = sidecar_path(compact)
+            assert load_json_file(compact) == json.loads(compact.read_text())
+
+            loads = [("indented", indented, lambda: json.loads(indented.read_text())),
+                     ("compact", compact, lambda: json.loads(compact.read_text()))]
+            if orjson is not None:
+                loads.append(("orjson", compact, lambda: orjson.loads(compact.read_bytes())))
+            loads.append(("msgpack", binary, lambda: load_json_file(compact)))
+            for name, path, load in loads:
+                print(f"{n:>8} {name:>10} {path.stat().st_size / 1000:>10.1f} {time_load(load) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    bench_sidecar()
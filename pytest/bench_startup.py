@@ -0,0 +1,140 @@
+"""
+Startup cost of the configuration generators.
+
+Run with `python bench_startup.py`. Each case runs in a fresh Python
+process, as a command would:
+
+  import   imports the configuration core and every generator module
+  help     does the same imports, as the configuration generator CLI
+           does, and prints the --help of a click command
+  minimal  does the same imports, then builds a one-stream synthetic
+           system (see synthetic_system.py) and writes its command data
+
+Each case is run in several modes:
+
+  eager    every schema that the generator modules declare is loaded
+           before starting, as they did at import time before schemas
+           were loaded lazily (see daqconf/core/schemas.py)
+  lazy     schemas are loaded on first use, without the schema cache
+  cold     same, with an empty schema cache (see daqconf/core/schemacache.py)
+  warm     same, with the schema cache filled by a previous run
+
+The best wall time of the process over a few runs is printed, with the
+number of schemas that were loaded and of those that came from the
+cache. Outside of a DUNE-DAQ environment, moo is replaced by the
+stand-ins of offline_env.py, whose schemas cost nothing to load and are
+never cached, so only the schema counts are meaningful there.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = ("import", "help", "minimal")
+MODES = ("eager", "lazy", "cold", "warm")
+
+GENERATOR_MODULES = (
+    "daqconf.core.conf_utils",
+    "daqconf.core.system",
+    "daqconf.core.app",
+    "daqconf.core.fragment_producers",
+    "daqconf.core.config_file",
+    "daqconf.detreadoutmap",
+    "daqconf.apps.readout_gen",
+    "daqconf.apps.trigger_gen",
+    "daqconf.apps.dataflow_gen",
+    "daqconf.apps.dfo_gen",
+    "daqconf.apps.hsi_gen",
+    "daqconf.apps.fake_hsi_gen",
+    "daqconf.apps.tpwriter_gen",
+    "daqconf.apps.tprtc_gen",
+    "daqconf.apps.dpdk_sender_gen",
+)
+
+
+def run_case(case, eager):
+    """Run `case` in this process, and return the number of schemas it loaded, and how many of them came from the cache"""
+    import importlib
+    import offline_env
+    offline_env.install()
+
+    for module in GENERATOR_MODULES:
+        importlib.import_module(module)
+
+    from daqconf.core import schemas
+    if eager:
+        for schema in schemas.declared_schemas():
+            schema.load()
+
+    if case == "help":
+        import click
+
+        @click.command(help="Generate a configuration")
+        @click.option("--base-command-port", type=int, default=3333, help="Base port of application command endpoints")
+        @click.option("-n", "--dry-run", is_flag=True, help="Don't write anything")
+        @click.argument("json_dir", type=click.Path())
+        def cli(base_command_port, dry_run, json_dir):
+            pass
+
+        cli(["--help"], standalone_mode=False)
+    elif case == "minimal":
+        import tempfile
+        from daqconf.core.conf_utils import make_system_connections, make_app_command_data, write_json_files
+        from synthetic_system import make_synthetic_system
+
+        system = make_synthetic_system(n_ru=1, n_streams=1, n_dataflow=1, n_tpwriters=0)
+        make_system_connections(system, use_connectivity_service=False)
+        app_command_datas = {name: make_app_command_data(system, app, name) for name, app in system.apps.items()}
+        with tempfile.TemporaryDirectory() as json_dir:
+            write_json_files(app_command_datas, {}, json_dir)
+    from daqconf.core.schemacache import stats
+    return len(schemas.loaded_schemas()), stats["hits"]
+
+
+def measure(case, mode, repeat, cache_dir):
+    """Best wall time of `case` in `mode`, in a new process, over `repeat` runs, and what the process reported"""
+    command = [sys.executable, __file__, "--child", case] + (["--eager"] if mode == "eager" else [])
+    env = dict(os.environ, DAQCONF_SCHEMA_CACHE=cache_dir if mode in ("cold", "warm") else "off")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    if mode == "warm":
+        subprocess.run(command, check=True, capture_output=True, env=env)
+    best = None
+    for _ in range(repeat):
+        if mode == "cold":
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        start = time.perf_counter()
+        result = subprocess.run(command, check=True, capture_output=True, text=True, env=env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, json.loads(result.stdout.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup cost of the configuration generators")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each case")
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--eager", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        n_schemas, n_cached = run_case(args.child, args.eager)
+        print(json.dumps({"schemas": n_schemas, "cached": n_cached}))
+        return 0
+
+    print(f"{'case':>10} {'mode':>10} {'schemas':>10} {'cached':>10} {'time [s]':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, "schemas")
+        for case in CASES:
+            for mode in MODES:
+                elapsed, result = measure(case, mode, args.repeat, cache_dir)
+                print(f"{case:>10} {mode:>10} {result['schemas']:>10} {result['cached']:>10} {elapsed:>10.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Time `make_system_connections` on synthetic systems of increasing size.
+
+Run with `python bench_system_connections.py`. The resolution is linear
+in the number of endpoints, so the time per endpoint should stay roughly
+flat as the number of readout apps grows. The peak memory allocated
+during the resolution is measured in a separate run with tracemalloc.
+"""
+
+import offline_env
+offline_env.install()
+
+import time
+import tracemalloc
+
+from daqconf.core.conf_utils import make_system_connections
+from synthetic_system import make_synthetic_system
+
+
+def time_system_connections(n_ru, n_streams=10, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        system = make_synthetic_system(n_ru=n_ru, n_streams=n_streams, **kwargs)
+        start = time.perf_counter()
+        make_system_connections(system, use_connectivity_service=False)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    n_endpoints = sum(len(app.modulegraph.endpoints) for app in system.apps.values())
+    return best, n_endpoints
+
+
+def peak_system_connections(n_ru, n_streams=10, **kwargs):
+    system = make_synthetic_system(n_ru=n_ru, n_streams=n_streams, **kwargs)
+    tracemalloc.start()
+    make_system_connections(system, use_connectivity_service=False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_system_connections():
+    print(f"{'RUs':>6} {'endpoints':>10} {'time [s]':>10} {'us/endpoint':>12} {'peak [MB]':>10}")
+    for n_ru in (25, 50, 100, 200):
+        elapsed, n_endpoints = time_system_connections(n_ru)
+        peak = peak_system_connections(n_ru)
+        print(f"{n_ru:>6} {n_endpoints:>10} {elapsed:>10.4f} {1e6*elapsed/n_endpoints:>12.2f} {peak/2**20:>10.2f}")
+
+
+if __name__ == "__main__":
+    bench_system_connections()
@@ -0,0 +1,192 @@
+"""
+Stand-ins for the DUNE-DAQ packages that the configuration core
+imports, so that the benchmarks can run outside of a DUNE-DAQ
+environment.
+
+install() does nothing if moo can be imported. Otherwise it registers
+minimal versions of moo, appfwk.utils, daqdataformats, detdataformats,
+trgdataformats and dunedaq.env. Any dunedaq.<package>.<schema> module
+is also faked: each of its types is a Record class that keeps the
+fields it is given and pod()s them back without validating them. That
+is enough to build systems, resolve connections and produce command
+data, but timings taken this way leave out moo's validation, so they
+can't be compared with timings taken in a real environment.
+"""
+
+import enum
+import importlib.abc
+import importlib.machinery
+import sys
+import types
+
+
+def _pod(value):
+    if hasattr(value, "pod"):
+        return value.pod()
+    if isinstance(value, (list, tuple)):
+        return [_pod(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _pod(item) for key, item in value.items()}
+    return value
+
+
+class Record:
+    """
+    A moo object with whatever fields it is given. As with moo, reading
+    a field gives its plain data (so nested records read as dicts).
+    Fields that were never set read as None.
+    """
+
+    def __init__(self, *args, **fields):
+        # As with moo, a record can also be made from a dict
+        object.__setattr__(self, "_fields", dict(*args, **fields))
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _pod(self._fields.get(name))
+
+    def __setattr__(self, name, value):
+        self._fields[name] = value
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self._fields}>"
+
+    def update(self, fields):
+        self._fields.update(fields)
+
+    def pod(self):
+        return _pod(self._fields)
+
+
+class TypesModule(types.ModuleType):
+    """A module generated from a moo schema, where every type name is a Record class"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        record_type = type(name, (Record,), {})
+        setattr(self, name, record_type)
+        return record_type
+
+
+class SourceID:
+
+    class Subsystem(enum.IntEnum):
+        kUnknown = 0
+        kDetectorReadout = 1
+        kHwSignalsInterface = 2
+        kTrigger = 3
+        kTRBuilder = 4
+
+    _names = {Subsystem.kUnknown: "Unknown",
+              Subsystem.kDetectorReadout: "Detector_Readout",
+              Subsystem.kHwSignalsInterface: "HW_Signals_Interface",
+              Subsystem.kTrigger: "Trigger",
+              Subsystem.kTRBuilder: "TR_Builder"}
+
+    def __init__(self, subsystem, id):
+        self.subsystem = SourceID.Subsystem(subsystem)
+        self.id = id
+
+    def __eq__(self, other):
+        return (self.subsystem, self.id) == (other.subsystem, other.id)
+
+    def __hash__(self):
+        return hash((int(self.subsystem), self.id))
+
+    def __repr__(self):
+        return f"SourceID({self.to_string()})"
+
+    def to_string(self):
+        return f"{SourceID.subsystem_to_string(self.subsystem)}_0x{self.id:08x}"
+
+    @staticmethod
+    def subsystem_to_string(subsystem):
+        return SourceID._names[subsystem]
+
+    @staticmethod
+    def string_to_subsystem(name):
+        for subsystem, subsystem_name in SourceID._names.items():
+            if subsystem_name == name:
+                return subsystem
+        return SourceID.Subsystem.kUnknown
+
+
+class DetID:
+    pass
+
+
+def _acmd(mods):
+    return Record(modules=[Record(match=match, data=data) for match, data in mods])
+
+
+def _mspec(inst, plugin, conn_refs):
+    return Record(inst=inst, plugin=plugin, data=Record(conn_refs=conn_refs))
+
+
+def _mcmd(cmdid, mods):
+    return Record(id=cmdid, data=_acmd(mods))
+
+
+def _make_type(schema, name, path, **kwargs):
+    """As moo.otypes.make_type, adds type `name` to module `path`, here as a Record class"""
+    module = sys.modules.setdefault(path, TypesModule(path))
+    return getattr(module, name)
+
+
+class _SchemaFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Makes a TypesModule for any dunedaq.<package>.<schema> import"""
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname.startswith("dunedaq.") and fullname not in sys.modules:
+            return importlib.machinery.ModuleSpec(fullname, self, is_package=fullname.count(".") == 1)
+        return None
+
+    def create_module(self, spec):
+        if spec.name.count(".") == 1:
+            module = types.ModuleType(spec.name)
+            module.__path__ = []
+            return module
+        return TypesModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+def _module(name, is_package=False, **attributes):
+    module = types.ModuleType(name)
+    if is_package:
+        module.__path__ = []
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def install():
+    """Register the stand-ins, unless the real packages are there. Returns whether the stand-ins are in use"""
+    if getattr(sys.modules.get("moo"), "__offline__", False):
+        return True
+    try:
+        import moo.otypes
+        return False
+    except ImportError:
+        pass
+
+    _module("moo", is_package=True, __offline__=True)
+    _module("moo.io", default_load_path=[])
+    _module("moo.otypes", load_types=lambda path: None, make_type=_make_type)
+    _module("moo.oschema")
+    _module("appfwk", is_package=True)
+    _module("appfwk.utils", acmd=_acmd, mspec=_mspec, mcmd=_mcmd)
+    _module("daqdataformats", SourceID=SourceID)
+    _module("detdataformats", DetID=DetID)
+    # Knows no trigger type names
+    _module("trgdataformats", string_to_fragment_type_value=lambda name: 0)
+    _module("dunedaq", is_package=True)
+    _module("dunedaq.env", get_moo_model_path=lambda: [])
+    sys.meta_path.append(_SchemaFinder())
+    return True
@@ -0,0 +1,205 @@
+"""
+Synthetic DAQ systems for exercising the configuration core at scale.
+
+The builders here reproduce the endpoint, queue and fragment-producer
+topology of the readout, trigger, dataflow, DFO, HSI and TP writer
+generators, but without any module configuration objects, so that the
+System-level machinery (connection resolution, dependency graphs, command
+data) can be timed on detector-sized systems.
+"""
+
+from collections import namedtuple
+
+from daqconf.core.app import App, ModuleGraph
+from daqconf.core.daqmodule import DAQModule
+from daqconf.core.conf_utils import Direction, Queue
+from daqconf.core.schemas import lazy_schema
+from daqconf.core.sourceid import TPInfo, TCInfo
+from daqconf.core.system import System
+
+mlt = lazy_schema('trigger/moduleleveltrigger.jsonnet')
+trb = lazy_schema('dfmodules/triggerrecordbuilder.jsonnet')
+
+# Just what set_mlt_links needs from a ReadoutUnitDescriptor
+SyntheticStream = namedtuple("SyntheticStream", ["src_id"])
+SyntheticReadoutUnit = namedtuple("SyntheticReadoutUnit", ["streams"])
+
+# Source IDs of the TP links are 100000 + the RU index
+TC_SOURCE_ID = 200000
+
+
+def make_readout_app(ru_idx, n_streams, tpg, n_dataflow, host="localhost"):
+    """A readout app with one datahandler per stream, a fragment aggregator and optionally a TP datahandler"""
+    first_sid = ru_idx * n_streams
+    sids = range(first_sid, first_sid + n_streams)
+    tpset_sid = 100000 + ru_idx
+    aggregator = f"fragment_aggregator_ru{ru_idx}"
+
+    modules = [DAQModule(name="datareceiver", plugin="FDFakeCardReader")]
+    modules += [DAQModule(name=f"datahandler_{sid}", plugin="FDDataLinkHandler") for sid in sids]
+    modules += [DAQModule(name=aggregator, plugin="FragmentAggregator")]
+
+    queues = [Queue(f"datareceiver.output_{sid}", f"datahandler_{sid}.raw_input", "WIBEthFrame", f"data_link_{sid}", 100000) for sid in sids]
+    if tpg:
+        modules += [DAQModule(name=f"tp_datahandler_{tpset_sid}", plugin="FDDataLinkHandler")]
+        queues += [Queue(f"datahandler_{sid}.tp_out", f"tp_datahandler_{tpset_sid}.raw_input", "TriggerPrimitive", f"tp_link_{tpset_sid}", 1000000) for sid in sids]
+
+    mgraph = ModuleGraph(modules, queues=queues)
+
+    for sid in sids:
+        mgraph.add_fragment_producer(id=sid, subsystem="Detector_Readout",
+                                     requests_in=f"datahandler_{sid}.request_input",
+                                     fragments_out=f"datahandler_{sid}.fragment_queue")
+        mgraph.add_endpoint(f"timesync_ru{ru_idx}_{sid}", f"datahandler_{sid}.timesync_output", "TimeSync", Direction.OUT, is_pubsub=True, toposort=False)
+        mgraph.connect_modules(f"datahandler_{sid}.fragment_queue", f"{aggregator}.fragment_input", "Fragment", queue_name="fragment_queue", size_hint=100000)
+        mgraph.connect_modules(f"{aggregator}.request_output_{sid}", f"datahandler_{sid}.request_input", "DataRequest", queue_name=f"data_requests_for_{sid}", size_hint=1000)
+
+    if tpg:
+        mgraph.add_endpoint(f"timesync_tp_dlh_ru{ru_idx}_{tpset_sid}", f"tp_datahandler_{tpset_sid}.timesync_output", "TimeSync", Direction.OUT, is_pubsub=True)
+        mgraph.add_endpoint(f"tpsets_tplink{tpset_sid}", f"tp_datahandler_{tpset_sid}.tpset_out", "TPSet", Direction.OUT, is_pubsub=True)
+
+    mgraph.add_endpoint(f"data_requests_for_ru{ru_idx}", f"{aggregator}.data_req_input", "DataRequest", Direction.IN)
+    for df_idx in range(n_dataflow):
+        mgraph.add_endpoint(f"fragments_to_dataflow{df_idx}", None, "Fragment", Direction.OUT)
+
+    return App(modulegraph=mgraph, host=host, name=f"ru{ru_idx}")
+
+
+def make_dataflow_app(df_idx, ru_streams, n_writers=1, host="localhost"):
+    """A dataflow app whose TRB requests data from every stream of every readout app in `ru_streams`"""
+    modules = [DAQModule(name="trb", plugin="TriggerRecordBuilder",
+                         conf=trb.ConfParams(general_queue_timeout=100, max_time_window=0, source_id=df_idx, trigger_record_timeout_ms=0))]
+    modules += [DAQModule(name=f"datawriter_{i}", plugin="DataWriter") for i in range(n_writers)]
+    queues = [Queue("trb.trigger_record_output", f"datawriter_{i}.trigger_record_input", "TriggerRecord", "trigger_records", 10) for i in range(n_writers)]
+
+    mgraph = ModuleGraph(modules, queues=queues)
+    mgraph.add_endpoint(f"trigger_decision_{df_idx}", "trb.trigger_decision_input", "TriggerDecision", Direction.IN)
+    for i in range(n_writers):
+        mgraph.add_endpoint("triginh", f"datawriter_{i}.token_output", "TriggerDecisionToken", Direction.OUT, toposort=True)
+    for ru_idx, sids in ru_streams.items():
+        for sid in sids:
+            mgraph.add_endpoint(f"data_requests_for_ru{ru_idx}", f"trb.request_output_{sid}", "DataRequest", Direction.OUT)
+    mgraph.add_endpoint(f"fragments_to_dataflow{df_idx}", "trb.data_fragment_all", "Fragment", Direction.IN, toposort=True)
+
+    return App(modulegraph=mgraph, host=host, name=f"dataflow{df_idx}")
+
+
+def make_trigger_app(tpset_sids, host="localhost"):
+    """A trigger app with a TCBuffer, an MLT and one TP buffer chain per TP link"""
+    modules = [DAQModule(name="tc_buf", plugin="TCBuffer"),
+               DAQModule(name="ttcm", plugin="TimingTriggerCandidateMaker"),
+               DAQModule(name="tctee_ttcm", plugin="TCTee"),
+               DAQModule(name="mlt", plugin="ModuleLevelTrigger",
+                         conf=mlt.ConfParams(mandatory_links=[], groups_links=[], merge_overlapping_tcs=True,
+                                             buffer_timeout=100, td_out_of_timeout=True, ignore_tc=[],
+                                             td_readout_limit=1000, use_readout_map=False, td_readout_map={},
+                                             use_roi_readout=False, roi_conf={}, use_bitwords=False, trigger_bitwords=[]))]
+    for tp_sid in tpset_sids:
+        link_id = f"tplink{tp_sid}"
+        modules += [DAQModule(name=f"channelfilter_{link_id}", plugin="TPChannelFilter"),
+                    DAQModule(name=f"tpsettee_{link_id}", plugin="TPSetTee"),
+                    DAQModule(name=f"buf_{link_id}", plugin="TPBuffer")]
+
+    mgraph = ModuleGraph(modules)
+    mgraph.connect_modules("ttcm.output", "tctee_ttcm.input", "TriggerCandidate", "ttcm_input", size_hint=1000)
+    mgraph.connect_modules("tctee_ttcm.output1", "mlt.trigger_candidate_input", "TriggerCandidate", "tcs_to_mlt", size_hint=1000)
+    mgraph.connect_modules("tctee_ttcm.output2", "tc_buf.tc_source", "TriggerCandidate", "tcs_to_buf", size_hint=1000)
+    mgraph.add_endpoint("dts_hsievents", "ttcm.hsi_input", "HSIEvent", Direction.IN)
+
+    for tp_sid in tpset_sids:
+        link_id = f"tplink{tp_sid}"
+        mgraph.connect_modules(f"channelfilter_{link_id}.tpset_sink", f"tpsettee_{link_id}.input", data_type="TPSet", size_hint=1000)
+        mgraph.connect_modules(f"tpsettee_{link_id}.output2", f"buf_{link_id}.tpset_source", data_type="TPSet", size_hint=1000)
+        mgraph.add_endpoint(f"tpsets_{link_id}", f"channelfilter_{link_id}.tpset_source", "TPSet", Direction.IN, is_pubsub=True)
+        mgraph.add_fragment_producer(id=tp_sid, subsystem="Trigger",
+                                     requests_in=f"buf_{link_id}.data_request_source",
+                                     fragments_out=f"buf_{link_id}.fragment_sink")
+
+    mgraph.add_endpoint("td_to_dfo", "mlt.td_output", "TriggerDecision", Direction.OUT, toposort=True)
+    mgraph.add_endpoint("df_busy_signal", "mlt.dfo_inhibit_input", "TriggerInhibit", Direction.IN)
+    mgraph.add_fragment_producer(id=TC_SOURCE_ID, subsystem="Trigger",
+                                 requests_in="tc_buf.data_request_source",
+                                 fragments_out="tc_buf.fragment_sink")
+
+    return App(modulegraph=mgraph, host=host, name="trigger")
+
+
+def make_dfo_app(n_dataflow, host="localhost"):
+    mgraph = ModuleGraph([DAQModule(name="dfo", plugin="DataFlowOrchestrator")])
+    mgraph.add_endpoint("td_to_dfo", "dfo.td_connection", "TriggerDecision", Direction.IN)
+    mgraph.add_endpoint("triginh", "dfo.token_connection", "TriggerDecisionToken", Direction.IN)
+    mgraph.add_endpoint("df_busy_signal", "dfo.busy_connection", "TriggerInhibit", Direction.OUT)
+    for df_idx in range(n_dataflow):
+        mgraph.add_endpoint(f"trigger_decision_{df_idx}", f"dfo.trigger_{df_idx}_connection", "TriggerDecision", Direction.OUT)
+    return App(modulegraph=mgraph, host=host, name="dfo")
+
+
+def make_hsi_app(host="localhost"):
+    mgraph = ModuleGraph([DAQModule(name="hsir", plugin="HSIReadout"),
+                          DAQModule(name="hsi_datahandler", plugin="HSIDataLinkHandler")])
+    mgraph.add_fragment_producer(id=0, subsystem="HW_Signals_Interface",
+                                 requests_in="hsi_datahandler.request_input",
+                                 fragments_out="hsi_datahandler.fragment_queue")
+    mgraph.add_endpoint("timesync_timing_hsi", "hsi_datahandler.timesync_output", "TimeSync", Direction.OUT, is_pubsub=True, toposort=False)
+    mgraph.add_endpoint("dts_hsievents", "hsir.hsievents", "HSIEvent", Direction.OUT)
+    mgraph.add_endpoint(None, None, data_type="TimeSync", inout=Direction.IN, is_pubsub=True)
+    return App(modulegraph=mgraph, host=host, name="hsi")
+
+
+def make_tpwriter_app(idx, host="localhost"):
+    mgraph = ModuleGraph([DAQModule(name="tpswriter", plugin="TPStreamWriter")])
+    mgraph.add_endpoint(".*", "tpswriter.tpset_source", "TPSet", Direction.IN, is_pubsub=True)
+    return App(modulegraph=mgraph, host=host, name=f"tpwriter{idx}")
+
+
+def make_synthetic_system(n_ru=200, n_streams=10, tpg=True, n_dataflow=2, n_tpwriters=1, n_hosts=None):
+    """
+    Build a System resembling a full detector configuration: `n_ru`
+    readout apps with `n_streams` streams each, `n_dataflow` dataflow
+    apps, a trigger, a DFO, an HSI and `n_tpwriters` TP writers, which
+    subscribe to every TPSet publisher (the pub/sub fan-out). Readout
+    apps are spread over `n_hosts` hosts (one per app by default).
+    """
+    n_hosts = n_hosts if n_hosts else n_ru
+    apps = {}
+    ru_streams = {}
+    tpset_sids = []
+    for ru_idx in range(n_ru):
+        app = make_readout_app(ru_idx, n_streams, tpg, n_dataflow, host=f"ru-host-{ru_idx % n_hosts}")
+        apps[app.name] = app
+        ru_streams[ru_idx] = range(ru_idx * n_streams, (ru_idx + 1) * n_streams)
+        if tpg:
+            tpset_sids.append(100000 + ru_idx)
+
+    for df_idx in range(n_dataflow):
+        app = make_dataflow_app(df_idx, ru_streams, host=f"df-host-{df_idx}")
+        apps[app.name] = app
+
+    for app in [make_trigger_app(tpset_sids), make_dfo_app(n_dataflow), make_hsi_app()]:
+        apps[app.name] = app
+
+    if tpg:
+        for idx in range(n_tpwriters):
+            app = make_tpwriter_app(idx)
+            apps[app.name] = app
+
+    return System(apps)
+
+
+def make_tp_infos(n_ru, n_streams, tpg=True):
+    """
+    The `tp_infos` argument of set_mlt_links for a system made by
+    make_synthetic_system: one readout unit per RU (grouped by RU index),
+    the TP link of each RU, and the TC buffer.
+    """
+    tp_infos = {}
+    for ru_idx in range(n_ru):
+        tp_infos[ru_idx] = SyntheticReadoutUnit([SyntheticStream(sid) for sid in range(ru_idx * n_streams, (ru_idx + 1) * n_streams)])
+    if tpg:
+        for ru_idx in range(n_ru):
+            tp_info = TPInfo()
+            tp_info.region_id = ru_idx
+            tp_info.tp_ru_sid = ru_idx
+            tp_infos[100000 + ru_idx] = tp_info
+    tp_infos[TC_SOURCE_ID] = TCInfo()
+    return tp_infos
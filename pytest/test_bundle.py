@@ -0,0 +1,78 @@
+"""
+Single-file configuration bundles: what is written can be read back,
+one file at a time or extracted as the directory it was packed from.
+"""
+
+import offline_env
+offline_env.install()
+
+import json
+
+import pytest
+
+from daqconf.core.bundle import ConfigBundle, bundle_directory, default_bundle_path, is_bundle, write_bundle
+from daqconf.core.conf_utils import write_json_files
+from daqconf.core.metadata import write_metadata_file
+
+
+def directory_files(directory):
+    return {path.relative_to(directory).as_posix(): path.read_bytes() for path in directory.rglob("*") if path.is_file()}
+
+
+def test_write_read_round_trip(tmp_path):
+    entries = [("boot.json", {"apps": {"a": 1}}),
+               ("data/a_init.json", {"modules": [{"inst": "m", "data": None}]}),
+               ("notes.txt", "some text"),
+               ("raw.bin", bytes(range(256)))]
+    bundle_path = write_bundle(tmp_path / "conf.daqconf", entries)
+    assert is_bundle(bundle_path)
+
+    bundle = ConfigBundle(bundle_path)
+    assert bundle.names() == [name for name, _ in entries]
+    assert bundle.read_json("boot.json") == {"apps": {"a": 1}}
+    assert bundle.app_data("a", "init") == {"modules": [{"inst": "m", "data": None}]}
+    assert bundle.read_bytes("notes.txt", verify=True) == b"some text"
+    assert bundle.read_bytes("raw.bin", verify=True) == bytes(range(256))
+    assert set(bundle.to_dict()) == {"boot.json", "data/a_init.json"}
+    with pytest.raises(KeyError):
+        bundle.read_bytes("missing.json")
+
+
+def test_directory_extract_round_trip(tmp_path):
+    json_dir = tmp_path / "conf"
+    (json_dir / "data").mkdir(parents=True)
+    (json_dir / "boot.json").write_text(json.dumps({"a": 1}))
+    (json_dir / "data" / "a_conf.json").write_text(json.dumps({"b": [1, 2]}))
+    (json_dir / "conf.info").write_text("info")
+
+    bundle_path = bundle_directory(json_dir)
+    assert bundle_path == default_bundle_path(json_dir)
+    ConfigBundle(bundle_path).extract(tmp_path / "extracted")
+    assert directory_files(tmp_path / "extracted") == directory_files(json_dir)
+
+
+def test_extract_refuses_paths_outside(tmp_path):
+    bundle_path = write_bundle(tmp_path / "bad.daqconf", [("../outside.json", {})])
+    with pytest.raises(ValueError):
+        ConfigBundle(bundle_path).extract(tmp_path / "extracted")
+
+
+class Data:
+    def __init__(self, data):
+        self.data = data
+
+    def pod(self):
+        return self.data
+
+
+def test_write_json_files_bundle(tmp_path):
+    json_dir = tmp_path / "conf"
+    app_command_datas = {"a": {"init": Data({"modules": []}), "conf": Data({"modules": [{"match": "m"}]})}}
+    write_json_files(app_command_datas, {"boot": {"apps": ["a"]}}, json_dir, bundle=True)
+    # Metadata written afterwards is added to the bundle
+    write_metadata_file(json_dir, "test_gen", "config.json")
+
+    bundle = ConfigBundle(default_bundle_path(json_dir))
+    assert bundle.app_data("a", "conf") == {"modules": [{"match": "m"}]}
+    assert "test_gen.info" in bundle
+    assert {name: bundle.read_bytes(name) for name in bundle.names()} == directory_files(json_dir)
@@ -0,0 +1,54 @@
+"""
+Semantic configuration diff: objects in lists are matched by their
+identifying field, so inserting or moving one doesn't show up as every
+later one changing.
+"""
+
+from daqconf.core.confdiff import ADDED, CHANGED, REMOVED, Keyed, diff_configs, diff_files, diff_summary, format_change
+from daqconf.core.dedup import deduplicate, is_deduplicated
+
+
+def modules(*names, **data):
+    return {"modules": [{"inst": name, "plugin": "P", "data": data.get(name, {"x": 1})} for name in names]}
+
+
+def test_insert_in_the_middle_is_one_addition():
+    changes = diff_configs(modules("a", "b", "c"), modules("a", "new", "b", "c"))
+    assert changes == [(ADDED, ("modules", Keyed("inst", "new")), None, {"inst": "new", "plugin": "P", "data": {"x": 1}})]
+    assert format_change(changes[0]) == '+ modules[inst=new]: {"data": {"x": 1}, "inst": "new", "plugin": "P"}'
+
+
+def test_reordering_is_no_change():
+    assert diff_configs(modules("a", "b", "c"), modules("c", "a", "b")) == []
+
+
+def test_changes_are_reported_under_their_key():
+    changes = diff_configs(modules("a", "b", "c"), modules("c", "b", b={"x": 2}))
+    assert sorted(changes) == sorted([(CHANGED, ("modules", Keyed("inst", "b"), "data", "x"), 1, 2),
+                                      (REMOVED, ("modules", Keyed("inst", "a")), {"inst": "a", "plugin": "P", "data": {"x": 1}}, None)])
+    assert diff_summary(changes) == {ADDED: 0, REMOVED: 1, CHANGED: 1}
+
+
+def test_key_fields():
+    # Connections by the uid in their id, and conf data by "match"
+    old = {"connections": [{"id": {"uid": "c1"}, "port": 1}, {"id": {"uid": "c2"}, "port": 2}],
+           "conf": [{"match": "m1", "data": 1}, {"match": "m2", "data": 2}]}
+    new = {"connections": [{"id": {"uid": "c2"}, "port": 3}, {"id": {"uid": "c1"}, "port": 1}],
+           "conf": [{"match": "m2", "data": 2}, {"match": "m1", "data": 1}]}
+    assert diff_configs(old, new) == [(CHANGED, ("connections", Keyed("id.uid", "c2"), "port"), 2, 3)]
+
+
+def test_lists_without_unique_keys_are_compared_by_position():
+    old = [{"name": "a", "v": 1}, {"name": "a", "v": 2}]
+    new = [{"name": "a", "v": 2}]
+    assert diff_configs(old, new) == [(CHANGED, (0, "v"), 1, 2), (REMOVED, (1,), {"name": "a", "v": 2}, None)]
+
+
+def test_ignored_keys_and_deduplicated_data():
+    old = dict(modules("a", "b"), _id="one")
+    new = deduplicate(dict(modules("a", "b"), _id="two"), 1)
+    assert is_deduplicated(new)
+    assert diff_configs(old, new) == []
+    assert diff_configs(old, new, ignored=()) == [(CHANGED, ("_id",), "one", "two")]
+    assert diff_files({"a.json": old}, {"a.json": new}) == []
+    assert diff_files({"a.json": old}, {"a.json": new}, ignored=()) == [(CHANGED, ("a.json", "_id"), "one", "two")]
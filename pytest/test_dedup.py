@@ -0,0 +1,55 @@
+"""
+Structural deduplication: expand(deduplicate(x)) gives back x, whatever
+keys the data uses, and repeated sub-objects are stored once.
+"""
+
+import json
+
+import pytest
+
+from daqconf.core.dedup import DEDUP_MARKER, LITERAL_KEY, REF_KEY, deduplicate, dedup_report, expand, is_deduplicated
+
+LATENCY_BUFFER = {"latency_buffer_size": 100000, "latency_buffer_numa_aware": False, "latency_buffer_preallocation": True}
+
+
+def stream_conf(sid):
+    return {"match": f"datahandler_{sid}",
+            "data": {"latencybufferconf": dict(LATENCY_BUFFER),
+                     "requesthandlerconf": {"source_id": sid, "warn_on_timeout": True, "pop_limit_pct": 0.8}}}
+
+
+CASES = {
+    "shared": {"modules": [stream_conf(sid) for sid in range(20)]},
+    "nothing_shared": {"modules": [{"match": "a", "data": {"x": 1}}]},
+    "nested_lists": [[list(range(30))] * 3, [list(range(30))]],
+    "scalars": [1, 2.5, "three", None, True],
+    "ref_key_in_data": {"modules": [{REF_KEY: "not a reference"}, {REF_KEY: "not a reference"}] + [stream_conf(sid) for sid in range(3)]},
+    "literal_key_in_data": {"a": {LITERAL_KEY: {REF_KEY: "x"}}, "b": [{LITERAL_KEY: 1}] * 3, "c": [stream_conf(0), stream_conf(0)]},
+    "marker_key_in_data": {DEDUP_MARKER: 1, "table": {}, "data": {"x": 1}},
+    "marker_key_and_sharing": {DEDUP_MARKER: "mine", "modules": [stream_conf(sid) for sid in range(5)]},
+    "shared_ref_like_objects": {"x": [{REF_KEY: "y" * 100}] * 4},
+}
+
+
+@pytest.mark.parametrize("name", CASES.keys())
+@pytest.mark.parametrize("min_size", [1, 64])
+def test_round_trip(name, min_size):
+    data = CASES[name]
+    deduplicated = deduplicate(data, min_size)
+    # What is written to and read back from a file
+    assert expand(json.loads(json.dumps(deduplicated))) == data
+
+
+def test_repeated_objects_stored_once():
+    data = CASES["shared"]
+    deduplicated = deduplicate(data)
+    assert is_deduplicated(deduplicated)
+    text = json.dumps(deduplicated)
+    assert text.count("latency_buffer_preallocation") == 1
+    flat_size, dedup_size, n_shared = dedup_report(data)
+    assert dedup_size < flat_size and n_shared >= 1
+
+
+def test_nothing_to_share_is_unchanged():
+    assert deduplicate(CASES["nothing_shared"]) is CASES["nothing_shared"]
+    assert expand(CASES["nothing_shared"]) is CASES["nothing_shared"]
@@ -0,0 +1,112 @@
+"""
+The generation service, with a toy generator that reads a ConfigSet
+file and writes it out: requests are run in the service, which reads
+the input file again only when it changed, and boot.profile applies to
+the request of a generator that sets it. The socket is kept in a
+directory only the user can access.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+
+import pytest
+
+from daqconf.core import service
+
+GENERATOR = """
+import json
+import sys
+from pathlib import Path
+from daqconf.core.config_file import ConfigSet
+
+configs = ConfigSet(sys.argv[1]).get_all_configs()
+Path(sys.argv[2]).mkdir(exist_ok=True)
+(Path(sys.argv[2]) / "configs.json").write_text(json.dumps(configs))
+print("generated")
+"""
+
+PROFILED_GENERATOR = """
+import sys
+import time
+from types import SimpleNamespace
+from daqconf.core.config_file import _enable_boot_profiling
+from daqconf.core.profiling import profiler
+
+boot = SimpleNamespace(profile=sys.argv[1] == "profile", profile_cprofile=False)
+_enable_boot_profiling(SimpleNamespace(boot=boot), (time.perf_counter(), time.process_time()))
+print(profiler.memory)
+"""
+
+
+def test_generation_requests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+    (tmp_path / "gen.py").write_text(GENERATOR)
+    (tmp_path / "configs.json").write_text(json.dumps({"common": {"a": 1}, "other": {"a": 2}}))
+    socket_path = tmp_path / "service.sock"
+
+    try:
+        first = service.generate("./gen.py", ["configs.json", "out"], socket_path=socket_path)
+        second = service.generate("./gen.py", ["configs.json", "out"], socket_path=socket_path)
+        (tmp_path / "configs.json").write_text(json.dumps({"common": {"a": 3}}))
+        third = service.generate("./gen.py", ["configs.json", "out"], socket_path=socket_path)
+    finally:
+        if service.is_running(socket_path):
+            service.request({"command": "stop"}, socket_path)
+
+    for reply in (first, second, third):
+        assert reply["exit_code"] == 0, reply["log"]
+        assert reply["log"] == "generated\n"
+        assert reply["output"] == str(tmp_path / "out")
+    assert [reply["input_cache"] for reply in (first, second, third)] == [
+        {"hits": 0, "misses": 1}, {"hits": 1, "misses": 0}, {"hits": 0, "misses": 1}]
+    assert json.loads((tmp_path / "out" / "configs.json").read_text()) == {"common": {"a": 3}}
+
+
+def test_boot_profile_applies_to_its_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+    (tmp_path / "gen.py").write_text(PROFILED_GENERATOR)
+    socket_path = tmp_path / "service.sock"
+
+    try:
+        replies = [service.generate("./gen.py", [mode], socket_path=socket_path) for mode in ("profile", "plain")]
+    finally:
+        if service.is_running(socket_path):
+            service.request({"command": "stop"}, socket_path)
+
+    assert [reply["log"] for reply in replies] == ["True\n", "False\n"]
+
+
+def test_socket_path_needs_a_private_directory(monkeypatch):
+    monkeypatch.delenv(service.SOCKET_ENV, raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    with pytest.raises(RuntimeError):
+        service.default_socket_path()
+    monkeypatch.setenv(service.SOCKET_ENV, "/some/where.sock")
+    assert str(service.default_socket_path()) == "/some/where.sock"
+
+
+def test_socket_directories_are_private(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        service.make_socket_directory(tmp_path / "a" / "b" / "service.sock")
+    finally:
+        os.umask(old_umask)
+    for directory in (tmp_path / "a", tmp_path / "a" / "b"):
+        assert stat.S_IMODE(directory.stat().st_mode) == 0o700
+
+    (tmp_path / "shared").mkdir(mode=0o755)
+    os.chmod(tmp_path / "shared", 0o755)
+    with pytest.raises(RuntimeError):
+        service.make_socket_directory(tmp_path / "shared" / "service.sock")
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_PEERCRED"), reason="needs SO_PEERCRED")
+def test_peer_uid():
+    left, right = socket.socketpair(socket.AF_UNIX)
+    with left, right:
+        assert service.peer_uid(left) == os.getuid()
@@ -0,0 +1,70 @@
+"""
+Import cost of the configuration core.
+
+Imports the core modules in a fresh process and checks that moo, the
+schemas, graph drawing, rich rendering and channel maps are left to the
+code paths that use them. How long the imports take is measured by
+bench_startup.py.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+CORE_MODULES = (
+    "daqconf.core.conf_utils",
+    "daqconf.core.system",
+    "daqconf.core.app",
+    "daqconf.core.sourceid",
+    "daqconf.core.fragment_producers",
+    "daqconf.core.config_file",
+    "daqconf.detreadoutmap",
+)
+
+# Only imported by the code that needs them. dunedaq holds the modules
+# that moo generates from the schemas
+DEFERRED_PACKAGES = ("moo", "dunedaq", "networkx", "graphviz", "rich", "detchannelmaps", "pydot")
+
+# DUNE-DAQ packages the core does import: where they aren't installed,
+# the child registers placeholders for them
+REQUIRED_PACKAGES = ("daqdataformats", "detdataformats", "trgdataformats")
+
+# Run in a new process, without the stand-ins of offline_env.py (which
+# provide moo): reports what the core imported, or the import that failed
+CHILD = f"""
+import importlib.util, json, sys, types
+
+class Placeholder(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return type(name, (), {{}})
+
+for name in {REQUIRED_PACKAGES!r}:
+    if importlib.util.find_spec(name) is None:
+        sys.modules[name] = Placeholder(name)
+try:
+    import {", ".join(CORE_MODULES)}
+    error = None
+except ImportError as e:
+    error = str(e)
+from daqconf.core.schemas import loaded_schemas
+print(json.dumps({{"error": error, "modules": sorted(sys.modules), "schemas": loaded_schemas()}}))
+"""
+
+
+def import_core():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_heavy_dependencies_are_deferred():
+    imported = import_core()
+    assert imported["error"] is None
+    deferred = sorted(name for name in imported["modules"] if name.split(".")[0] in DEFERRED_PACKAGES)
+    assert deferred == []
+    assert imported["schemas"] == []
@@ -0,0 +1,40 @@
+"""
+Writing and loading generated JSON files: the MessagePack sidecar of a
+file is only used while it matches the content of the JSON file.
+"""
+
+import json
+import os
+
+import pytest
+
+from daqconf.core.json_output import encode_json, load_json_file, sidecar_path, write_json_file
+
+msgpack = pytest.importorskip("msgpack")
+
+DATA = {"modules": [{"inst": "datahandler_0", "data": {"size": 139008, "ratio": 0.8, "on": True, "none": None}}],
+        "3": [1, 2]}
+
+
+def test_indented_is_sorted_json_dump(tmp_path):
+    path = tmp_path / "a.json"
+    write_json_file(path, DATA)
+    assert path.read_text() == json.dumps(DATA, indent=4, sort_keys=True)
+    assert encode_json(DATA, "compact") == json.dumps(DATA, separators=(",", ":"), sort_keys=True)
+
+
+def test_sidecar_round_trip(tmp_path):
+    path = tmp_path / "a.json"
+    write_json_file(path, DATA, "compact", sidecar=True)
+    assert sidecar_path(path).exists()
+    assert load_json_file(path) == json.loads(path.read_text())
+
+
+def test_stale_sidecar_is_ignored(tmp_path):
+    path = tmp_path / "a.json"
+    write_json_file(path, DATA, sidecar=True)
+    mtime = path.stat().st_mtime_ns
+    # Edited by hand or by another tool, with the same modification time
+    path.write_text(json.dumps({"edited": True}))
+    os.utime(path, ns=(mtime, mtime))
+    assert load_json_file(path) == {"edited": True}
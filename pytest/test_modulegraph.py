@@ -0,0 +1,87 @@
+"""
+ModuleGraph lookups by name: they stay right whatever is done to the
+modules, endpoints and queues lists, through the ModuleGraph methods or
+directly.
+"""
+
+import offline_env
+offline_env.install()
+
+import copy
+import pickle
+
+from daqconf.core.app import ModuleGraph
+from daqconf.core.conf_utils import Direction, Queue
+from daqconf.core.daqmodule import DAQModule
+
+
+def make_graph():
+    mgraph = ModuleGraph([DAQModule(name=name, plugin="P") for name in ("a", "b", "c")])
+    mgraph.add_endpoint("out", "a.out", "T", Direction.OUT)
+    mgraph.connect_modules("a.x", "b.y", "T", "q")
+    return mgraph
+
+
+def test_lookups_follow_direct_changes():
+    mgraph = make_graph()
+    assert mgraph.get_module("a").name == "a"
+
+    # Same length, same list object
+    mgraph.modules[0] = DAQModule(name="z", plugin="P")
+    assert mgraph.get_module("a") is None and mgraph.get_module("z") is mgraph.modules[0]
+    mgraph.modules.clear()
+    mgraph.modules.extend([DAQModule(name=name, plugin="P") for name in ("c", "b", "a")])
+    assert mgraph.get_module("a") is mgraph.modules[2]
+    mgraph.modules.sort(key=lambda module: module.name)
+    assert mgraph.get_module("a") is mgraph.modules[0]
+    mgraph.modules = [DAQModule(name="new", plugin="P")]
+    assert mgraph.get_module("new") is mgraph.modules[0] and mgraph.get_module("a") is None
+
+    mgraph.endpoints.pop()
+    assert not mgraph.has_endpoint("out", "a.out")
+    mgraph.endpoints += mgraph.endpoints[:0]
+    mgraph.add_endpoint("out", "a.out", "T", Direction.OUT)
+    assert mgraph.has_endpoint("out", "a.out")
+
+
+    mgraph = make_graph()
+    mgraph.queues[0] = Queue("a.x", "c.y", "T", "other")
+    mgraph.connect_modules("a.x", "b.y", "T", "q")
+    assert [queue.name for queue in mgraph.queues] == ["other", "q"]
+
+
+def test_renamed_in_place():
+    mgraph = make_graph()
+    assert mgraph.has_endpoint("out", "a.out")
+    mgraph.endpoints[0].external_name = "renamed"
+    mgraph.invalidate_indexes()
+    assert mgraph.has_endpoint("renamed", "a.out") and not mgraph.has_endpoint("out", "a.out")
+
+
+def test_copies_keep_working():
+    mgraph = make_graph()
+    mgraph.get_module("a")
+    for other in (copy.deepcopy(mgraph), pickle.loads(pickle.dumps(mgraph))):
+        other.add_module("d", plugin="P")
+        assert other.get_module("d") is other.modules[3]
+        assert mgraph.get_module("d") is None
+
+
+def test_queues_merged_by_name():
+    queues = [Queue("a.x", "b.y", "T", "q"), Queue("c.x", "b.y", "T", "q"), Queue("a.x", "d.y", "T", "q"), Queue("e.x", "f.y", "T")]
+    mgraph = ModuleGraph([DAQModule(name=name, plugin="P") for name in "abcdef"], queues=queues)
+    assert [queue.name for queue in mgraph.queues] == ["q", "e.x_to_f.y"]
+    assert mgraph.queues[0].push_modules == ["a.x", "c.x"]
+    assert mgraph.queues[0].pop_modules == ["b.y", "d.y"]
+
+
+def test_queue_links_follow_direct_changes():
+    queue = Queue("a.x", "b.y", "T", "q")
+    for i in range(40):
+        queue.add_module_link(f"m{i}.x", "b.y")
+    queue.push_modules.remove("m3.x")
+    queue.push_modules[0] = "m5.x"
+    queue.add_module_link("m3.x", "b.y")
+    queue.add_module_link("a.x", "b.y")
+    assert queue.push_modules.count("m3.x") == 1 and queue.push_modules.count("a.x") == 1
+    assert queue.pop_modules == ["b.y"]
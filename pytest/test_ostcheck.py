@@ -0,0 +1,137 @@
+"""
+Checkers compiled from moo schemas: they flag what the schema rejects,
+and, where moo is installed, pass nothing that moo rejects.
+"""
+
+import offline_env
+OFFLINE = offline_env.install()
+
+import copy
+import sys
+import types
+
+import pytest
+
+from daqconf.core.ostcheck import UnsupportedSchema, compile_checker
+
+
+def schema_type(module, name, **ost):
+    cls = type(name, (), {"_ost": dict(name=name, path=module.__name__.split("."), **ost)})
+    setattr(module, name, cls)
+    return cls
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    """A module of hand-made moo-like types, as a schema file would give"""
+    module = types.ModuleType("fakeschema.types")
+    monkeypatch.setitem(sys.modules, "fakeschema.types", module)
+    schema_type(module, "Short", schema="number", dtype="u2")
+    schema_type(module, "Ratio", schema="number", dtype="f8", constraints={"minimum": 0, "exclusiveMaximum": 1})
+    schema_type(module, "Mac", schema="string", pattern="^[a-f0-9]{2}(:[a-f0-9]{2}){5}$")
+    schema_type(module, "Kind", schema="enum", symbols=["eth", "flx"])
+    schema_type(module, "Flag", schema="boolean")
+    schema_type(module, "Anything", schema="any")
+    schema_type(module, "Link", schema="record", fields=[
+        dict(name="kind", item="fakeschema.types.Kind"),
+        dict(name="mac", item="fakeschema.types.Mac", default="00:00:00:00:00:00"),
+        dict(name="id", item="fakeschema.types.Short", default=0),
+        dict(name="ratio", item="fakeschema.types.Ratio", default=0.5),
+        dict(name="enabled", item="fakeschema.types.Flag", default=True),
+        dict(name="extra", item="fakeschema.types.Anything"),
+    ])
+    schema_type(module, "Links", schema="sequence", items="fakeschema.types.Link")
+    return module
+
+
+def link(**fields):
+    return {"kind": "eth", "mac": "0a:1b:2c:3d:4e:5f", "id": 3, "ratio": 0.25, "enabled": False, "extra": {"x": [1]}, **fields}
+
+
+def test_valid_data_passes(schema):
+    check = compile_checker(schema.Links)
+    assert check([link(), link(kind="flx", id=65535), {"kind": "flx", "extra": None}]) == []
+    assert compile_checker("fakeschema.types.Link")(link()) == []
+
+
+@pytest.mark.parametrize("fields, problem", [
+    (dict(kind="usb"), "kind: 'usb' is not one of eth, flx"),
+    (dict(mac="0a:1b:2c:3d:4e"), "mac: '0a:1b:2c:3d:4e' does not match"),
+    (dict(mac=12), "mac: 12 is not a string"),
+    (dict(id=65536), "id: 65536 is out of the range of u2"),
+    (dict(id=-1), "id: -1 is out of the range of u2"),
+    (dict(id=1.0), "id: 1.0 is not a number of type u2"),
+    (dict(id=True), "id: True is not a number of type u2"),
+    (dict(ratio=1), "ratio: 1 does not satisfy exclusiveMaximum 1"),
+    (dict(ratio=-0.5), "ratio: -0.5 does not satisfy minimum 0"),
+    (dict(enabled=1), "enabled: 1 is not a boolean"),
+    (dict(colour="red"), "colour: unknown field"),
+])
+def test_invalid_field_is_flagged(schema, fields, problem):
+    problems = compile_checker(schema.Links)([link(), link(**fields)])
+    assert len(problems) == 1
+    assert problems[0].startswith(f"[1].{problem}")
+
+
+def test_missing_and_misplaced_data_is_flagged(schema):
+    check = compile_checker(schema.Link)
+    assert check({"extra": 1}) == ["kind: missing field"]
+    assert check([link()]) != []
+    assert compile_checker(schema.Links)(link()) != []
+
+
+def test_unsupported_schema(schema):
+    schema_type(schema, "Email", schema="string", format="email")
+    schema_type(schema, "Contact", schema="record", fields=[dict(name="email", item="fakeschema.types.Email")])
+    with pytest.raises(UnsupportedSchema):
+        compile_checker(schema.Contact)
+    with pytest.raises(UnsupportedSchema):
+        compile_checker("fakeschema.types.Missing")
+
+
+def eth_entry(src_id, **parameters):
+    return {"src_id": src_id, "geo_id": {"det_id": 3, "crate_id": 1, "slot_id": 0, "stream_id": src_id},
+            "kind": "eth",
+            "parameters": {"protocol": "udp", "mode": "fix_rate", "rx_iface": 0, "rx_host": "np02-srv-001",
+                           "rx_pcie_dev": "0000:ca:00.0", "rx_mac": "6c:fe:54:47:98:20", "rx_ip": "10.73.139.26",
+                           "tx_host": "np04-wib-503", "tx_mac": "00:25:90:10:8f:ee", "tx_ip": "10.73.139.23",
+                           **parameters}}
+
+
+def moo_cases():
+    entries = {"valid": eth_entry(1), "valid_defaults": {"geo_id": eth_entry(0)["geo_id"], "kind": "flx", "parameters": {"host": "h"}}}
+    for name, value in [("rx_mac", "6c:fe:54:47:98"), ("rx_mac", "6c:fe:54:47:98:20\n"), ("rx_ip", "10.73.139"),
+                        ("rx_iface", 70000), ("rx_iface", -1), ("rx_iface", 1.5), ("rx_iface", True),
+                        ("protocol", "tcp"), ("rx_host", "not a host"), ("rx_pcie_dev", "ca:00.0"), ("unknown", 1)]:
+        entries[f"{name}={value!r}"] = eth_entry(1, **{name: value})
+    entries["src_id=-1"] = dict(eth_entry(1), src_id=-1)
+    entries["kind=usb"] = dict(eth_entry(1), kind="usb")
+    entries["no_geo_id"] = {k: v for k, v in eth_entry(1).items() if k != "geo_id"}
+    entries["geo_id_field"] = dict(eth_entry(1), geo_id=dict(eth_entry(1)["geo_id"], colour=1))
+    entries["unknown_field"] = dict(eth_entry(1), colour=1)
+    return entries
+
+
+@pytest.mark.skipif(OFFLINE, reason="needs moo and the DUNE-DAQ schemas")
+@pytest.mark.parametrize("name", moo_cases().keys())
+def test_readout_map_checkers_agree_with_moo(name):
+    from daqconf.detreadoutmap import DetReadoutMapService
+
+    entry = moo_cases()[name]
+    try:
+        DetReadoutMapService._check_json_with_moo([copy.deepcopy(entry)])
+        moo_error = None
+    except Exception as e:
+        moo_error = e
+
+    check_entry, check_parameters = DetReadoutMapService._compiled_checkers()
+    problems = check_entry(entry) or check_parameters[entry["kind"]](entry["parameters"], "parameters")
+    # Nothing the checkers pass is rejected by moo
+    assert problems or moo_error is None
+
+    # and the map is accepted or rejected as moo alone would
+    if moo_error is None:
+        DetReadoutMapService._check_json([entry])
+    else:
+        with pytest.raises(type(moo_error)):
+            DetReadoutMapService._check_json([entry])
@@ -0,0 +1,108 @@
+"""
+Network port assignment: the ports of a system don't depend on the
+order of its apps or on which of its names a host is given, an app
+replaced with update_app gives back the ports it no longer uses, and
+write_json_files writes them to ports.json.
+"""
+
+import offline_env
+offline_env.install()
+
+import json
+import random
+import socket
+
+import pytest
+
+from daqconf.core.app import App, ModuleGraph
+from daqconf.core.conf_utils import Direction, SystemCommandDatas, make_system_connections, write_json_files
+from daqconf.core.daqmodule import DAQModule
+from daqconf.core.ports import PortAllocator, normalise_host
+from daqconf.core.system import System
+from synthetic_system import make_synthetic_system, make_readout_app
+
+
+def port_table(apps):
+    system = System(apps)
+    make_system_connections(system, use_connectivity_service=False)
+    return system.port_allocator.table()
+
+
+def make_app(name, *directions, host="localhost"):
+    """An app with one endpoint named "x" for each of `directions`"""
+    modules = [DAQModule(name=f"m{i}", plugin="X") for i in range(len(directions))]
+    mgraph = ModuleGraph(modules)
+    for module, direction in zip(modules, directions):
+        mgraph.add_endpoint("x", f"{module.name}.{'in' if direction == Direction.IN else 'out'}", "T", direction)
+    return App(mgraph, host=host, name=name)
+
+
+def test_ports_do_not_depend_on_app_order():
+    # Every readout app on one host, so that there are plenty of collisions
+    apps = make_synthetic_system(n_ru=150, n_streams=2, n_hosts=1).apps
+    expected = port_table(dict(apps))
+    names = list(apps)
+    for seed in range(3):
+        random.Random(seed).shuffle(names)
+        assert port_table({name: apps[name] for name in names}) == expected
+
+
+def test_assign_all_resolves_collisions_in_uid_order():
+    allocator = PortAllocator(1000, 1003)
+    uids = ["a", "b", "c", "d"]
+    allocator.assign_all([("host", uid) for uid in reversed(uids)])
+    shuffled = PortAllocator(1000, 1003)
+    shuffled.assign_all([("host", uid) for uid in ["c", "a", "d", "b"]])
+    assert allocator.table() == shuffled.table()
+    assert sorted(allocator.table()["host"].values()) == [1000, 1001, 1002, 1003]
+
+
+def test_names_of_this_machine_share_ports(monkeypatch):
+    monkeypatch.setattr(socket, "gethostname", lambda: "daq01")
+    monkeypatch.setattr(socket, "getfqdn", lambda: "daq01.example.org")
+    normalise_host.cache_clear()
+    try:
+        assert {normalise_host(host) for host in ("localhost", "127.0.0.1", "daq01", "DAQ01.example.org")} == {"daq01"}
+        assert normalise_host("daq02.example.org") == "daq02.example.org"
+
+        system = System({"a": make_app("a", Direction.OUT), "b": make_app("b", Direction.IN, host="daq01.example.org")})
+        assert system.port_host("a") == system.port_host("b")
+    finally:
+        normalise_host.cache_clear()
+
+
+def test_update_app_releases_ports():
+    system = make_synthetic_system(n_ru=2, n_streams=2)
+    make_system_connections(system, use_connectivity_service=False)
+    assert "data_requests_for_ru1" in system.port_allocator.table()["ru-host-1"]
+
+    system.update_app("ru1", make_readout_app(1, 2, True, 2, host="ru-host-moved"))
+    table = system.port_allocator.table()
+    assert "data_requests_for_ru1" not in table["ru-host-1"]
+    assert "data_requests_for_ru1" in table["ru-host-moved"]
+
+
+def test_write_json_files_writes_ports(tmp_path):
+    system = make_synthetic_system(n_ru=2, n_streams=2)
+    make_system_connections(system, use_connectivity_service=False)
+    write_json_files({}, SystemCommandDatas(port_allocator=system.port_allocator), tmp_path)
+    with open(tmp_path / "ports.json") as f:
+        assert json.load(f)["ports"] == system.port_allocator.table()
+
+    system = make_synthetic_system(n_ru=2, n_streams=2)
+    make_system_connections(system)
+    write_json_files({}, SystemCommandDatas(port_allocator=system.port_allocator), tmp_path / "cs")
+    assert not (tmp_path / "cs" / "ports.json").exists()
+
+
+@pytest.mark.parametrize("use_k8s", [False, True])
+def test_connection_without_consumers(use_k8s):
+    system = System({"a": make_app("a", Direction.OUT), "b": make_app("b", Direction.OUT)})
+    with pytest.raises(ValueError, match="has no consumers"):
+        make_system_connections(system, use_k8s=use_k8s, use_connectivity_service=False)
+
+
+def test_connection_with_multiple_receivers():
+    system = System({"a": make_app("a", Direction.OUT), "b": make_app("b", Direction.IN), "c": make_app("c", Direction.IN)})
+    with pytest.raises(ValueError, match="multiple receivers"):
+        make_system_connections(system, use_connectivity_service=False)
@@ -0,0 +1,59 @@
+"""
+Profiling turned on by boot.profile: the parsing of the configuration
+is recorded, and a profiler that is already running (as in the
+generation service) keeps its phases and gets memory tracing added.
+"""
+
+import offline_env
+offline_env.install()
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from daqconf.core.config_file import _enable_boot_profiling
+from daqconf.core.profiling import disable_profiling, enable_profiling, phase, profiler
+
+
+def boot_conf(profile=True, profile_cprofile=False):
+    return SimpleNamespace(boot=SimpleNamespace(profile=profile, profile_cprofile=profile_cprofile))
+
+
+@pytest.fixture(autouse=True)
+def stop_profiling():
+    yield
+    disable_profiling()
+
+
+def test_boot_profile_records_the_parsing():
+    parse_start = (time.perf_counter(), time.process_time())
+    _enable_boot_profiling(boot_conf(), parse_start)
+    assert profiler.enabled and profiler.memory
+    assert [record["name"] for record in profiler.phases] == ["parse_config_file"]
+    assert profiler.phases[0]["start"] == 0.
+
+    with phase("after"):
+        pass
+    assert "peak_memory" in profiler.phases[-1]
+
+
+def test_no_boot_profile():
+    _enable_boot_profiling(boot_conf(profile=False), (time.perf_counter(), time.process_time()))
+    assert not profiler.enabled
+
+
+def test_boot_profile_reconfigures_a_running_profiler():
+    enable_profiling(memory=False)
+    with phase("generate"):
+        with phase("parse_config_file"):
+            pass
+        _enable_boot_profiling(boot_conf(profile_cprofile=True), (time.perf_counter(), time.process_time()))
+        assert profiler.memory and profiler.cprofile is not None
+        with phase("after"):
+            pass
+
+    phases = {record["name"]: record for record in profiler.phases}
+    assert list(phases) == ["generate", "parse_config_file", "after"]
+    assert "peak_memory" in phases["after"]
+    assert "peak_memory" not in phases["generate"] and "memory_start" not in phases["generate"]
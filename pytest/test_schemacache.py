@@ -0,0 +1,65 @@
+"""
+The on-disk schema cache: an entry is used again only while the schema
+file and every file it imports are unchanged.
+"""
+
+import offline_env
+offline_env.install()
+
+import moo.io
+import moo.otypes
+import pytest
+
+from daqconf.core import schemacache
+
+
+def write_schemas(directory):
+    (directory / "lib").mkdir()
+    (directory / "top.jsonnet").write_text('local mid = import "mid.jsonnet";\nmid')
+    (directory / "mid.jsonnet").write_text("local leaf = import 'lib/leaf.jsonnet';\n[leaf]")
+    (directory / "lib" / "leaf.jsonnet").write_text('{ name: "leaf" }')
+
+
+def key(directory):
+    return schemacache.cache_key(directory / "top.jsonnet", [directory])
+
+
+def test_key_follows_imports(tmp_path):
+    write_schemas(tmp_path)
+    files = schemacache.schema_files(tmp_path / "top.jsonnet", [tmp_path])
+    assert set(files) == {str(tmp_path / name) for name in ("top.jsonnet", "mid.jsonnet", "lib/leaf.jsonnet")}
+
+    before = key(tmp_path)
+    assert key(tmp_path) == before
+    (tmp_path / "lib" / "leaf.jsonnet").write_text('{ name: "changed" }')
+    assert key(tmp_path) != before
+
+
+def test_key_changes_when_a_missing_import_appears(tmp_path):
+    (tmp_path / "top.jsonnet").write_text('import "later.jsonnet"')
+    before = key(tmp_path)
+    (tmp_path / "later.jsonnet").write_text("{}")
+    assert key(tmp_path) != before
+
+
+@pytest.fixture
+def fake_moo(tmp_path, monkeypatch):
+    """moo.io.load counting its calls, with `tmp_path` as model path and an empty cache"""
+    calls = []
+    monkeypatch.setattr(moo.io, "default_load_path", [str(tmp_path)], raising=False)
+    monkeypatch.setattr(moo.io, "load", lambda path, search_path: calls.append(path) or [], raising=False)
+    monkeypatch.setattr(moo.otypes, "make_type", lambda **kwargs: kwargs)
+    monkeypatch.setenv(schemacache.CACHE_ENV, str(tmp_path / "cache"))
+    return calls
+
+
+def test_changed_import_invalidates_entry(tmp_path, fake_moo):
+    write_schemas(tmp_path)
+    schemacache.load_types("top.jsonnet")
+    schemacache.load_types("top.jsonnet")
+    assert len(fake_moo) == 1
+
+    (tmp_path / "mid.jsonnet").write_text("local leaf = import 'lib/leaf.jsonnet';\n[leaf, leaf]")
+    schemacache.load_types("top.jsonnet")
+    assert len(fake_moo) == 2
+    assert schemacache.clear_schema_cache() == 2
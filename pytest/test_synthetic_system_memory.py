@@ -0,0 +1,51 @@
+"""
+Memory footprint of the configuration data model.
+
+Builds a synthetic system of 2000 streams under tracemalloc and checks
+that the peak memory per stream stays within budget, and that the
+model objects are slotted and share their name strings.
+"""
+
+import offline_env
+offline_env.install()
+
+import tracemalloc
+
+from daqconf.core.conf_utils import Endpoint, Queue, FragmentProducer
+from daqconf.core.daqmodule import DAQModule
+from synthetic_system import make_synthetic_system
+
+# About 8 kB per stream were measured when this test was written (10 kB
+# before the model classes were slotted), including the App digraphs
+PEAK_BYTES_PER_STREAM = 12000
+
+
+def test_peak_memory_per_stream():
+    n_ru, n_streams = 200, 10
+    # Leaves out the modules imported on first use, such as networkx
+    make_synthetic_system(n_ru=1, n_streams=1)
+    tracemalloc.start()
+    try:
+        system = make_synthetic_system(n_ru=n_ru, n_streams=n_streams)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(system.apps) > n_ru
+    assert peak / (n_ru * n_streams) < PEAK_BYTES_PER_STREAM
+
+
+def test_model_objects_are_slotted():
+    system = make_synthetic_system(n_ru=2, n_streams=2)
+    mgraph = system.apps["ru0"].modulegraph
+    objects = mgraph.modules + mgraph.endpoints + mgraph.queues + list(mgraph.fragment_producers.values())
+    assert {type(obj) for obj in objects} == {DAQModule, Endpoint, Queue, FragmentProducer}
+    for obj in objects:
+        assert not hasattr(obj, "__dict__")
+
+
+def test_names_are_shared():
+    system = make_synthetic_system(n_ru=2, n_streams=2)
+    mgraph = system.apps["ru0"].modulegraph
+    producer = mgraph.fragment_producers[next(iter(mgraph.fragment_producers))]
+    pushed = [module for queue in mgraph.queues for module in queue.push_modules]
+    assert any(module is producer.fragments_out for module in pushed)
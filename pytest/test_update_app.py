@@ -0,0 +1,63 @@
+"""
+Incremental connection resolution: replacing an app with System.update_app
+gives the same connections, queues and endpoint names as resolving the
+whole system again.
+"""
+
+import offline_env
+offline_env.install()
+
+import json
+
+import pytest
+
+from daqconf.core.app import App, ModuleGraph
+from daqconf.core.conf_utils import Direction, make_system_connections
+from daqconf.core.daqmodule import DAQModule
+from synthetic_system import make_synthetic_system, make_readout_app
+
+
+def make_paired_app(name):
+    """An app whose "paired" endpoints are turned into a queue of its own"""
+    mgraph = ModuleGraph([DAQModule(name="a", plugin="X"), DAQModule(name="b", plugin="X")])
+    mgraph.add_endpoint("paired", "a.out", "T", Direction.OUT)
+    mgraph.add_endpoint("paired", "b.in", "T", Direction.IN)
+    return App(mgraph, name=name)
+
+
+def make_system():
+    system = make_synthetic_system(n_ru=3, n_streams=2, n_dataflow=2)
+    for name in ("pair0", "pair1"):
+        system.apps[name] = make_paired_app(name)
+    return system
+
+
+def fresh_app(name):
+    if name.startswith("pair"):
+        return make_paired_app(name)
+    return make_readout_app(int(name[2:]), 2, True, 2, host=f"ru-host-{name[2:]}")
+
+
+def summary(system):
+    """The connections and queues of each app, in no particular order, and its endpoints' names"""
+    def pods(objects):
+        return sorted(json.dumps(obj.pod(), sort_keys=True) for obj in objects)
+    return {app: {"connections": pods(system.connections[app]),
+                  "queues": pods(system.queues[app]),
+                  "endpoints": [endpoint.external_name for endpoint in system.apps[app].modulegraph.endpoints]}
+            for app in system.apps}
+
+
+@pytest.mark.parametrize("name", ["pair0", "ru1"])
+@pytest.mark.parametrize("same_object", [True, False])
+def test_update_app_matches_full_resolution(name, same_object):
+    expected = make_system()
+    make_system_connections(expected)
+
+    system = make_system()
+    make_system_connections(system)
+    system.update_app(name, system.apps[name] if same_object else fresh_app(name))
+    assert summary(system) == summary(expected)
+    # Once more, on top of the incremental resolution
+    system.update_app(name, system.apps[name])
+    assert summary(system) == summary(expected)
@@ -1,25 +1,16 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
+from daqconf.core.schemas import lazy_schema
 
-moo.io.default_load_path = get_moo_model_path()
-
-# Load configuration types
-import moo.otypes
-
-moo.otypes.load_types("dpdklibs/nicsender.jsonnet")
-
-# Import new types
-import dunedaq.dpdklibs.nicsender as nsc
+nsc = lazy_schema('dpdklibs/nicsender.jsonnet')
 
 from daqconf.core.app import App, ModuleGraph
 from daqconf.core.daqmodule import DAQModule
 from daqconf.core.conf_utils import Endpoint, Direction, Queue
+from daqconf.core.profiling import profiled
 
 # Time to waait on pop()
 QUEUE_POP_WAIT_MS = 100
 
-
+@profiled()
 def get_dpdk_sender_app(
         HOST='localhost',
         NUMBER_OF_CORES=2,
@@ -10,38 +10,24 @@
 # in this directory, no modules from the readout package are used: the
 # fragments are provided by the FakeDataProd module from dfmodules
 
+from daqconf.core.schemas import lazy_schema
 
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
+basecmd = lazy_schema('rcif/cmd.jsonnet', 'dunedaq.cmdlib.cmd') # AddressedCmd,
+rccmd = lazy_schema('rcif/cmd.jsonnet') # AddressedCmd,
+cmd = lazy_schema('appfwk/cmd.jsonnet') # AddressedCmd,
+app = lazy_schema('appfwk/app.jsonnet') # AddressedCmd,
+fhsig = lazy_schema('hsilibs/fakehsieventgenerator.jsonnet')
+rconf = lazy_schema('readoutlibs/readoutconfig.jsonnet')
 
-# Load configuration types
-import moo.otypes
-moo.otypes.load_types('rcif/cmd.jsonnet')
-moo.otypes.load_types('appfwk/cmd.jsonnet')
-moo.otypes.load_types('appfwk/app.jsonnet')
-
-moo.otypes.load_types('hsilibs/fakehsieventgenerator.jsonnet')
-moo.otypes.load_types('readoutlibs/readoutconfig.jsonnet')
-
-# Import new types
-import dunedaq.cmdlib.cmd as basecmd # AddressedCmd,
-import dunedaq.rcif.cmd as rccmd # AddressedCmd,
-import dunedaq.appfwk.cmd as cmd # AddressedCmd,
-import dunedaq.appfwk.app as app # AddressedCmd,
-import dunedaq.hsilibs.fakehsieventgenerator as fhsig
-import dunedaq.readoutlibs.readoutconfig as rconf
-
-from appfwk.utils import acmd, mcmd, mrccmd, mspec
-    
 from daqconf.core.daqmodule import DAQModule
 from daqconf.core.app import ModuleGraph, App
 from daqconf.core.conf_utils import Direction, Queue
+from daqconf.core.profiling import profiled
         
 import math
 
 #===============================================================================
+@profiled()
 def get_fake_hsi_app(
         detector,
         hsi,
@@ -53,7 +39,6 @@ def get_fake_hsi_app(
         #  HOST="localhost",
         DEBUG=False
         ):
-    
 
     CLOCK_SPEED_HZ = detector.clock_speed_hz
     DATA_RATE_SLOWDOWN_FACTOR = daq_common.data_rate_slowdown_factor
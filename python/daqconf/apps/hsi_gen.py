@@ -13,28 +13,21 @@
 import math
 # from rich.console import Console
 from ..core.console import console
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
 
-# Load configuration types
-import moo.otypes
-# moo.otypes.load_types('rcif/cmd.jsonnet')
-moo.otypes.load_types('hsilibs/hsireadout.jsonnet')
-moo.otypes.load_types('hsilibs/hsicontroller.jsonnet')
-moo.otypes.load_types('readoutlibs/readoutconfig.jsonnet')
+from ..core.schemas import lazy_schema
 
-# import dunedaq.rcif.cmd as rccmd # AddressedCmd, 
-import dunedaq.hsilibs.hsireadout as hsir
-import dunedaq.hsilibs.hsicontroller as hsic
-import dunedaq.readoutlibs.readoutconfig as rconf
+# rccmd = lazy_schema('rcif/cmd.jsonnet') # AddressedCmd, 
+hsir = lazy_schema('hsilibs/hsireadout.jsonnet')
+hsic = lazy_schema('hsilibs/hsicontroller.jsonnet')
+rconf = lazy_schema('readoutlibs/readoutconfig.jsonnet')
 
 from ..core.app import App, ModuleGraph
 from ..core.daqmodule import DAQModule
 from ..core.conf_utils import Direction, Queue
+from ..core.profiling import profiled
 
 #===============================================================================
+@profiled()
 def get_timing_hsi_app(
                 detector,
                 hsi,
@@ -46,9 +39,6 @@ def get_timing_hsi_app(
                 DATA_REQUEST_TIMEOUT=1000,
                 DEBUG=False):
 
-
-
-
     # Temp vars - remove
     CLOCK_SPEED_HZ = detector.clock_speed_hz
     DATA_RATE_SLOWDOWN_FACTOR = daq_common.data_rate_slowdown_factor
@@ -1,19 +1,8 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
+from ..core.schemas import lazy_schema
 
-# Load configuration types
-import moo.otypes
-
-moo.otypes.load_types('readoutlibs/sourceemulatorconfig.jsonnet')
-moo.otypes.load_types('readoutlibs/readoutconfig.jsonnet')
-moo.otypes.load_types('dfmodules/fakedataprod.jsonnet')
-
-# Import new types
-import dunedaq.readoutlibs.sourceemulatorconfig as sec
-import dunedaq.readoutlibs.readoutconfig as rconf
-import dunedaq.dfmodules.fakedataprod as fdp
+sec = lazy_schema('readoutlibs/sourceemulatorconfig.jsonnet')
+rconf = lazy_schema('readoutlibs/readoutconfig.jsonnet')
+fdp = lazy_schema('dfmodules/fakedataprod.jsonnet')
 
 # from appfwk.utils import acmd, mcmd, mrccmd, mspec
 from os import path
@@ -22,6 +11,7 @@ from pathlib import Path
 from ..core.conf_utils import Direction, Queue
 from ..core.daqmodule import DAQModule
 from ..core.app import App, ModuleGraph
+from ..core.profiling import profiled
 from ..detreadoutmap import ReadoutUnitDescriptor, group_by_key
 
 # from detdataformats._daq_detdataformats_py import *
@@ -386,6 +376,7 @@ class ReadoutAppGenerator:
         raise NotImplementedError("create_cardreader must be implemented in detived classes!")
 
     
+    @profiled("readout_app")
     def generate(
             self,
             RU_DESCRIPTOR, 
@@ -500,6 +491,7 @@ class ReadoutAppGenerator:
     ###
     # Create Fake dataproducers Application
     ###
+    @profiled("fake_readout_app")
     def create_fake_readout_app(
             self,
             RU_DESCRIPTOR,
@@ -13,26 +13,21 @@
 from distutils.command.check import check
 import math
 
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
+from daqconf.core.schemas import lazy_schema
 
-# Load configuration types
-import moo.otypes
-moo.otypes.load_types('timinglibs/timingpartitioncontroller.jsonnet')
-import dunedaq.timinglibs.timingpartitioncontroller as tprtc
+tprtc = lazy_schema('timinglibs/timingpartitioncontroller.jsonnet')
 
 from daqconf.core.app import App, ModuleGraph
 from daqconf.core.daqmodule import DAQModule
 from daqconf.core.conf_utils import Direction
+from daqconf.core.profiling import profiled
 
 #===============================================================================
+@profiled()
 def get_tprtc_app(
         timing,                
         DEBUG=False
     ):
-    
 
     MASTER_DEVICE_NAME=timing.timing_partition_master_device_name
     TIMING_PARTITION_ID=timing.timing_partition_id
@@ -42,7 +37,6 @@ def get_tprtc_app(
     TIMING_SESSION=timing.timing_session_name
     HOST=timing.host_tprtc
 
-    
     modules = {}
 
     modules = [DAQModule(name = "tprtc",
@@ -1,30 +1,18 @@
+from daqconf.core.schemas import lazy_schema
 
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-
-# Load configuration types
-import moo.otypes
-moo.otypes.load_types('rcif/cmd.jsonnet')
-moo.otypes.load_types('appfwk/cmd.jsonnet')
-moo.otypes.load_types('appfwk/app.jsonnet')
-
-moo.otypes.load_types('dfmodules/tpstreamwriter.jsonnet')
-moo.otypes.load_types('dfmodules/hdf5datastore.jsonnet')
-
-# Import new types
-import dunedaq.dfmodules.tpstreamwriter as tpsw
-import dunedaq.hdf5libs.hdf5filelayout as h5fl
-import dunedaq.dfmodules.hdf5datastore as hdf5ds
+tpsw = lazy_schema('dfmodules/tpstreamwriter.jsonnet')
+h5fl = lazy_schema('dfmodules/hdf5datastore.jsonnet', 'dunedaq.hdf5libs.hdf5filelayout')
+hdf5ds = lazy_schema('dfmodules/hdf5datastore.jsonnet')
 
 from daqconf.core.app import App, ModuleGraph
 from daqconf.core.daqmodule import DAQModule
 from daqconf.core.conf_utils import Direction
+from daqconf.core.profiling import profiled
 
 # Time to wait on pop()
 QUEUE_POP_WAIT_MS = 100
 
+@profiled()
 def get_tpwriter_app(
         detector,
         dataflow,
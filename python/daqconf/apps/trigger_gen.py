@@ -1,67 +1,28 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-
-# Load configuration types
-import moo.otypes
-
-moo.otypes.load_types('trigger/triggeractivitymaker.jsonnet')
-moo.otypes.load_types('trigger/triggercandidatemaker.jsonnet')
-moo.otypes.load_types('trigger/customtriggercandidatemaker.jsonnet')
-moo.otypes.load_types('trigger/randomtriggercandidatemaker.jsonnet')
-moo.otypes.load_types('trigger/triggerzipper.jsonnet')
-moo.otypes.load_types('trigger/moduleleveltrigger.jsonnet')
-moo.otypes.load_types('trigger/timingtriggercandidatemaker.jsonnet')
-moo.otypes.load_types('trigger/ctbtriggercandidatemaker.jsonnet')
-moo.otypes.load_types('trigger/faketpcreatorheartbeatmaker.jsonnet')
-moo.otypes.load_types('trigger/txbuffer.jsonnet')
-moo.otypes.load_types('readoutlibs/readoutconfig.jsonnet')
-moo.otypes.load_types('trigger/tpchannelfilter.jsonnet')
-
-# Import new types
-import dunedaq.trigger.triggeractivitymaker as tam
-import dunedaq.trigger.triggercandidatemaker as tcm
-import dunedaq.trigger.customtriggercandidatemaker as ctcm
-import dunedaq.trigger.randomtriggercandidatemaker as rtcm
-import dunedaq.trigger.triggerzipper as tzip
-import dunedaq.trigger.moduleleveltrigger as mlt
-import dunedaq.trigger.timingtriggercandidatemaker as ttcm
-import dunedaq.trigger.ctbtriggercandidatemaker as ctbtcm
-import dunedaq.trigger.faketpcreatorheartbeatmaker as heartbeater
-import dunedaq.trigger.txbufferconfig as bufferconf
-import dunedaq.readoutlibs.readoutconfig as readoutconf
-import dunedaq.trigger.tpchannelfilter as chfilter
+from daqconf.core.schemas import lazy_schema
+
+tam = lazy_schema('trigger/triggeractivitymaker.jsonnet')
+tcm = lazy_schema('trigger/triggercandidatemaker.jsonnet')
+ctcm = lazy_schema('trigger/customtriggercandidatemaker.jsonnet')
+rtcm = lazy_schema('trigger/randomtriggercandidatemaker.jsonnet')
+tzip = lazy_schema('trigger/triggerzipper.jsonnet')
+mlt = lazy_schema('trigger/moduleleveltrigger.jsonnet')
+ttcm = lazy_schema('trigger/timingtriggercandidatemaker.jsonnet')
+ctbtcm = lazy_schema('trigger/ctbtriggercandidatemaker.jsonnet')
+heartbeater = lazy_schema('trigger/faketpcreatorheartbeatmaker.jsonnet')
+bufferconf = lazy_schema('trigger/txbuffer.jsonnet', 'dunedaq.trigger.txbufferconfig')
+readoutconf = lazy_schema('readoutlibs/readoutconfig.jsonnet')
+chfilter = lazy_schema('trigger/tpchannelfilter.jsonnet')
 
 from daqconf.core.app import App, ModuleGraph
 from daqconf.core.daqmodule import DAQModule
 from daqconf.core.conf_utils import Direction, Queue
 from daqconf.core.sourceid import TAInfo, TPInfo, TCInfo
+from daqconf.core.profiling import profiled
+#FIXME maybe one day, triggeralgs will define schemas... for now allow a dictionary of 4byte int, 4byte floats, strings and booleans
+from daqconf.core.recordtypes import record_type, make_moo_record
 
 import trgdataformats
 
-#FIXME maybe one day, triggeralgs will define schemas... for now allow a dictionary of 4byte int, 4byte floats, and strings
-moo.otypes.make_type(schema='number', dtype='i4', name='temp_integer', path='temptypes')
-moo.otypes.make_type(schema='number', dtype='f4', name='temp_float', path='temptypes')
-moo.otypes.make_type(schema='string', name='temp_string', path='temptypes')
-moo.otypes.make_type(schema='boolean', name='temp_boolean', path='temptypes')
-def make_moo_record(conf_dict,name,path='temptypes'):
-    fields = []
-    for pname,pvalue in conf_dict.items():
-        typename = None
-        if type(pvalue) == int:
-            typename = 'temptypes.temp_integer'
-        elif type(pvalue) == float:
-            typename = 'temptypes.temp_float'
-        elif type(pvalue) == str:
-            typename = 'temptypes.temp_string'
-        elif type(pvalue) == bool:
-            typename = 'temptypes.temp_boolean'
-        else:
-            raise Exception(f'Invalid config argument type: {type(pvalue)}')
-        fields.append(dict(name=pname,item=typename))
-    moo.otypes.make_type(schema='record', fields=fields, name=name, path=path)
-
 #===============================================================================
 def get_buffer_conf(source_id, data_request_timeout):
     return bufferconf.Conf(latencybufferconf = readoutconf.LatencyBufferConf(latency_buffer_size = 10_000_000),
@@ -109,6 +70,7 @@ def tc_source_present(use_hsi, use_fake_hsi, use_ctb, use_ctcm, use_rtcm, n_tp_s
 	return (use_hsi or use_fake_hsi or use_ctb or use_ctcm or use_rtcm or n_tp_sources)
 
 #===============================================================================
+@profiled()
 def get_trigger_app(
         trigger,
         detector,
@@ -165,13 +127,9 @@ def get_trigger_app(
     DATA_REQUEST_TIMEOUT=trigger_data_request_timeout
     HOST=trigger.host_trigger
 
-    # Generate schema for each of the maker plugins on the fly in the temptypes module
-    num_algs = len(ACTIVITY_PLUGIN)
-    for j in range(num_algs):
-        make_moo_record(ACTIVITY_CONFIG[j] , 'ActivityConf' , 'temptypes')
-        make_moo_record(CANDIDATE_CONFIG[j], 'CandidateConf', 'temptypes')
-
-    import temptypes
+    # Get the schema of each maker plugin config, generated on the fly in the temptypes module
+    ActivityConfs = [record_type(conf, 'ActivityConf') for conf in ACTIVITY_CONFIG]
+    CandidateConfs = [record_type(conf, 'CandidateConf') for conf in CANDIDATE_CONFIG]
 
     # How many clock ticks are there in a _wall clock_ second?
     ticks_per_wall_clock_s = CLOCK_SPEED_HZ / DATA_RATE_SLOWDOWN_FACTOR
@@ -216,7 +174,7 @@ def get_trigger_app(
         # Get a list of TCMaker configs if more than one exists:
         for j, cm_conf in enumerate(CANDIDATE_CONFIG):
             cm_configs.append(tcm.Conf(candidate_maker=CANDIDATE_PLUGIN[j],
-                                       candidate_maker_config=temptypes.CandidateConf(CANDIDATE_CONFIG[j])))
+                                       candidate_maker_config=CandidateConfs[j](CANDIDATE_CONFIG[j])))
     
         # (PAR 2022-06-09) The max_latency_ms here should be kept
         # larger than the corresponding value in the upstream
@@ -230,7 +188,7 @@ def get_trigger_app(
                         DAQModule(name = f'tcm_{j}',
                               plugin = 'TriggerCandidateMaker',
                               conf = tcm.Conf(candidate_maker=CANDIDATE_PLUGIN[j],
-                                     candidate_maker_config=temptypes.CandidateConf(CANDIDATE_CONFIG[j]))),
+                                     candidate_maker_config=CandidateConfs[j](CANDIDATE_CONFIG[j]))),
 
                         DAQModule(name = f'tctee_chain_{j}',
                               plugin = 'TCTee'),]
@@ -305,7 +263,7 @@ def get_trigger_app(
                                                           geoid_element=region_id,  # 2022-02-02 PL: Same comment as above
                                                           window_time=10000,  # should match whatever makes TPSets, in principle
                                                           buffer_time=10*ticks_per_wall_clock_s//1000, # 10 wall-clock ms
-                                                          activity_maker_config=temptypes.ActivityConf(ACTIVITY_CONFIG[j]))),
+                                                          activity_maker_config=ActivityConfs[j](ACTIVITY_CONFIG[j]))),
                                 DAQModule(name = f'tasettee_region_{region_id}_{j}', plugin = "TASetTee")]
 
                 # Add the zippers and TABuffers, independant of the number of algorithms we want to run concurrently.
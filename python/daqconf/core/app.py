@@ -1,9 +1,10 @@
+import sys
 from daqconf.core.daqmodule import DAQModule
-from daqconf.core.conf_utils import Endpoint, Direction, FragmentProducer, Queue
+from daqconf.core.conf_utils import Endpoint, Direction, FragmentProducer, Queue, LookupList
 from daqconf.core.sourceid import SourceID, ensure_subsystem
-import networkx as nx
 from typing import List, Dict
 
+
 class ModuleGraph:
     """
     A set of modules and connections between them.
@@ -21,24 +22,16 @@ class ModuleGraph:
     """
 
     def combine_queues(self, queues : List[Queue]):
-        output_queues = []
+        output_queues = {}
 
         for q in queues:
-            match = False
-            for oq in output_queues:
-                if oq.name == q.name:
-                    match = True
-                    for push_mod in q.push_modules:
-                        if push_mod not in oq.push_modules:
-                            oq.push_modules.append(push_mod)
-                    for pop_mod in q.pop_modules:
-                        if pop_mod not in oq.pop_modules:
-                            oq.pop_modules.append(pop_mod)
-                    break
-            if not match:
-                output_queues.append(q)
+            output_queues.setdefault(q.name, []).append(q)
 
-        return output_queues
+        for same_name in output_queues.values():
+            if len(same_name) > 1:
+                same_name[0].merge(*same_name[1:])
+
+        return [same_name[0] for same_name in output_queues.values()]
 
     def __init__(self, modules:List[DAQModule]=None, endpoints:List[Endpoint]=None, fragment_producers:Dict[int, FragmentProducer]=None, queues: List[Queue]=None):
         self.modules=modules if modules else []
@@ -46,6 +39,32 @@ class ModuleGraph:
         self.fragment_producers = fragment_producers if fragment_producers else dict()
         self.queues = self.combine_queues(queues) if queues else []
 
+    # The modules, endpoints and queues are kept in LookupLists, which
+    # hold their lookup tables (see _index)
+    @property
+    def modules(self):
+        return self._modules
+
+    @modules.setter
+    def modules(self, modules):
+        self._modules = modules if type(modules) is not list else LookupList(modules)
+
+    @property
+    def endpoints(self):
+        return self._endpoints
+
+    @endpoints.setter
+    def endpoints(self, endpoints):
+        self._endpoints = endpoints if type(endpoints) is not list else LookupList(endpoints)
+
+    @property
+    def queues(self):
+        return self._queues
+
+    @queues.setter
+    def queues(self, queues):
+        self._queues = queues if type(queues) is not list else LookupList(queues)
+
     def __repr__(self):
         return f"modulegraph(modules={self.modules}, endpoints={self.endpoints}, fragment_producers={self.fragment_producers})"
 
@@ -58,6 +77,7 @@ class ModuleGraph:
         self.modules=module_dict
 
     def digraph(self):
+        import networkx as nx
         deps = nx.DiGraph()
         modules_set = set()
 
@@ -70,10 +90,10 @@ class ModuleGraph:
         for queue in self.queues:
             for pop_mod in queue.pop_modules:
                 for push_mod in queue.push_modules:
-                    queue_start = push_mod.split(".")
+                    queue_start = [sys.intern(part) for part in push_mod.split(".")]
                     if len(queue_start) != 2:
                         raise RuntimeError(f"Bad queue config!: {queue} output module must be specified as module.queue_name")
-                    queue_end = pop_mod.split(".")
+                    queue_end = [sys.intern(part) for part in pop_mod.split(".")]
                     if len(queue_end) != 2:
                         raise RuntimeError(f"Bad queue config!: {queue} input module must be specified as module.queue_name")
                     deps.add_edge(queue_start[0], queue_end[0], label=queue.name)
@@ -81,7 +101,7 @@ class ModuleGraph:
         for endpoint in self.endpoints:
             if endpoint.internal_name is None:
                 continue
-            endpoint_internal_data = endpoint.internal_name.split(".")
+            endpoint_internal_data = [sys.intern(part) for part in endpoint.internal_name.split(".")]
             if len(endpoint_internal_data) != 2:
                 raise RuntimeError(f'Bad endpoint!: {endpoint} internal_endpoint must be specified as module.queue_name')
             to_module = endpoint_internal_data[0]
@@ -129,18 +149,76 @@ class ModuleGraph:
 
         return deps
 
+    def invalidate_indexes(self):
+        """Forget the lookup tables for modules, endpoints and queues.
+        Changes to the lists themselves are detected automatically; this
+        is only needed after changing a module/endpoint/queue in place
+        (eg renaming an endpoint)"""
+        for items in (self.modules, self.endpoints, self.queues):
+            if isinstance(items, LookupList):
+                items.lookup = None
+
+    def _index(self, kind):
+        """The lookup table for `kind` ("modules", "endpoints" or
+        "queues"), built again after any change to the list. Modules map
+        name -> position of the first module with that name, endpoints
+        (external_name, internal_name) -> endpoints, and queues name ->
+        queues"""
+        items = getattr(self, kind)
+        if isinstance(items, LookupList) and items.lookup is not None:
+            return items.lookup
+
+        index = {}
+        for i, item in enumerate(items):
+            self._add_to_index(kind, index, i, item)
+        if isinstance(items, LookupList):
+            items.lookup = index
+        return index
+
+    def _add_to_index(self, kind, index, position, item):
+        if kind == "modules":
+            index.setdefault(item.name, position)
+        elif kind == "endpoints":
+            index.setdefault((item.external_name, item.internal_name), []).append(item)
+        else:
+            index.setdefault(item.name, []).append(item)
+
+    def _append(self, kind, item):
+        """Append `item` to the `kind` list, keeping its lookup table in sync"""
+        index = self._index(kind)
+        items = getattr(self, kind)
+        items.append(item)
+        self._add_to_index(kind, index, len(items) - 1, item)
+        if isinstance(items, LookupList):
+            items.lookup = index
+
+    def _replace_module(self, position, module):
+        """Put `module` at `position`, keeping the lookup table if it has the same name"""
+        index = self._index("modules")
+        same_name = self.modules[position].name == module.name
+        self.modules[position] = module
+        if same_name and isinstance(self.modules, LookupList):
+            self.modules.lookup = index
+
+    def _module_position(self, name):
+        position = self._index("modules").get(name)
+        if position is not None and self.modules[position].name != name:
+            # A module was renamed in place
+            self.invalidate_indexes()
+            position = self._index("modules").get(name)
+        return position
+
     def get_module(self, name):
-        for mod in self.modules:
-            if mod.name == name:
-                return mod
-        return None
+        position = self._module_position(name)
+        if position is None:
+            return None
+        return self.modules[position]
 
     def reset_module(self, name, new_module):
-        for i,mod in enumerate(self.modules):
-            if mod.name == name:
-                self.modules[i] = new_module
-                return
-        raise RuntimeError(f'Module {name} not found!')
+        position = self._module_position(name)
+        if position is None:
+            raise RuntimeError(f'Module {name} not found!')
+        self._replace_module(position, new_module)
 
     def reset_module_conf(self, name, new_conf):
         """Replace the configuration object of the module `name` with the new object `conf`"""
@@ -149,15 +227,14 @@ class ModuleGraph:
         # way (returning a copy of the attribute, not returning a
         # reference to it), which means we have to copy and replace the
         # whole module
-        for i,mod in enumerate(self.modules):
-            if mod.name == name:
-                old_module = self.modules[i]
-                new_module = DAQModule(name=name,
-                                       plugin=old_module.plugin,
-                                       conf=new_conf)
-                self.modules[i] = new_module
-                return
-        raise RuntimeError(f'Module {name} not found!')
+        position = self._module_position(name)
+        if position is None:
+            raise RuntimeError(f'Module {name} not found!')
+        old_module = self.modules[position]
+        new_module = DAQModule(name=name,
+                               plugin=old_module.plugin,
+                               conf=new_conf)
+        self._replace_module(position, new_module)
 
     def module_names(self):
         return [n.name for n in self.modules]
@@ -169,18 +246,18 @@ class ModuleGraph:
         if self.get_module(name):
             raise RuntimeError(f"Module of name {name} already exists in this modulegraph")
         mod=DAQModule(name=name, **kwargs)
-        self.modules.append(mod)
+        self._append("modules", mod)
         return mod
 
     def has_endpoint(self, external_name, internal_name):
-        for endpoint in self.endpoints:
+        for endpoint in self._index("endpoints").get((external_name, internal_name), []):
             if endpoint.external_name == external_name and endpoint.internal_name == internal_name:
                 return True
         return False
 
     def add_endpoint(self, external_name:str, internal_name:str, data_type:str, inout:Direction, is_pubsub=False, toposort=False, check_endpoints=True):
         if not self.has_endpoint(external_name, internal_name):
-            self.endpoints += [Endpoint(external_name, data_type, internal_name, inout, is_pubsub=is_pubsub, toposort=toposort, check_endpoints=check_endpoints)]
+            self._append("endpoints", Endpoint(external_name, data_type, internal_name, inout, is_pubsub=is_pubsub, toposort=toposort, check_endpoints=check_endpoints))
         else:
             raise KeyError(f"Endpoint {external_name} - {internal_name} already registered")
         
@@ -194,22 +271,22 @@ class ModuleGraph:
     def connect_modules(self, push_addr:str, pop_addr:str, data_type:str, queue_name:str = "", size_hint:int = 10, toposort = True):
         queue_start = push_addr.split(".")
         queue_end = pop_addr.split(".")
-        if len(queue_start) < 2 or queue_start[0] not in self.module_names():
+        module_index = self._index("modules")
+        if len(queue_start) < 2 or queue_start[0] not in module_index:
             raise RuntimeError(f"connect_modules called with invalid parameters. push_addr ({push_addr}) must be of form <module>.<internal name>, and the module must already be in the module graph!")
 
-        if len(queue_end) < 2 or queue_end[0] not in self.module_names():
+        if len(queue_end) < 2 or queue_end[0] not in module_index:
             raise RuntimeError(f"connect_modules called with invalid parameters. pop_addr ({pop_addr}) must be of form <module>.<internal name>, and the module must already be in the module graph!")
 
         if queue_name == "":
-            self.queues.append(Queue(push_addr, pop_addr, data_type, push_addr + "_to_" + pop_addr, size_hint, toposort))
+            self._append("queues", Queue(push_addr, pop_addr, data_type, push_addr + "_to_" + pop_addr, size_hint, toposort))
         else:
-            existing_queue = False
-            for queue in self.queues:
+            for queue in self._index("queues").get(queue_name, []):
                 if queue.name == queue_name:
                     queue.add_module_link(push_addr, pop_addr)
-                    existing_queue = True
-            if not existing_queue:
-                self.queues.append(Queue(push_addr, pop_addr, data_type, queue_name, size_hint, toposort))
+                    break
+            else:
+                self._append("queues", Queue(push_addr, pop_addr, data_type, queue_name, size_hint, toposort))
 
     def endpoint_names(self, inout=None):
         if inout is not None:
@@ -241,6 +318,10 @@ class App:
         self.modulegraph = modulegraph if modulegraph else ModuleGraph()
         self.name = name
 
+        # Cached by conf_utils.make_module_deps
+        self.module_deps = None
+        self.module_deps_key = None
+
         self.host = host # ssh
 
         # rest here are K8s specifics
@@ -264,4 +345,5 @@ class App:
     def export(self, filename):
         if not self.digraph:
             raise RuntimeError("Cannot export a app which doesn't have a valid digraph")
+        import networkx as nx
         nx.drawing.nx_pydot.write_dot(self.digraph, filename)
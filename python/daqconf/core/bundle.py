@@ -0,0 +1,169 @@
+"""
+Single-file configuration bundles.
+
+A bundle holds all the files of a generated configuration (boot.json,
+data/<app>_<command>.json, config/, the .info file...) in one file. It
+starts with an index giving the offset of every file, and each file is
+compressed on its own, so one app's init or conf data can be read
+without decompressing anything else:
+
+    magic (8 bytes) | version (uint32) | index size (uint64) | index (JSON) | files
+
+All integers are little-endian. The index is
+{"compression": "zlib", "entries": [{"name", "offset", "size", "raw_size", "digest"}]}
+where offsets are counted from the end of the index, and digest is the
+SHA-256 of the uncompressed file.
+"""
+
+import json
+import struct
+import zlib
+from pathlib import Path
+
+from .json_output import content_digest, encode_json, _write_file
+from .profiling import profiled
+
+BUNDLE_MAGIC = b"DAQCONF\x00"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".daqconf"
+
+_HEADER = struct.Struct("<8sIQ")
+
+
+def _as_bytes(content, output_format):
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, str):
+        return content.encode("utf-8")
+    return encode_json(content, output_format).encode("utf-8")
+
+
+@profiled()
+def write_bundle(bundle_path, entries, output_format="indented", previous=None):
+    """
+    Write a bundle holding each (name, content) pair in `entries`.
+    Content can be bytes, a string, or anything encode_json takes, which
+    is written as a JSON file in `output_format`. The bundle is written
+    to a temporary file that is renamed into place, and left alone if
+    it already has this content. Files that have the same content in
+    the ConfigBundle `previous` aren't compressed again.
+    """
+    bundle_path = Path(bundle_path)
+    index = []
+    blobs = []
+    offset = 0
+    names = set()
+    for name, content in entries:
+        if name in names:
+            raise ValueError(f"Bundle entry {name} given more than once")
+        names.add(name)
+        raw = _as_bytes(content, output_format)
+        digest = content_digest(raw)
+        if previous is not None and previous.entries.get(name, {}).get("digest") == digest:
+            blob = previous.read_compressed(name)
+        else:
+            blob = zlib.compress(raw)
+        index.append({"name": name, "offset": offset, "size": len(blob), "raw_size": len(raw), "digest": digest})
+        blobs.append(blob)
+        offset += len(blob)
+    index_bytes = json.dumps({"compression": "zlib", "entries": index}, separators=(",", ":")).encode("utf-8")
+
+    _write_file(bundle_path, b"".join([_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index_bytes)), index_bytes] + blobs))
+    return bundle_path
+
+
+def default_bundle_path(json_dir):
+    json_dir = Path(json_dir)
+    return json_dir.parent / (json_dir.name + BUNDLE_SUFFIX)
+
+
+def bundle_directory(json_dir, bundle_path=None):
+    """Pack every file under `json_dir` into a bundle (by default <json_dir>.daqconf), with names relative to `json_dir`"""
+    json_dir = Path(json_dir)
+    if bundle_path is None:
+        bundle_path = default_bundle_path(json_dir)
+    previous = ConfigBundle(bundle_path) if is_bundle(bundle_path) else None
+    paths = sorted(path for path in json_dir.rglob("*") if path.is_file())
+    return write_bundle(bundle_path, ((path.relative_to(json_dir).as_posix(), path.read_bytes()) for path in paths), previous=previous)
+
+
+def update_bundle(json_dir):
+    """Pack `json_dir` again if it has a bundle, after files were added to it or changed"""
+    if is_bundle(default_bundle_path(json_dir)):
+        bundle_directory(json_dir)
+
+
+def is_bundle(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(BUNDLE_MAGIC)) == BUNDLE_MAGIC
+    except (IsADirectoryError, FileNotFoundError):
+        return False
+
+
+class ConfigBundle:
+    """
+    Read access to a bundle. Only the index is read when the bundle is
+    opened; each read_* call then reads and decompresses a single file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{path} is not a daqconf bundle")
+            magic, version, index_size = _HEADER.unpack(header)
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"{path} is not a daqconf bundle")
+            if version != BUNDLE_VERSION:
+                raise ValueError(f"{path} is a version {version} bundle, only version {BUNDLE_VERSION} is supported")
+            index = json.loads(f.read(index_size))
+        self.data_start = _HEADER.size + index_size
+        self.entries = {entry["name"]: entry for entry in index["entries"]}
+
+    def __repr__(self):
+        return f"ConfigBundle({str(self.path)!r}, {len(self.entries)} files)"
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries.keys())
+
+    def read_compressed(self, name):
+        """The file `name` as it is stored in the bundle"""
+        entry = self.entries.get(name)
+        if entry is None:
+            raise KeyError(f"No file {name} in bundle {self.path}")
+        with open(self.path, "rb") as f:
+            f.seek(self.data_start + entry["offset"])
+            return f.read(entry["size"])
+
+    def read_bytes(self, name, verify=False):
+        entry = self.entries.get(name)
+        raw = zlib.decompress(self.read_compressed(name))
+        if verify and content_digest(raw) != entry["digest"]:
+            raise ValueError(f"File {name} in bundle {self.path} is corrupted")
+        return raw
+
+    def read_json(self, name):
+        return json.loads(self.read_bytes(name))
+
+    def app_data(self, app_name, command):
+        """The `command` data (eg "init" or "conf") of app `app_name`"""
+        return self.read_json(f"data/{app_name}_{command}.json")
+
+    def to_dict(self):
+        """All the JSON files in the bundle, as {name: content}"""
+        return {name: self.read_json(name) for name in self.entries if name.endswith(".json")}
+
+    def extract(self, dest_dir):
+        """Write the files of the bundle out under `dest_dir`, as the directory they were bundled from"""
+        dest_dir = Path(dest_dir).resolve()
+        for name in self.entries:
+            path = (dest_dir / name).resolve()
+            if dest_dir not in path.parents:
+                raise ValueError(f"File {name} in bundle {self.path} would be extracted outside of {dest_dir}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(self.read_bytes(name, verify=True))
@@ -1,33 +1,24 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-
-import urllib
+import os
+import sys
+import multiprocessing
 from pathlib import Path
-from copy import deepcopy
-from collections import namedtuple, defaultdict
-import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, InitVar
+from collections import namedtuple, defaultdict, Counter
 from enum import Enum
 from typing import Callable
-from graphviz import Digraph
-import networkx as nx
-import moo.otypes
 import copy as cp
-moo.otypes.load_types('rcif/cmd.jsonnet')
-moo.otypes.load_types('appfwk/cmd.jsonnet')
-moo.otypes.load_types('appfwk/app.jsonnet')
-
-moo.otypes.load_types('iomanager/connection.jsonnet')
 
-from appfwk.utils import acmd, mcmd, mspec
-import dunedaq.appfwk.app as appfwk  # AddressedCmd,
-import dunedaq.rcif.cmd as rccmd  # AddressedCmd,
-import dunedaq.iomanager.connection as conn
+from daqconf.core.schemas import lazy_schema, set_search_path
 
-from daqconf.core.daqmodule import DAQModule
+appfwk = lazy_schema('appfwk/app.jsonnet')  # AddressedCmd,
+rccmd = lazy_schema('rcif/cmd.jsonnet')  # AddressedCmd,
+conn = lazy_schema('iomanager/connection.jsonnet')
 
 from .console import console
+from . import json_output
+from .json_output import write_hash_manifest
+from .profiling import profiled, phase, profiler, disable_profiling, write_profile_report
 
 ########################################################################
 #
@@ -37,57 +28,211 @@ from .console import console
 
 # TODO: Understand whether extra_commands is actually needed. Seems like "resume" is already being sent to everyone?
 
-# TODO: Make these all dataclasses
+def _intern(name):
+    """Intern module, port and connection names, which are repeated across many objects in a big system"""
+    return sys.intern(name) if type(name) is str else name
+
+class LookupList(list):
+    """
+    A list with a lookup table derived from its items, built and kept in
+    `lookup` by whoever needs it. Any change to the list drops the table.
+    """
+    __slots__ = ("lookup",)
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.lookup = None
+
+def _dropping_lookup(name):
+    method = getattr(list, name)
+    def mutate(self, *args, **kwargs):
+        self.lookup = None
+        return method(self, *args, **kwargs)
+    mutate.__name__ = name
+    return mutate
+
+for _name in ("append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+              "__setitem__", "__delitem__", "__iadd__", "__imul__"):
+    setattr(LookupList, _name, _dropping_lookup(_name))
+
+def _add_unique(modules, module):
+    """Append `module` to `modules` unless it is there, looking it up in a set kept by the LookupList once it is long"""
+    if type(modules) is not LookupList or (modules.lookup is None and len(modules) < 16):
+        if module not in modules:
+            modules.append(module)
+        return
+    members = modules.lookup if modules.lookup is not None else set(modules)
+    if module not in members:
+        modules.append(module)
+        members.add(module)
+    modules.lookup = members
 
 class Direction(Enum):
     IN = 1
     OUT = 2
 
+@dataclass(slots=True, eq=False, repr=False)
 class Endpoint:
-    # def __init__(self, **kwargs):
-    #     if kwargs['connection']:
-    #         self.__init_with_nwmgr(**kwargs)
-    #     else:
-    #         self.__init_with_external_name(**kwargs)
-    def __init__(self, external_name:str, data_type:str, internal_name:str, direction:Direction, is_pubsub=False, size_hint=1000, toposort=False, check_endpoints=True):
-        self.external_name = external_name
-        self.data_type = data_type
-        self.internal_name = internal_name
-        self.direction = direction
-        self.is_pubsub = is_pubsub
-        self.size_hint = size_hint
-        self.toposort = toposort
-        self.check_endpoints = check_endpoints
+    external_name: str
+    data_type: str
+    internal_name: str
+    direction: Direction
+    is_pubsub: bool = False
+    size_hint: int = 1000
+    toposort: bool = False
+    check_endpoints: bool = True
+
+    def __post_init__(self):
+        self.external_name = _intern(self.external_name)
+        self.data_type = _intern(self.data_type)
+        self.internal_name = _intern(self.internal_name)
 
     def __repr__(self):
         return f"{'' if self.toposort else '!'}{self.external_name}/{self.internal_name}"
-    # def __init_with_nwmgr(self, connection, internal_name):
-    #     self.nwmgr_connection = connection
-    #     self.internal_name = internal_name
-    #     self.external_name = None
-    #     self.direction = Direction.IN
 
+@dataclass(slots=True, eq=False, repr=False)
 class Queue:
-    def __init__(self, push_module:str, pop_module:str, data_type:str, name:str = None, size=10, toposort=False):
-        self.name = name
-        self.data_type = data_type
-        self.size = size
-        self.push_modules = [push_module]
-        self.pop_modules = [pop_module]
-        self.toposort = toposort
+    push_module: InitVar[str]
+    pop_module: InitVar[str]
+    data_type: str
+    name: str = None
+    size: int = 10
+    toposort: bool = False
+    push_modules: list = field(init=False)
+    pop_modules: list = field(init=False)
+
+    def __post_init__(self, push_module, pop_module):
+        push_module = _intern(push_module)
+        pop_module = _intern(pop_module)
+        self.data_type = _intern(self.data_type)
+        self.push_modules = LookupList([push_module])
+        self.pop_modules = LookupList([pop_module])
         if self.name is None:
             self.name = push_module + "_to_" + pop_module
+        self.name = _intern(self.name)
 
     def add_module_link(self, push_module, pop_module):
-        if push_module not in self.push_modules:
-            self.push_modules.append(push_module)
-        if pop_module not in self.pop_modules:
-            self.pop_modules.append(pop_module)
+        _add_unique(self.push_modules, push_module)
+        _add_unique(self.pop_modules, pop_module)
+
+    def merge(self, *others):
+        """Add the modules of the queues `others` that this queue doesn't have"""
+        for other in others:
+            for push_module in other.push_modules:
+                _add_unique(self.push_modules, push_module)
+            for pop_module in other.pop_modules:
+                _add_unique(self.pop_modules, pop_module)
 
     def __repr__(self):
         return self.name
 
-FragmentProducer = namedtuple('FragmentProducer', ['source_id', 'requests_in', 'fragments_out', 'queue_name', 'is_mlt_producer'])
+@dataclass(frozen=True, slots=True)
+class FragmentProducer:
+    source_id: object
+    requests_in: str
+    fragments_out: str
+    queue_name: str
+    is_mlt_producer: bool
+
+    def __post_init__(self):
+        object.__setattr__(self, "requests_in", _intern(self.requests_in))
+        object.__setattr__(self, "fragments_out", _intern(self.fragments_out))
+        object.__setattr__(self, "queue_name", _intern(self.queue_name))
+
+
+class ConnectionRecord:
+    """
+    Book-keeping left on a System by make_system_connections: the
+    endpoint indexes the connections were resolved from, and which
+    connections and queues were produced by each external name
+    ("endpoint" keys), pub/sub connection uid ("pubsub" keys) and app's
+    internal queues ("queues" keys). update_app_connections uses it to
+    re-resolve only the part of the system that one app touches.
+    """
+
+    def __init__(self, verbose=False, use_k8s=False, use_connectivity_service=True):
+        self.verbose = verbose
+        self.use_k8s = use_k8s
+        self.use_connectivity_service = use_connectivity_service
+
+        self.endpoint_map = defaultdict(list)   # external_name -> non-pubsub endpoints
+        self.publisher_map = defaultdict(list)  # connection uid -> pubsub OUT endpoints
+        self.subscriber_map = defaultdict(list) # data_type -> pubsub IN endpoints
+        self.topic_uids = defaultdict(dict)     # data_type -> {connection uid: number of publishing endpoints}
+        self.app_keys = defaultdict(set)        # app -> (kind, key) pairs its endpoints are indexed under
+
+        self.pubsub_connectionids = {}               # connection uid -> pubsub Connection
+        self.connection_uids = defaultdict(Counter)  # app -> uids of the connections it has
+        self.produced = {}                           # (kind, key) -> app -> [(list name, object)]
+
+    def add_endpoint(self, app, endpoint):
+        entry = {"app": app, "endpoint": endpoint}
+        if not endpoint.is_pubsub:
+            key = ("endpoint", endpoint.external_name)
+            self.endpoint_map[endpoint.external_name] += [entry]
+        elif endpoint.direction == Direction.IN:
+            key = ("subscriber", endpoint.data_type)
+            self.subscriber_map[endpoint.data_type] += [entry]
+        else:
+            key = ("publisher", endpoint.external_name)
+            self.publisher_map[endpoint.external_name] += [entry]
+            uids = self.topic_uids[endpoint.data_type]
+            uids[endpoint.external_name] = uids.get(endpoint.external_name, 0) + 1
+        self.app_keys[app].add(key)
+        return key
+
+    def remove_app_endpoints(self, app):
+        """
+        Drop all of `app`'s endpoints from the indexes, and return the
+        keys they were filed under. The endpoints a resolution renamed
+        get their original external name back, so the same objects can
+        be indexed again under the same keys.
+        """
+        keys = self.app_keys.pop(app, set())
+        for kind, key in keys:
+            if kind == "endpoint":
+                index = self.endpoint_map
+                for entry in index[key]:
+                    if entry["app"] == app:
+                        entry["endpoint"].external_name = key
+            elif kind == "subscriber":
+                index = self.subscriber_map
+            else:
+                index = self.publisher_map
+                for entry in index[key]:
+                    if entry["app"] == app:
+                        uids = self.topic_uids[entry["endpoint"].data_type]
+                        uids[key] -= 1
+                        if uids[key] == 0:
+                            del uids[key]
+            index[key] = [entry for entry in index[key] if entry["app"] != app]
+            if not index[key]:
+                del index[key]
+        return keys
+
+    def track(self, key, app, list_name, obj):
+        """Record that `obj`, in the_system.<list_name>[app], was produced by `key`"""
+        self.produced.setdefault(key, {}).setdefault(app, []).append((list_name, obj))
+        if list_name == "connections":
+            self.connection_uids[app][obj.id['uid']] += 1
+
+    def forget(self, the_system, keys, app=None):
+        """Remove everything produced by `keys` (only in `app`, if given) from the system"""
+        doomed = defaultdict(set)
+        for key in keys:
+            produced = self.produced.get(key, {})
+            apps = [app] if app is not None else list(produced.keys())
+            for produced_app in apps:
+                for list_name, obj in produced.pop(produced_app, []):
+                    doomed[(list_name, produced_app)].add(id(obj))
+                    if list_name == "connections":
+                        self.connection_uids[produced_app][obj.id['uid']] -= 1
+            if not produced:
+                self.produced.pop(key, None)
+
+        for (list_name, produced_app), ids in doomed.items():
+            objects = getattr(the_system, list_name)[produced_app]
+            objects[:] = [obj for obj in objects if id(obj) not in ids]
 
 
 Publisher = namedtuple(
@@ -102,9 +247,16 @@ Sender = namedtuple("Sender", ['msg_type', 'msg_module_name', 'receiver'])
 ########################################################################
 
 def replace_localhost_ip(uri):
-    parsed = urllib.parse.urlparse(uri)
+    from urllib.parse import urlparse
+    parsed = urlparse(uri)
     return f'{parsed.scheme}://0.0.0.0:{parsed.port}'
 
+def module_deps_key(modulegraph):
+    """The parts of a modulegraph that make_module_deps depends on, used to tell whether a cached result is still valid"""
+    return (tuple(module.name for module in modulegraph.modules),
+            tuple((endpoint.external_name, endpoint.internal_name, endpoint.direction) for endpoint in modulegraph.endpoints),
+            tuple((tuple(queue.push_modules), tuple(queue.pop_modules)) for queue in modulegraph.queues if queue.toposort))
+
 def make_module_deps(app, system_connections, verbose=False):
     """
     Given a list of `module` objects, produce a dictionary giving
@@ -112,27 +264,39 @@ def make_module_deps(app, system_connections, verbose=False):
     modules. Connections whose upstream ends begin with a '!' are not
     considered dependencies, to allow us to break cycles in the DAG.
 
-    Returns a networkx DiGraph object where nodes are module names
+    Returns a networkx DiGraph object where nodes are module names. The
+    graph is cached on the app and returned again (not copied) until the
+    app's modulegraph changes.
     """
 
+    key = module_deps_key(app.modulegraph)
+    if app.module_deps is not None and app.module_deps_key == key:
+        return app.module_deps
+
+    # Index the producing (non-IN) endpoints by external name, and the
+    # receiving (IN) endpoints by module
+    producers = defaultdict(list)
+    module_inputs = defaultdict(list)
+    for endpoint in app.modulegraph.endpoints:
+        if endpoint.internal_name is None:
+            continue
+        if endpoint.direction != Direction.IN:
+            producers[endpoint.external_name].append(endpoint)
+        else:
+            mod_name, q_name = endpoint.internal_name.split(".")
+            module_inputs[mod_name].append(endpoint)
+
+    import networkx as nx
     deps = nx.DiGraph()
     for module in app.modulegraph.modules:
         deps.add_node(module.name)
 
-        for endpoint in app.modulegraph.endpoints:
-            if endpoint.internal_name is None or endpoint.direction != Direction.IN:
-                continue
-            mod_name, q_name = endpoint.internal_name.split(".")
-            if module.name != mod_name:
-                continue
-
-            for other_endpoint in app.modulegraph.endpoints:
-                if other_endpoint.internal_name is None:
-                    continue
-                if other_endpoint.external_name == endpoint.external_name and other_endpoint.internal_name != endpoint.internal_name and other_endpoint.direction != Direction.IN:
+        for endpoint in module_inputs.get(module.name, []):
+            for other_endpoint in producers.get(endpoint.external_name, []):
+                if other_endpoint.internal_name != endpoint.internal_name:
                     other_mod, other_q = other_endpoint.internal_name.split(".")
-                    if verbose: console.log(f"Adding generated dependency edge {other_mod} -> {mod_name}")
-                    deps.add_edge(other_mod, mod_name)
+                    if verbose: console.log(f"Adding generated dependency edge {other_mod} -> {module.name}")
+                    deps.add_edge(other_mod, module.name)
 
 
     for queue in app.modulegraph.queues:
@@ -145,8 +309,8 @@ def make_module_deps(app, system_connections, verbose=False):
                 if verbose: console.log(f"Adding queue dependency edge {push_mod} -> {pop_mod}")
                 deps.add_edge(push_mod, pop_mod)
 
-
-
+    app.module_deps = deps
+    app.module_deps_key = key
     return deps
 
 
@@ -165,6 +329,7 @@ def make_app_deps(the_system, forced_deps=[], verbose=False):
 
     if verbose:
         console.log("Writing app deps to make_app_deps.dot")
+        import networkx as nx
         nx.drawing.nx_pydot.write_dot(deps, "make_app_deps.dot")
 
     return deps
@@ -179,6 +344,9 @@ def add_one_command_data(command_data, command, default_params, app):
     #     else:
     #         mod_and_params.append((module, default_params))
 
+    # appfwk.utils loads the appfwk schemas when it is imported
+    set_search_path()
+    from appfwk.utils import acmd
     command_data[command] = acmd(mod_and_params)
 
 def make_queue_connection(the_system, app, endpoint_name, data_type, in_apps, out_apps, size, verbose):
@@ -186,26 +354,161 @@ def make_queue_connection(the_system, app, endpoint_name, data_type, in_apps, ou
     if len(in_apps) == 1 and len(out_apps) == 1:
         if verbose:
             console.log(f"Queue {endpoint_name}, SPSC Queue (data_type={data_type}, size={size})")
-        the_system.queues[app] += [conn.QueueConfig(id=conn_id, queue_type="kFollySPSCQueue", capacity=size)]
+        queue = conn.QueueConfig(id=conn_id, queue_type="kFollySPSCQueue", capacity=size)
     else:
         if verbose:
             console.log(f"Queue {endpoint_name}, MPMC Queue (data_type={data_type}, size={size})")
-        the_system.queues[app] += [conn.QueueConfig(id=conn_id, queue_type="kFollyMPMCQueue", capacity=size)]
+        queue = conn.QueueConfig(id=conn_id, queue_type="kFollyMPMCQueue", capacity=size)
+    the_system.queues[app] += [queue]
+    return queue
 
 def make_network_connection(the_system, endpoint_name, data_type, in_apps, out_apps, verbose, use_k8s=False, use_connectivity_service=True):
+    """Create the network connection `endpoint_name`, and return the (app, connection) pairs that were added"""
     if verbose:
         console.log(f"Connection {endpoint_name}, Network")
     if len(in_apps) > 1:
         raise ValueError(f"Connection with name {endpoint_name} has multiple receivers, which is unsupported for a network connection!")
 
-    port = the_system.next_unassigned_port() if not use_connectivity_service or use_k8s else '*'
+    port = the_system.assign_port(in_apps[0], endpoint_name, use_k8s) if not use_connectivity_service or use_k8s else '*'
     address_sender = f'tcp://{{{in_apps[0]}}}:{port}' if not use_k8s else f'tcp://{in_apps[0]}:{port}'
     conn_id = conn.ConnectionId(uid=endpoint_name, data_type=data_type)
-    the_system.connections[in_apps[0]] += [conn.Connection(id=conn_id, connection_type="kSendRecv", uri=address_sender)]
+    added = [(in_apps[0], conn.Connection(id=conn_id, connection_type="kSendRecv", uri=address_sender))]
     if not use_connectivity_service:
         for app in set(out_apps):
-            the_system.connections[app] += [conn.Connection(id=conn_id, connection_type="kSendRecv", uri=address_sender)]
+            added += [(app, conn.Connection(id=conn_id, connection_type="kSendRecv", uri=address_sender))]
+    for app, connection in added:
+        the_system.connections[app] += [connection]
+    return added
+
+def make_pubsub_connection(the_system, app, endpoint, use_k8s=False, use_connectivity_service=True):
+    port = the_system.assign_port(app, endpoint.external_name, use_k8s) if not use_connectivity_service or use_k8s else '*'
+    address = f'tcp://{{{app}}}:{port}' if not use_k8s else f'tcp://{app}:{port}'
+    conn_id = conn.ConnectionId(uid=endpoint.external_name, data_type=endpoint.data_type)
+    return conn.Connection(id=conn_id, connection_type="kPubSub", uri=address)
+
+def make_app_queues(the_system, app):
+    """Create the queues for the internal connections of `app`'s modulegraph"""
+    record = the_system.connection_record
+    for queue in the_system.apps[app].modulegraph.queues:
+        queue_config = make_queue_connection(the_system, app, queue.name, queue.data_type, queue.push_modules, queue.pop_modules, queue.size, record.verbose)
+        record.track(("queues", app), app, "queues", queue_config)
+
+def rename_endpoint(the_system, entry, external_name):
+    """Set the external name of an indexed endpoint `entry`, telling its modulegraph about it"""
+    if entry["endpoint"].external_name != external_name:
+        entry["endpoint"].external_name = external_name
+        the_system.apps[entry["app"]].modulegraph.invalidate_indexes()
+
+def endpoint_connection_kind(endpoints):
+    """
+    How the non-pubsub `endpoints` sharing one external name are
+    connected: "queue" if they are all in one app, "paired" if each app
+    has one sender and one receiver (a queue in each app), "network",
+    or None if there is nothing to connect
+    """
+    in_apps = [endpoint["app"] for endpoint in endpoints if endpoint["endpoint"].direction == Direction.IN]
+    out_apps = [endpoint["app"] for endpoint in endpoints if endpoint["endpoint"].direction != Direction.IN]
+    first_app = endpoints[0]["app"]
+    if not endpoints[0]["endpoint"].check_endpoints:
+        return "network" if len(in_apps) > 0 else None
+    if all(first_app == elem["app"] for elem in endpoints):
+        return "queue"
+    if len(in_apps) == len(out_apps):
+        # Each app must appear exactly once as a receiver and once as a sender
+        in_apps_set = set(in_apps)
+        if len(in_apps_set) == len(in_apps) and len(set(out_apps)) == len(out_apps) and in_apps_set == set(out_apps):
+            return "paired"
+    return "network"
+
+def network_port_requests(the_system, endpoint_names, uids):
+    """
+    The (app, connection uid) pairs that need a port, among the
+    non-pubsub external names `endpoint_names` and the pub/sub
+    connection uids `uids` indexed in the system's ConnectionRecord
+    """
+    record = the_system.connection_record
+    if record.use_connectivity_service and not record.use_k8s:
+        return []
+    requests = []
+    for endpoint_name in endpoint_names:
+        endpoints = record.endpoint_map.get(endpoint_name, [])
+        if len(endpoints) > 0 and endpoint_connection_kind(endpoints) == "network":
+            # Connections without a receiver are reported by resolve_endpoint_connections
+            receiver = next((entry["app"] for entry in endpoints if entry["endpoint"].direction == Direction.IN), None)
+            if receiver is not None:
+                requests += [(receiver, endpoint_name)]
+    for uid in uids:
+        publishers = record.publisher_map.get(uid, [])
+        if len(publishers) > 0:
+            requests += [(publishers[0]["app"], uid)]
+    return requests
+
+def resolve_endpoint_connections(the_system, endpoint_name):
+    """Create the queues or network connection that satisfy the
+    non-pubsub endpoints named `endpoint_name`, following the rules
+    described in make_system_connections"""
+    record = the_system.connection_record
+    verbose = record.verbose
+    endpoints = record.endpoint_map.get(endpoint_name, [])
+    if len(endpoints) == 0:
+        return
 
+    if verbose:
+        console.log(f"Processing {endpoint_name} with defined endpoints {endpoints}")
+    key = ("endpoint", endpoint_name)
+    first_app = endpoints[0]["app"]
+    check_endpoints = endpoints[0]["endpoint"].check_endpoints
+    in_apps = []
+    out_apps = []
+    size = 0
+    data_type = endpoints[0]["endpoint"].data_type
+    for endpoint in endpoints:
+        # Undo the renaming of a previous resolution, the pairing may have changed
+        rename_endpoint(the_system, endpoint, endpoint_name)
+        direction = endpoint['endpoint'].direction
+        if direction == Direction.IN:
+            in_apps += [endpoint["app"]]
+        else:
+            out_apps += [endpoint["app"]]
+        if endpoint['endpoint'].size_hint > size:
+            size = endpoint['endpoint'].size_hint
+
+    if len(in_apps) == 0 and check_endpoints:
+        raise ValueError(f"Connection with name {endpoint_name} has no consumers!")
+    if len(out_apps) == 0 and check_endpoints:
+        raise ValueError(f"Connection with name {endpoint_name} has no producers!")
+
+    kind = endpoint_connection_kind(endpoints)
+    if kind == "queue":
+        queue = make_queue_connection(the_system, first_app, endpoint_name, data_type, in_apps, out_apps, size, verbose)
+        record.track(key, first_app, "queues", queue)
+    elif kind == "paired":
+        for endpoint in endpoints:
+            rename_endpoint(the_system, endpoint, f"{endpoint['app']}.{endpoint_name}")
+        for in_app in in_apps:
+            queue = make_queue_connection(the_system,in_app, f"{in_app}.{endpoint_name}", data_type, [in_app], [in_app], size, verbose)
+            record.track(key, in_app, "queues", queue)
+
+    if kind == "network":
+        added = make_network_connection(the_system, endpoint_name, data_type, in_apps, out_apps, verbose, use_k8s=record.use_k8s, use_connectivity_service=record.use_connectivity_service)
+        for app, connection in added:
+            record.track(key, app, "connections", connection)
+
+def add_pubsub_connections(the_system, app, uids):
+    """
+    Add the pub/sub connection for each of `uids` that `app` doesn't
+    already have. The Connection object made for a uid is shared by
+    every app that uses it, so it must not be modified in place.
+    """
+    record = the_system.connection_record
+    app_uids = record.connection_uids[app]
+    new_uids = [uid for uid in uids if app_uids[uid] == 0]
+    for uid in new_uids:
+        connection = record.pubsub_connectionids[uid]
+        the_system.connections[app] += [connection]
+        record.track(("pubsub", uid), app, "connections", connection)
+
+@profiled()
 def make_system_connections(the_system, verbose=False, use_k8s=False, use_connectivity_service=True):
     """Given a system with defined apps and endpoints, create the
     set of connections that satisfy the endpoints.
@@ -221,91 +524,52 @@ def make_system_connections(the_system, verbose=False, use_k8s=False, use_connec
     If a queue connection has a single producer and single consumer, it will use FollySPSC,
     otherwise FollyMPMC will be used.
 
+    Each pub/sub connection is made once per uid, and the same object is
+    put in the connection list of every app that publishes or subscribes
+    to it.
 
+    Endpoints are indexed once up front, so the whole resolution is
+    linear in the number of endpoints in the system. The indexes, and
+    what each endpoint produced, are kept in `the_system.connection_record`
+    so that the connections of a single app can later be re-resolved
+    with update_app_connections.
     """
 
-    uids = []
-    endpoint_map = defaultdict(list)
-    topic_map = defaultdict(list)
+    record = ConnectionRecord(verbose=verbose, use_k8s=use_k8s, use_connectivity_service=use_connectivity_service)
+    the_system.connection_record = record
+    topic_map = defaultdict(list) # data_type -> pubsub endpoints, in system order
 
     for app in the_system.apps:
       the_system.connections[app] = []
       the_system.queues[app] = []
-      for queue in the_system.apps[app].modulegraph.queues:
-            make_queue_connection(the_system, app, queue.name, queue.data_type, queue.push_modules, queue.pop_modules, queue.size, verbose)
+      make_app_queues(the_system, app)
       for endpoint in the_system.apps[app].modulegraph.endpoints:
         if not endpoint.is_pubsub:
             if verbose:
                 console.log(f"Adding endpoint {endpoint.external_name}, app {app}, direction {endpoint.direction}")
-            endpoint_map[endpoint.external_name] += [{"app": app, "endpoint": endpoint}]
-            uids.append(endpoint.external_name)
         else:
             if verbose:
                 console.log(f"Getting topics for endpoint {endpoint.external_name}, app {app}, direction {endpoint.direction}")
             topic_map[endpoint.data_type] += [{"app": app, "endpoint": endpoint}]
+        record.add_endpoint(app, endpoint)
 
     for topic in topic_map.keys():
-        if topic in uids:
+        if topic in record.endpoint_map:
             raise ValueError(f"Name {topic} is both an endpoint external name and a data_type")
 
-    for endpoint_name,endpoints in endpoint_map.items():
-        if verbose:
-            console.log(f"Processing {endpoint_name} with defined endpoints {endpoints}")
-        first_app = endpoints[0]["app"]
-        check_endpoints = endpoints[0]["endpoint"].check_endpoints
-        in_apps = []
-        out_apps = []
-        size = 0
-        data_type = endpoints[0]["endpoint"].data_type
-        for endpoint in endpoints:
-            direction = endpoint['endpoint'].direction
-            if direction == Direction.IN:
-                in_apps += [endpoint["app"]]
-            else:
-                out_apps += [endpoint["app"]]
-            if endpoint['endpoint'].size_hint > size:
-                size = endpoint['endpoint'].size_hint
-
-        if len(in_apps) == 0 and check_endpoints:
-            raise ValueError(f"Connection with name {endpoint_name} has no consumers!")
-        if len(out_apps) == 0 and check_endpoints:
-            raise ValueError(f"Connection with name {endpoint_name} has no producers!")
-
-        if not check_endpoints:
-            if len(in_apps) > 0:
-                make_network_connection(the_system, endpoint_name, data_type, in_apps, out_apps, verbose, use_k8s=use_k8s, use_connectivity_service=use_connectivity_service)
-        elif all(first_app == elem["app"] for elem in endpoints):
-            make_queue_connection(the_system, first_app, endpoint_name, data_type, in_apps, out_apps, size, verbose)
-        elif len(in_apps) == len(out_apps):
-            paired_exactly = False
-            if len(set(in_apps)) == len(in_apps) and len(set(out_apps)) == len(out_apps):
-                paired_exactly = True
-                for in_app in in_apps:
-                    if(out_apps.count(in_app) != 1):
-                        paired_exactly = False
-                        break
-
-                if paired_exactly:
-                    for in_app in in_apps:
-                        for app_endpoint in the_system.apps[in_app].modulegraph.endpoints:
-                            if app_endpoint.external_name == endpoint_name:
-                                app_endpoint.external_name = f"{in_app}.{endpoint_name}"
-                        make_queue_connection(the_system,in_app, f"{in_app}.{endpoint_name}", data_type, [in_app], [in_app], size, verbose)
-
-            if paired_exactly == False:
-                make_network_connection(the_system, endpoint_name, data_type, in_apps, out_apps, verbose, use_k8s=use_k8s, use_connectivity_service=use_connectivity_service)
+    # All the ports at once, so they don't depend on the order of the apps
+    the_system.assign_ports(network_port_requests(the_system, record.endpoint_map.keys(), record.publisher_map.keys()), use_k8s=use_k8s)
+    for endpoint_name in list(record.endpoint_map.keys()):
+        resolve_endpoint_connections(the_system, endpoint_name)
 
-        else:
-            make_network_connection(the_system, endpoint_name, data_type, in_apps, out_apps, verbose, use_k8s=use_k8s, use_connectivity_service=use_connectivity_service)
-
-    pubsub_connectionids = {}
+    pubsub_connectionids = record.pubsub_connectionids
     for topic, endpoints in topic_map.items():
         if verbose:
             console.log(f"Processing {topic} with defined endpoints {endpoints}")
 
         publishers = []
         subscribers = [] # Only really care about the topics from here
-        publisher_uids = {}
+        publisher_uids = defaultdict(list)
         topic_connectionuids = []
         check_endpoints = endpoints[0]["endpoint"].check_endpoints
 
@@ -316,36 +580,102 @@ def make_system_connections(the_system, verbose=False, use_k8s=False, use_connec
             else:
                 publishers += [endpoint["app"]]
                 if endpoint['endpoint'].external_name not in pubsub_connectionids:
-                    port = the_system.next_unassigned_port() if not use_connectivity_service or use_k8s else '*'
-                    address = f'tcp://{{{endpoint["app"]}}}:{port}' if not use_k8s else f'tcp://{endpoint["app"]}:{port}'
-                    conn_id =conn.ConnectionId( uid=endpoint['endpoint'].external_name, data_type=endpoint['endpoint'].data_type)
-                    pubsub_connectionids[endpoint['endpoint'].external_name] = conn.Connection(id=conn_id,
-                        connection_type="kPubSub",
-                        uri=address
-                    )
+                    pubsub_connectionids[endpoint['endpoint'].external_name] = make_pubsub_connection(the_system, endpoint["app"], endpoint["endpoint"], use_k8s=use_k8s, use_connectivity_service=use_connectivity_service)
                 topic_connectionuids += [endpoint['endpoint'].external_name]
-                if endpoint['app'] not in publisher_uids.keys(): publisher_uids[endpoint["app"]] = []
                 publisher_uids[endpoint["app"]] += [endpoint['endpoint'].external_name]
 
         ### previously also checked for subscribers (required some), no longer a requirement
         if len(publishers) == 0 and check_endpoints:
             raise ValueError(f"Data Type {topic} has no publishers!")
 
-        for publisher in publishers:
-            publisher_connections = [c.id['uid'] for c in the_system.connections[publisher]]
-            for connid in publisher_uids[publisher]:
-                if connid not in publisher_connections:
-                    conn_copy = cp.deepcopy(pubsub_connectionids[connid])
-                    conn_copy.uri = conn_copy.uri
-                    the_system.connections[publisher] += [conn_copy]
+        for publisher in dict.fromkeys(publishers):
+            add_pubsub_connections(the_system, publisher, publisher_uids[publisher])
         if not use_connectivity_service:
-            for subscriber in subscribers:
-                subscriber_connections = [c.id['uid'] for c in the_system.connections[subscriber]]
-                for connid in topic_connectionuids:
-                    if connid not in subscriber_connections:
-                        conn_copy = cp.deepcopy(pubsub_connectionids[connid])
-                        the_system.connections[subscriber] += [conn_copy]
+            for subscriber in dict.fromkeys(subscribers):
+                add_pubsub_connections(the_system, subscriber, topic_connectionuids)
+
+def resolve_pubsub_connection(the_system, uid):
+    """(Re)create the pub/sub connection `uid` and hand it out to its publishers and, without the connectivity service, to the subscribers of its data type"""
+    record = the_system.connection_record
+    record.pubsub_connectionids.pop(uid, None)
+    publishers = record.publisher_map.get(uid, [])
+    if len(publishers) == 0:
+        return
+
+    first = publishers[0]
+    record.pubsub_connectionids[uid] = make_pubsub_connection(the_system, first["app"], first["endpoint"], use_k8s=record.use_k8s, use_connectivity_service=record.use_connectivity_service)
+    for publisher in dict.fromkeys(entry["app"] for entry in publishers):
+        add_pubsub_connections(the_system, publisher, [uid])
+    if not record.use_connectivity_service:
+        for subscriber in dict.fromkeys(entry["app"] for entry in record.subscriber_map.get(first["endpoint"].data_type, [])):
+            add_pubsub_connections(the_system, subscriber, [uid])
+
+def update_app_connections(the_system, app_names):
+    """
+    Re-resolve the connections and queues involving the apps
+    `app_names` after they have been added to, or replaced in,
+    `the_system.apps`. `make_system_connections` must have been run on
+    the system first.
+
+    Only the external names, pub/sub connection uids and subscribed
+    data types that the previous or the new versions of the apps have
+    endpoints for are touched, so the cost is proportional to the apps'
+    endpoints rather than to the whole system. Connections that get
+    re-resolved are appended to the end of the apps' lists, and keep
+    their ports unless they moved to another host.
+    """
+    record = the_system.connection_record
+    if record is None:
+        raise RuntimeError("update_app_connections called before make_system_connections")
+
+    keys = set()
+    new_keys = defaultdict(set)
+    for app_name in app_names:
+        keys |= record.remove_app_endpoints(app_name)
+        the_system.apps[app_name].modulegraph.invalidate_indexes()
+        the_system.connections.setdefault(app_name, [])
+        the_system.queues.setdefault(app_name, [])
+        record.forget(the_system, [("queues", app_name)])
+        make_app_queues(the_system, app_name)
+
+    for app_name in app_names:
+        for endpoint in the_system.apps[app_name].modulegraph.endpoints:
+            new_keys[app_name].add(record.add_endpoint(app_name, endpoint))
+        keys |= new_keys[app_name]
+
+    for kind, key in keys:
+        if kind == "endpoint" and key in record.endpoint_map and (key in record.topic_uids or key in record.subscriber_map):
+            raise ValueError(f"Name {key} is both an endpoint external name and a data_type")
+        if kind == "publisher" and key in record.publisher_map and record.publisher_map[key][0]["endpoint"].data_type in record.endpoint_map:
+            raise ValueError(f"Name {record.publisher_map[key][0]['endpoint'].data_type} is both an endpoint external name and a data_type")
+
+    endpoint_names = [key for kind, key in keys if kind == "endpoint"]
+    uids = [key for kind, key in keys if kind == "publisher"]
+    topics = [key for kind, key in keys if kind == "subscriber"]
+
+    record.forget(the_system, [("endpoint", name) for name in endpoint_names] + [("pubsub", uid) for uid in uids])
+    for app_name in app_names:
+        record.forget(the_system, [("pubsub", uid) for topic in topics for uid in record.topic_uids.get(topic, {})], app=app_name)
+
+    # Connections that are gone or moved to another host give their port back
+    the_system.assign_ports(network_port_requests(the_system, endpoint_names, uids), use_k8s=record.use_k8s, release=endpoint_names + uids)
+    for endpoint_name in endpoint_names:
+        resolve_endpoint_connections(the_system, endpoint_name)
+
+    for uid in uids:
+        resolve_pubsub_connection(the_system, uid)
+
+    for topic in topics:
+        subscribers = record.subscriber_map.get(topic, [])
+        if len(subscribers) > 0 and len(record.topic_uids.get(topic, {})) == 0 and subscribers[0]["endpoint"].check_endpoints:
+            raise ValueError(f"Data Type {topic} has no publishers!")
+        if record.use_connectivity_service:
+            continue
+        for app_name in app_names:
+            if ("subscriber", topic) in new_keys[app_name]:
+                add_pubsub_connections(the_system, app_name, list(record.topic_uids.get(topic, {})))
 
+@profiled()
 def make_app_command_data(system, app, appkey, verbose=False, use_k8s=False, use_connectivity_service=True, connectivity_service_interval=1000):
     """Given an App instance, create the 'command data' suitable for
     feeding to nanorc. The needed queues are inferred from from
@@ -401,6 +731,9 @@ def make_app_command_data(system, app, appkey, verbose=False, use_k8s=False, use
 
     if verbose:
         console.log(f"Creating mod_specs for {[ (mod.name, mod.plugin) for mod in app.modulegraph.modules ]}")
+    # appfwk.utils loads the appfwk schemas when it is imported
+    set_search_path()
+    from appfwk.utils import acmd, mspec
     mod_specs = [ mspec(mod.name, mod.plugin, app_connrefs[mod.name]) for mod in app.modulegraph.modules ]
 
     # Fill in the "standard" command entries in the command_data structure
@@ -561,6 +894,7 @@ def resolve_localhost(host):
         return socket.gethostname()
     return host
 
+@profiled()
 def generate_boot(
         boot_conf,
         system,
@@ -798,20 +1132,72 @@ def set_loose_affinity(apps, run_with_me_if_u_can):
 
 cmd_set = ["init", "conf"]
 
-
-def make_app_json(app_name, app_command_data, data_dir, verbose=False):
-    """Make the json files for a single application"""
-
-    # Backwards compatibility
-    if isinstance(data_dir, str):
-        data_dir = Path(data_dir)
+class SystemCommandDatas(dict):
+    """
+    The {command: data} of the whole system made by
+    make_system_command_datas, which also carries the `output_options`
+    of the boot configuration (see boot_output_options) and the
+    system's `port_allocator` to write_json_files
+    """
+    def __init__(self, *args, output_options=None, port_allocator=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output_options = output_options if output_options else {}
+        self.port_allocator = port_allocator
+
+def boot_output_options(boot_conf):
+    """The options of write_json_files set in `boot_conf`"""
+    return {"output_format": getattr(boot_conf, "json_output_format", "indented"),
+            "jobs": getattr(boot_conf, "jobs", 1),
+            "bundle": getattr(boot_conf, "bundle_output", False),
+            "sidecar": getattr(boot_conf, "msgpack_sidecar", False),
+            "profile": getattr(boot_conf, "profile", False)}
+
+def app_json_files(app_name, app_command_data, data_dir):
+    """The (path, data) pairs of the json files of a single application"""
+    return [(Path(data_dir) / f'{app_name}_{c}.json', app_command_data[c]) for c in cmd_set]
+
+def make_app_json(app_name, app_command_data, data_dir, verbose=False, output_format="indented", sidecar=False):
+    """Make the json files for a single application (with their MessagePack sidecars if `sidecar`), and return {path: digest}"""
 
     if verbose:
         console.log(f"make_app_json for app {app_name}")
-    for c in cmd_set:
-        with open(data_dir / f'{app_name}_{c}.json', 'w') as f:
-            json.dump(app_command_data[c].pod(), f, indent=4, sort_keys=True)
+    return json_output.write_json_file_set(app_json_files(app_name, app_command_data, data_dir), output_format, sidecar=sidecar)
+
+# The command data being written by write_apps_json, inherited by forked workers
+_json_app_command_datas = None
 
+def _write_app_json(args):
+    app_name, data_dir, output_format, sidecar = args
+    return make_app_json(app_name, _json_app_command_datas[app_name], data_dir, output_format=output_format, sidecar=sidecar)
+
+def write_apps_json(app_command_datas, data_dir, output_format="indented", jobs=1, sidecar=False):
+    """
+    Write the json files of every application in `app_command_datas`
+    to `data_dir` (with their MessagePack sidecars if `sidecar`, see
+    daqconf.core.json_output), and return {path: digest}. With `jobs`
+    > 1 (or 0, for one job per CPU) the command data of the apps is
+    turned into JSON and written in a pool of processes, where
+    processes can be forked: the workers get the command data from
+    their parent's memory, and only send back the digests.
+    """
+    global _json_app_command_datas
+    if not jobs:
+        jobs = os.cpu_count()
+    if jobs <= 1 or len(app_command_datas) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return json_output.write_json_file_set([item for app_name, command_data in app_command_datas.items()
+                                                for item in app_json_files(app_name, command_data, data_dir)],
+                                               output_format, sidecar=sidecar)
+
+    tasks = [(app_name, data_dir, output_format, sidecar) for app_name in app_command_datas.keys()]
+    _json_app_command_datas = app_command_datas
+    try:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), mp_context=multiprocessing.get_context("fork"), initializer=disable_profiling) as pool:
+            results = list(pool.map(_write_app_json, tasks, chunksize=max(1, len(tasks) // (4 * jobs))))
+    finally:
+        _json_app_command_datas = None
+    return {path: digest for digests in results for path, digest in digests.items()}
+
+@profiled()
 def make_system_command_datas(boot_conf:dict, the_system, forced_deps=[], verbose:bool=False, control_to_data_network:Callable[[str],str]=None) -> dict:
     """Generate the dictionary of commands and their data for the entire system"""
 
@@ -819,7 +1205,7 @@ def make_system_command_datas(boot_conf:dict, the_system, forced_deps=[], verbos
     #     app_deps = make_app_deps(the_system, forced_deps, verbose)
     # the_system.app_start_order = list(nx.algorithms.dag.topological_sort(app_deps))
 
-    system_command_datas=dict()
+    system_command_datas=SystemCommandDatas(output_options=boot_output_options(boot_conf), port_allocator=the_system.port_allocator)
 
     for c in cmd_set:
         console.log(f"Generating system {c} command")
@@ -865,31 +1251,71 @@ def make_system_command_datas(boot_conf:dict, the_system, forced_deps=[], verbos
 
     return system_command_datas
 
-def write_json_files(app_command_datas, system_command_datas, json_dir, verbose=False):
+def write_json_files(app_command_datas, system_command_datas, json_dir, verbose=False, output_format=None, jobs=None, bundle=None, sidecar=None):
     """Write the per-application and whole-system command data as json files in `json_dir`
+
+    Files are written concurrently, each through a temporary file that
+    is renamed into place, and files that already have the right
+    content are left alone. The digests of all of them are added to the
+    hashes.json manifest of `json_dir`. With `bundle`, the directory is
+    also packed into a <json_dir>.daqconf bundle (see
+    daqconf.core.bundle), which the metadata files written afterwards
+    (see daqconf.core.metadata) are added to. `output_format`
+    ("indented" or "compact", see daqconf.core.json_output), `jobs`
+    and `sidecar` (see write_apps_json) and `bundle` default to the
+    ones set in the boot configuration given to
+    make_system_command_datas. The network ports assigned in the system
+    given to make_system_command_datas, if any, are written to
+    ports.json (see PortAllocator.report). If the boot configuration
+    asks for a profile (see daqconf.core.profiling), the report is
+    written to `json_dir` too.
     """
 
     # Backwards compatibility
     if isinstance(json_dir, str):
         json_dir = Path(json_dir)
 
-    console.rule("JSON file creation")
-
-    data_dir = json_dir / 'data'
-    data_dir.mkdir(parents=True, exist_ok=True)
+    options = {"output_format": "indented", "jobs": 1, "bundle": False, "sidecar": False, "profile": False}
+    options.update(getattr(system_command_datas, "output_options", {}))
+    for name, value in (("output_format", output_format), ("jobs", jobs), ("bundle", bundle), ("sidecar", sidecar)):
+        if value is not None:
+            options[name] = value
 
-    # Apps
-    for app_name, command_data in app_command_datas.items():
-        make_app_json(app_name, command_data, data_dir, verbose)
+    console.rule("JSON file creation")
 
-    # System commands
-    for cmd, cfg in system_command_datas.items():
-        data_file = json_dir / f'{cmd}.json'
-        with open(data_file, 'w') as f:
-            json.dump(cfg, f, indent=4, sort_keys=True)
-        console.log(f"- {data_file} generated")
+    with phase("write_json_files"):
+        data_dir = json_dir / 'data'
+        data_dir.mkdir(parents=True, exist_ok=True)
 
-    console.log(f"System configuration generated in directory '{json_dir}'")
+        # Apps
+        if verbose:
+            for app_name in app_command_datas.keys():
+                console.log(f"make_app_json for app {app_name}")
+        digests = write_apps_json(app_command_datas, data_dir, options["output_format"], options["jobs"], options["sidecar"])
+
+        # System commands
+        for cmd, cfg in system_command_datas.items():
+            data_file = json_dir / f'{cmd}.json'
+            digests[str(data_file)] = json_output.write_json_file(data_file, cfg, options["output_format"])
+            console.log(f"- {data_file} generated")
+
+        # Network ports, only assigned without the connectivity service or with k8s
+        port_allocator = getattr(system_command_datas, "port_allocator", None)
+        if port_allocator is not None and port_allocator.uid_map:
+            ports_file = json_dir / 'ports.json'
+            digests[str(ports_file)] = json_output.write_json_file(ports_file, port_allocator.report(), options["output_format"])
+            console.log(f"- {ports_file} generated")
+
+        write_hash_manifest(json_dir, digests)
+        console.log(f"System configuration generated in directory '{json_dir}'")
+
+        if options["bundle"]:
+            from .bundle import bundle_directory
+            bundle_path = bundle_directory(json_dir)
+            console.log(f"System configuration bundled in '{bundle_path}'")
+
+    if options["profile"] and profiler.enabled:
+        write_profile_report(json_dir)
 
 
 def get_version():
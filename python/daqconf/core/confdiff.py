@@ -0,0 +1,159 @@
+"""
+Semantic diff of configurations.
+
+Instead of diffing the JSON text, diff_configs walks the two
+configurations together and lists what was added, removed or changed,
+with the path to it. Lists of objects that have an identifying field
+are matched by that field rather than by position: modules by "inst"
+(init data) or "match" (conf data), connections and queues by their
+"uid" (directly, or in their "id"), anything else by "name". Boot apps
+are already keyed by name, in a dict. So adding a module in the middle
+of a list shows up as one added module, not as every later module
+changing.
+"""
+
+import json
+from collections import namedtuple
+
+from .dedup import expand
+
+# One difference: `kind` is ADDED, REMOVED or CHANGED, `path` is the
+# tuple of keys leading to the value (see format_path), and `old`/`new`
+# are the values on either side (None where there is no value)
+Change = namedtuple("Change", ["kind", "path", "old", "new"])
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class Keyed(namedtuple("Keyed", ["field", "value"])):
+    """Path component for the entry of a list whose `field` is `value`"""
+
+    def __str__(self):
+        return f"[{self.field}={self.value}]"
+
+
+# Fields that identify the objects of a list, in order of preference
+KEY_FIELDS = ("inst", "match", "uid", "id.uid", "name")
+
+# Keys excluded from the diff by default: the configuration registry
+# gives every stored configuration a different _id
+IGNORED_KEYS = ("_id",)
+
+
+def _field(item, field):
+    for name in field.split("."):
+        if not isinstance(item, dict) or name not in item:
+            return None
+        item = item[name]
+    return item if isinstance(item, (str, int)) and not isinstance(item, bool) else None
+
+
+def _list_key(old, new):
+    """The field that identifies every object in both lists (uniquely in each), if there is one"""
+    items = old + new
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for field in KEY_FIELDS:
+        if all(_field(item, field) is not None for item in items):
+            if len({_field(item, field) for item in old}) == len(old) and len({_field(item, field) for item in new}) == len(new):
+                return field
+    return None
+
+
+def _diff(old, new, path, ignored, changes):
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in old.items():
+            if key in ignored:
+                continue
+            if key in new:
+                _diff(value, new[key], path + (key,), ignored, changes)
+            else:
+                changes.append(Change(REMOVED, path + (key,), value, None))
+        for key, value in new.items():
+            if key not in old and key not in ignored:
+                changes.append(Change(ADDED, path + (key,), None, value))
+    elif isinstance(old, list) and isinstance(new, list):
+        field = _list_key(old, new)
+        if field is None:
+            for index in range(max(len(old), len(new))):
+                if index >= len(new):
+                    changes.append(Change(REMOVED, path + (index,), old[index], None))
+                elif index >= len(old):
+                    changes.append(Change(ADDED, path + (index,), None, new[index]))
+                else:
+                    _diff(old[index], new[index], path + (index,), ignored, changes)
+            return
+        new_items = {_field(item, field): item for item in new}
+        for item in old:
+            key = _field(item, field)
+            if key in new_items:
+                _diff(item, new_items.pop(key), path + (Keyed(field, key),), ignored, changes)
+            else:
+                changes.append(Change(REMOVED, path + (Keyed(field, key),), item, None))
+        for key, item in new_items.items():
+            changes.append(Change(ADDED, path + (Keyed(field, key),), None, item))
+    else:
+        changes.append(Change(CHANGED, path, old, new))
+
+
+def diff_configs(old, new, ignored=IGNORED_KEYS):
+    """
+    The list of Changes that turn `old` into `new` (plain JSON data, or
+    moo objects). Keys in `ignored` are left out of the comparison at
+    any depth. Deduplicated data (see daqconf.core.dedup) is compared
+    in its expanded form.
+    """
+    if hasattr(old, "pod"):
+        old = old.pod()
+    if hasattr(new, "pod"):
+        new = new.pod()
+    changes = []
+    _diff(expand(old), expand(new), (), set(ignored), changes)
+    return changes
+
+
+def diff_files(old, new, ignored=IGNORED_KEYS):
+    """
+    The list of Changes between two sets of configuration files, given
+    as {file name: content} (e.g. a configuration directory or bundle).
+    The content of each file is compared as by diff_configs, under its
+    file name.
+    """
+    return diff_configs({name: expand(content) for name, content in old.items()},
+                        {name: expand(content) for name, content in new.items()}, ignored)
+
+
+def format_path(path):
+    text = ""
+    for component in path:
+        if isinstance(component, Keyed):
+            text += str(component)
+        elif isinstance(component, int):
+            text += f"[{component}]"
+        else:
+            text += ("." if text else "") + str(component)
+    return text or "."
+
+
+def format_change(change):
+    """A one line description of `change`: the path prefixed by +, - or ~, and the value(s)"""
+    path = format_path(change.path)
+    old = json.dumps(change.old, sort_keys=True)
+    new = json.dumps(change.new, sort_keys=True)
+    if change.kind == ADDED:
+        return f"+ {path}: {new}"
+    if change.kind == REMOVED:
+        return f"- {path}: {old}"
+    return f"~ {path}: {old} -> {new}"
+
+
+def diff_summary(changes):
+    """The number of changes of each kind, as {kind: count}"""
+    summary = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+    for change in changes:
+        summary[change.kind] += 1
+    return summary
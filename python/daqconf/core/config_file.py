@@ -2,22 +2,17 @@ import os
 import math
 import sys
 import glob
+import time
 # from rich.console import Console
 from collections import defaultdict
 from os.path import exists, join
 import json
 from pathlib import Path
 from . console import console
+from .profiling import profiled, profiler, enable_profiling
+from .inputcache import load_json_input
 
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-
-
-# Load configuration types
-import moo.otypes
-import moo.oschema
+from .schemas import load_schema, schema_module_name
 
 
 class ConfigSet:
@@ -48,8 +43,7 @@ class ConfigSet:
     def __init__(self,conf_file,base_name='common'):
 
         self.base_name = base_name
-        with open(conf_file,"r+") as f:
-            self.full_input = json.load(f)
+        self.full_input = load_json_input(conf_file)
 
         try:
             self.base_config = self.full_input[self.base_name]
@@ -86,14 +80,17 @@ def parse_json(filename, schemed_object):
     # basepath = filepath.parent
 
     # First pass, load the main json file
-    with open(filepath, 'r') as f:
-        try:
-            new_parameters = json.load(f)
-        except Exception as e:
-            raise RuntimeError(f"Couldn't parse {filepath}, error: {str(e)}")
+    try:
+        new_parameters = load_json_input(filepath)
+    except OSError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Couldn't parse {filepath}, error: {str(e)}")
         
     # second pass, look for references
-    subkeys = [ k for k,v in schemed_object.pod().items() if isinstance(v,dict) ]
+    # (pod() validates the whole object, so it's only done once)
+    schemed_pod = schemed_object.pod()
+    subkeys = [ k for k,v in schemed_pod.items() if isinstance(v,dict) ]
     for k in new_parameters:
         # look for keys that are associated to dicts in the schemed_obj but here are strings
         v = new_parameters[k]
@@ -108,12 +105,13 @@ def parse_json(filename, schemed_object):
                 raise RuntimeError(f'Cannot find the file {v} ({subfile_path})')
         
             console.log(f"Detected subconfiguration for {k} {v} - loading {subfile_path}")
-            with open(subfile_path, 'r') as f:
-                try:
-                    new_subpars = json.load(f)
-                except Exception as e:
-                    raise RuntimeError(f"Couldn't parse {subfile_path}, error: {str(e)}")
-                new_parameters[k] = new_subpars
+            try:
+                new_subpars = load_json_input(subfile_path)
+            except OSError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Couldn't parse {subfile_path}, error: {str(e)}")
+            new_parameters[k] = new_subpars
             
         elif '<defaults>' in v:
             cname = k
@@ -135,7 +133,7 @@ def parse_json(filename, schemed_object):
 
     try:
         # Validate the heck out of this but that doesn't change the object itself (ARG)
-        _strict_recursive_update(schemed_object.pod(), new_parameters)
+        _strict_recursive_update(schemed_pod, new_parameters)
         # now its validated, update the object with moo
         schemed_object.update(new_parameters)
     except Exception as e:
@@ -144,6 +142,7 @@ def parse_json(filename, schemed_object):
     return schemed_object
 
 
+@profiled()
 def parse_config_file(filename, configurer_conf):
     from os.path import exists, splitext
 
@@ -179,12 +178,31 @@ def helptree(ost, prefix=''):
             output += f"\n{prefix}    {field['name']} (Default: {field['default']}){docstr}"
     return "\b\n"+output
 
+def _enable_boot_profiling(config_data, parse_start):
+    """
+    Profile the rest of the generation if the boot configuration asks
+    for it (write_json_files writes the report), starting with the
+    parsing of the configuration, which began at `parse_start`
+    ((time.perf_counter(), time.process_time())). A profiler that is
+    already enabled, e.g. by the generation service, keeps its phases
+    and gets memory tracing and cProfile added.
+    """
+    boot = getattr(config_data, "boot", None)
+    if not getattr(boot, "profile", False):
+        return
+    cprofile = getattr(boot, "profile_cprofile", False)
+    if profiler.enabled:
+        profiler.reconfigure(memory=True, cprofile=cprofile)
+    else:
+        enable_profiling(memory=True, cprofile=cprofile, start=parse_start[0])
+        profiler.add_phase("parse_config_file", *parse_start)
+
+
 def generate_cli_from_schema(schema_file, schema_object_name, *args): ## doh
     def add_decorator(function):
-        moo.otypes.load_types(schema_file)
+        load_schema(schema_file)
         import importlib
-        module_name = schema_file.replace('.jsonnet', '').replace('/', '.')
-        config_module = importlib.import_module(f'dunedaq.{module_name}')
+        config_module = importlib.import_module(schema_module_name(schema_file))
         schema_object = getattr(config_module, schema_object_name)
         extra_schemas = []
         for obj_name in args:
@@ -198,7 +216,10 @@ def generate_cli_from_schema(schema_file, schema_object_name, *args): ## doh
                 extra_schemas = [getattr(config_module, obj_name)()]
 
         def configure(ctx, param, filename):
-            return parse_config_file(filename, schema_object())
+            parse_start = (time.perf_counter(), time.process_time())
+            config = parse_config_file(filename, schema_object())
+            _enable_boot_profiling(config[0], parse_start)
+            return config
 
         import click
 
@@ -1,2 +1,18 @@
-from rich.console import Console
-console = Console()
\ No newline at end of file
+class _LazyConsole:
+    """Stands for a rich Console, which is only made (and rich imported) the first time it is used"""
+
+    __slots__ = ("_console",)
+
+    def __init__(self):
+        self._console = None
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return getattr(self._console, name)
+
+
+console = _LazyConsole()
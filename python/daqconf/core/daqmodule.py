@@ -1,15 +1,22 @@
+import sys
+from dataclasses import dataclass
 
 
+@dataclass(slots=True, eq=False, repr=False)
 class DAQModule:
     """An individual DAQModule within an application, along with its
        configuration object
     """
+    plugin: str
+    conf: object = None
+    extra_commands: dict = None
+    name: str = "__module"
 
-    def __init__(self, plugin, conf=None, extra_commands=None, name="__module"):
-        self.plugin=plugin
-        self.name=name
-        self.conf=conf
-        self.extra_commands=extra_commands if extra_commands else dict()
+    def __post_init__(self):
+        # Names are repeated in queues, endpoints and command data: share them
+        if type(self.plugin) is str: self.plugin=sys.intern(self.plugin)
+        if type(self.name) is str: self.name=sys.intern(self.name)
+        self.extra_commands=self.extra_commands if self.extra_commands else dict()
 
     def __repr__(self):
         return f"{self.name} module(plugin={self.plugin}, conf={self.conf})"
@@ -0,0 +1,168 @@
+"""
+Structural deduplication of JSON configuration data.
+
+Conf data repeats the same sub-objects over and over (eg one latency
+buffer and request handler configuration per readout stream). The
+deduplicated form stores each repeated object once in a table, and
+replaces its occurrences with a reference:
+
+    {"__daqconf_dedup__": 1,
+     "table": {"<key>": <object, possibly with references>, ...},
+     "data": <the original data, with references>}
+
+where a reference is {"$dedup_ref": "<key>"}. Keys are derived from the
+content of the object, so the same data always gives the same output.
+expand() gives back the original data. Objects of the original data
+that would read as a reference (their only key is "$dedup_ref", or
+"$dedup_literal") are wrapped as {"$dedup_literal": <object>}, and data
+that has a "__daqconf_dedup__" key of its own is always put in the
+deduplicated form, even with nothing to share.
+
+Applications read flat data only: deduplicated files are for storage,
+and must be expanded before they are used.
+"""
+
+import hashlib
+import json
+
+DEDUP_MARKER = "__daqconf_dedup__"
+DEDUP_VERSION = 1
+REF_KEY = "$dedup_ref"
+LITERAL_KEY = "$dedup_literal"
+
+
+def is_deduplicated(data):
+    return isinstance(data, dict) and DEDUP_MARKER in data
+
+
+def _is_ref(node):
+    return len(node) == 1 and REF_KEY in node
+
+
+def _is_literal(node):
+    return len(node) == 1 and LITERAL_KEY in node
+
+
+def _canonical(node, canon, counts):
+    """The canonical JSON text of `node`. The text of each dict and list is cached in `canon` (keyed by id), and its occurrences counted in `counts`"""
+    if isinstance(node, dict):
+        text = "{" + ",".join(json.dumps(key) + ":" + _canonical(node[key], canon, counts) for key in sorted(node)) + "}"
+    elif isinstance(node, list):
+        text = "[" + ",".join(_canonical(item, canon, counts) for item in node) + "]"
+    else:
+        return json.dumps(node)
+    canon[id(node)] = text
+    counts[text] = counts.get(text, 0) + 1
+    return text
+
+
+def deduplicate(data, min_size=64):
+    """
+    Return the deduplicated form of `data` (plain JSON data, or a moo
+    object). Objects and lists whose canonical JSON is at least
+    `min_size` characters long and that occur more than once are put in
+    the table. If there are none, `data` itself is returned.
+    """
+    if hasattr(data, "pod"):
+        data = data.pod()
+    canon = {}
+    counts = {}
+    _canonical(data, canon, counts)
+
+    keys = {}   # canonical text -> table key
+    texts = {}  # table key -> canonical text
+    table = {}
+
+    def key_for(text):
+        if text not in keys:
+            digest = hashlib.sha256(text.encode()).hexdigest()
+            length = 12
+            while digest[:length] in texts:
+                length += 4
+            keys[text] = digest[:length]
+            texts[digest[:length]] = text
+        return keys[text]
+
+    def encode(node, top=False):
+        if not isinstance(node, (dict, list)):
+            return node
+        text = canon[id(node)]
+        if not top and counts[text] > 1 and len(text) >= min_size:
+            key = key_for(text)
+            if key not in table:
+                table[key] = None # reserve the key before encoding the content
+                table[key] = encode(node, top=True)
+            return {REF_KEY: key}
+        if isinstance(node, dict):
+            encoded = {name: encode(value) for name, value in node.items()}
+            return {LITERAL_KEY: encoded} if _is_ref(node) or _is_literal(node) else encoded
+        return [encode(item) for item in node]
+
+    encoded = encode(data, top=True)
+
+    # Objects that are only repeated inside another repeated object end up
+    # referenced once: put them back where they are used
+    refs = {}
+    def count_refs(node):
+        if isinstance(node, dict):
+            if _is_ref(node):
+                refs[node[REF_KEY]] = refs.get(node[REF_KEY], 0) + 1
+                return
+            for value in (node[LITERAL_KEY] if _is_literal(node) else node).values():
+                count_refs(value)
+        elif isinstance(node, list):
+            for item in node:
+                count_refs(item)
+    count_refs(encoded)
+    for content in table.values():
+        count_refs(content)
+
+    def inline(node):
+        if isinstance(node, dict):
+            if _is_ref(node):
+                return inline(table[node[REF_KEY]]) if refs[node[REF_KEY]] == 1 else node
+            if _is_literal(node):
+                return {LITERAL_KEY: {name: inline(value) for name, value in node[LITERAL_KEY].items()}}
+            return {name: inline(value) for name, value in node.items()}
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        return node
+
+    shared = sorted(key for key, count in refs.items() if count > 1)
+    if not shared and not is_deduplicated(data):
+        return data
+    return {DEDUP_MARKER: DEDUP_VERSION,
+            "table": {key: inline(table[key]) for key in shared},
+            "data": inline(encoded)}
+
+
+def expand(data):
+    """Return the flat form of `data`, which is returned unchanged if it isn't deduplicated"""
+    if not is_deduplicated(data):
+        return data
+    if data[DEDUP_MARKER] != DEDUP_VERSION:
+        raise ValueError(f"Unsupported deduplicated data version {data[DEDUP_MARKER]}")
+    table = data["table"]
+
+    def expand_node(node):
+        if isinstance(node, dict):
+            if _is_ref(node):
+                return expand_node(table[node[REF_KEY]])
+            if _is_literal(node):
+                return {name: expand_node(value) for name, value in node[LITERAL_KEY].items()}
+            return {name: expand_node(value) for name, value in node.items()}
+        if isinstance(node, list):
+            return [expand_node(item) for item in node]
+        return node
+
+    return expand_node(data["data"])
+
+
+def dedup_report(data, min_size=64):
+    """The sizes of the compact JSON encoding of `data` before and after deduplication, as (flat size, deduplicated size, number of shared objects)"""
+    if hasattr(data, "pod"):
+        data = data.pod()
+    deduplicated = deduplicate(data, min_size)
+    flat_size = len(json.dumps(data, separators=(",", ":"), sort_keys=True))
+    dedup_size = len(json.dumps(deduplicated, separators=(",", ":"), sort_keys=True))
+    return flat_size, dedup_size, len(deduplicated["table"]) if is_deduplicated(deduplicated) else 0
@@ -1,22 +1,15 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-
-import moo.otypes
-
-moo.otypes.load_types('trigger/moduleleveltrigger.jsonnet')
-moo.otypes.load_types('dfmodules/triggerrecordbuilder.jsonnet')
-
-import dunedaq.trigger.moduleleveltrigger as mlt
-import dunedaq.dfmodules.triggerrecordbuilder as trb
-
 from daqconf.core.conf_utils import Direction
+from daqconf.core.schemas import lazy_schema
 from daqconf.core.sourceid import source_id_raw_str, ensure_subsystem_string
 from daqconf.core.sourceid import TAInfo, TPInfo, TCInfo
 from daqdataformats import SourceID
 from .console import console
+from .profiling import profiled
+
+mlt = lazy_schema('trigger/moduleleveltrigger.jsonnet')
+trb = lazy_schema('dfmodules/triggerrecordbuilder.jsonnet')
 
+@profiled()
 def set_mlt_links(the_system, tp_infos, mlt_app_name="trigger", verbose=False):
     """
     The MLT needs to know the full list of fragment producers in the
@@ -229,6 +222,7 @@ def connect_fragment_producers(app_name, the_system, verbose=False):
         create_direct_producer_connections(app_name, the_system, verbose)
 
 
+@profiled()
 def connect_all_fragment_producers(the_system, dataflow_name="dataflow", verbose=False):
     """
     Connect all fragment producers in the system to the appropriate
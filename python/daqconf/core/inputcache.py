@@ -0,0 +1,114 @@
+"""
+Cache of what the generators make out of their input files.
+
+A process that generates several configurations, such as the generation
+service (see service.py), doesn't need to parse the same configuration
+files and detector readout maps every time. With the cache enabled,
+what was made from a file (its parsed JSON, the validated streams of a
+readout map...) is kept, keyed by the resolved path of the file, and
+made again when the size or modification time of the file changes.
+
+The cache is off by default, so one-off generation doesn't hold on to
+anything. Cached values are shared: the ones that can be modified are
+handed out as copies (see load_json_input).
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def copy_pod(pod):
+    """Copy plain data made of dicts, lists and scalars (much faster than copy.deepcopy)"""
+    if isinstance(pod, dict):
+        return {key: copy_pod(value) for key, value in pod.items()}
+    if isinstance(pod, list):
+        return [copy_pod(item) for item in pod]
+    return pod
+
+
+def file_signature(path):
+    """What tells whether file `path` changed, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class InputCache:
+
+    def __init__(self):
+        self.enabled = False
+        self.entries = {}  # (kind, path) -> (file signature, value)
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get(self, path, kind, make):
+        """The value `make(path)` made of file `path`, made again if the file changed since (or every time, if the cache is off)"""
+        if not self.enabled:
+            return make(path)
+        key = (kind, str(Path(path).resolve()))
+        signature = file_signature(key[1])
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self.stats["hits"] += 1
+                return entry[1]
+        value = make(path)
+        with self._lock:
+            self.stats["misses"] += 1
+            self.entries[key] = (signature, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+# The cache used by the generators
+input_cache = InputCache()
+
+
+class ValidationCache:
+    """
+    Remembers which files passed a validation function, keyed by their
+    resolved path and signature, so that validating an unchanged file
+    again only costs a stat. The validation must only depend on the
+    content of the file. Holds the last `max_entries` files.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.valid = OrderedDict()  # resolved path -> file signature
+        self._lock = threading.Lock()
+
+    def validate(self, path, signature, validate, data):
+        """Run validate(data) on the `data` read from file `path`, unless the file passed with the same `signature` (taken before reading it)"""
+        key = str(Path(path).resolve())
+        with self._lock:
+            if signature is not None and self.valid.get(key) == signature:
+                self.valid.move_to_end(key)
+                return
+        validate(data)
+        if signature is None:
+            return
+        with self._lock:
+            self.valid[key] = signature
+            self.valid.move_to_end(key)
+            while len(self.valid) > self.max_entries:
+                self.valid.popitem(last=False)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_json_input(path):
+    """The content of JSON file `path`, through the input cache. The caller gets its own copy"""
+    if not input_cache.enabled:
+        return _read_json(path)
+    return copy_pod(input_cache.get(path, "json", _read_json))
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .profiling import profiled
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# "indented" is the format daqconf has always written; "compact" has no
+# whitespace and is encoded with orjson when it is installed
+OUTPUT_FORMATS = ("indented", "compact")
+
+# Written next to the generated files by write_hash_manifest
+MANIFEST_NAME = "hashes.json"
+
+# Optional MessagePack copy of a JSON file, see write_json_file
+SIDECAR_SUFFIX = ".msgpack"
+
+
+
+def encode_json(data, output_format="indented"):
+    """Encode `data` (a moo object, or anything json can encode) as a JSON string with sorted keys"""
+    if hasattr(data, "pod"):
+        data = data.pod()
+    if output_format == "indented":
+        return json.dumps(data, indent=4, sort_keys=True)
+    if output_format != "compact":
+        raise ValueError(f"Unknown JSON output format {output_format}, should be one of {OUTPUT_FORMATS}")
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+        except (orjson.JSONEncodeError, TypeError):
+            # eg integers that don't fit in 64 bits: let json deal with them
+            pass
+    return json.dumps(data, separators=(",", ":"), sort_keys=True)
+
+
+def content_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(path):
+    """The digest of the file at `path`, or None if there is no such file"""
+    try:
+        with open(path, "rb") as f:
+            return content_digest(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _create_temp_file(path):
+    """Create a new temporary file next to `path`, with the permissions open() would give it, and return (fd, its path)"""
+    while True:
+        tmp_path = path.parent / f".{path.name}.{secrets.token_hex(4)}.tmp"
+        try:
+            return os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+def _write_file(path, content, skip_unchanged=True):
+    """
+    Write `content` (bytes) to `path` through a temporary file that is
+    renamed into place, so that readers never see a partial file.
+    Returns (digest of the content, whether the file was written).
+    """
+    path = Path(path)
+    digest = content_digest(content)
+    if skip_unchanged:
+        try:
+            same_size = path.stat().st_size == len(content)
+        except FileNotFoundError:
+            same_size = False
+        if same_size and file_digest(path) == digest:
+            return digest, False
+
+    fd, tmp_path = _create_temp_file(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return digest, True
+
+
+def _json_key(key):
+    # The string json.dumps turns a dict key into
+    if isinstance(key, str):
+        return key
+    if isinstance(key, (bool, type(None))):
+        return json.dumps(key)
+    if isinstance(key, float):
+        return float.__repr__(key)
+    return int.__repr__(key)
+
+
+def _as_loaded_json(data):
+    """`data` as json.loads would give it back: lists for tuples, string keys, in sorted order"""
+    if isinstance(data, dict):
+        return {key: _as_loaded_json(value) for key, value in sorted(((_json_key(key), value) for key, value in data.items()), key=lambda item: item[0])}
+    if isinstance(data, (list, tuple)):
+        return [_as_loaded_json(item) for item in data]
+    return data
+
+
+def encode_msgpack(data):
+    """Encode `data` as MessagePack, such that decode_msgpack gives what json.loads gives for its JSON encoding"""
+    if msgpack is None:
+        raise RuntimeError("The msgpack module is needed to write binary sidecar files")
+    if hasattr(data, "pod"):
+        data = data.pod()
+    return msgpack.packb(_as_loaded_json(data), use_bin_type=True)
+
+
+def encode_sidecar(data, json_digest):
+    """The sidecar of a JSON file with digest `json_digest` holding `data`"""
+    if hasattr(data, "pod"):
+        data = data.pod()
+    return encode_msgpack({"json_digest": json_digest, "data": data})
+
+
+def decode_msgpack(content):
+    if msgpack is None:
+        raise RuntimeError("The msgpack module is needed to read binary sidecar files")
+    return msgpack.unpackb(content, raw=False, strict_map_key=False)
+
+
+def sidecar_path(path):
+    """The binary sidecar of JSON file `path`: the same name with SIDECAR_SUFFIX"""
+    return Path(path).with_suffix(SIDECAR_SUFFIX)
+
+
+def write_json_file(path, data, output_format="indented", skip_unchanged=True, sidecar=False):
+    """
+    Write `data` to `path`, through a temporary file that is renamed
+    into place so that readers never see a partial file, and return the
+    digest of the content. With `skip_unchanged`, a file that already
+    has exactly this content is left alone (so its mtime doesn't change
+    either). With `sidecar`, the same data is also written in MessagePack
+    to sidecar_path(path), with the digest of the JSON file, and
+    load_json_file reads it instead of the JSON file while that digest
+    matches.
+    """
+    return _write_json_file(Path(path), data, output_format, skip_unchanged, sidecar)[str(path)]
+
+
+def _write_json_file(path, data, output_format, skip_unchanged, sidecar):
+    if hasattr(data, "pod"):
+        data = data.pod()
+    digest, _ = _write_file(path, encode_json(data, output_format).encode("utf-8"), skip_unchanged)
+    digests = {str(path): digest}
+    if sidecar:
+        binary_path = sidecar_path(path)
+        try:
+            content = encode_sidecar(data, digest)
+        except (OverflowError, TypeError):
+            # eg integers that don't fit in 64 bits: only the JSON file can hold them
+            binary_path.unlink(missing_ok=True)
+        else:
+            digests[str(binary_path)], _ = _write_file(binary_path, content, skip_unchanged)
+    return digests
+
+
+def load_json_file(path):
+    """
+    Load a file written by write_json_file, from its binary sidecar if
+    it has one that was written for the current content of the JSON file
+    (and msgpack is available), otherwise from the JSON file itself.
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        content = f.read()
+    if msgpack is not None:
+        try:
+            with open(sidecar_path(path), "rb") as f:
+                sidecar = decode_msgpack(f.read())
+        except (FileNotFoundError, ValueError):
+            sidecar = None
+        if isinstance(sidecar, dict) and sidecar.get("json_digest") == content_digest(content):
+            return sidecar["data"]
+    return json.loads(content)
+
+
+@profiled()
+def write_json_file_set(files, output_format="indented", threads=None, skip_unchanged=True, sidecar=False):
+    """
+    Write each (path, data) pair in `files` with write_json_file, using
+    a pool of `threads` threads (default 8). Returns {path: digest},
+    including the sidecar files.
+    """
+    files = list(files)
+    if threads is None:
+        threads = 8
+    write = lambda item: _write_json_file(Path(item[0]), item[1], output_format, skip_unchanged, sidecar)
+    if threads <= 1 or len(files) <= 1:
+        results = [write(item) for item in files]
+    else:
+        with ThreadPoolExecutor(max_workers=min(threads, len(files))) as pool:
+            results = list(pool.map(write, files))
+    return {path: digest for digests in results for path, digest in digests.items()}
+
+
+def write_hash_manifest(json_dir, digests):
+    """
+    Record the {path: digest} pairs in `digests` in the hashes.json
+    manifest of `json_dir`, with paths relative to `json_dir`. Entries
+    already in the manifest are kept if their file still exists, so
+    files written separately can be added to it one batch at a time.
+    The manifest itself is only rewritten if it changed.
+    """
+    json_dir = Path(json_dir)
+    manifest_path = json_dir / MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    manifest = {name: digest for name, digest in manifest.items() if (json_dir / name).exists()}
+    for path, digest in digests.items():
+        manifest[Path(os.path.relpath(path, json_dir)).as_posix()] = digest
+    write_json_file(manifest_path, manifest)
+    return manifest
@@ -3,6 +3,7 @@ import os
 import sys
 from os.path import exists, join
 
+from .bundle import update_bundle
 from .console import console
 
 def write_metadata_file(json_dir, generator, config_file):
@@ -36,6 +37,8 @@ def write_metadata_file(json_dir, generator, config_file):
         }
         json.dump(daqconf_info, f, indent=4, sort_keys=True)
 
+    update_bundle(json_dir)
+
 
 def write_config_file(json_dir, json_output_file, data):
     console.log(f'Saving metadata {json_output_file}')
@@ -52,3 +55,5 @@ def write_config_file(json_dir, json_output_file, data):
 
     with open(join(path/json_output_file), 'w') as f:
         json.dump(data.pod(), f, indent=4, sort_keys=True)
+
+    update_bundle(json_dir)
@@ -0,0 +1,207 @@
+"""
+Validation of plain data against moo types, without making moo objects.
+
+compile_checker(moo_type) walks the schema of a moo type (its _ost, and
+those of the types it refers to) once, and returns a function checking
+plain data, as loaded from JSON, against it:
+
+    check = compile_checker(dromap.DROStreamEntry)
+    problems = check(entry)    # [] if entry is valid
+
+The checks follow the schema: the type of scalars, the range of the
+number dtypes and their numeric constraints, string patterns, enum
+symbols, record fields (unknown ones, and missing ones without a
+default) and sequence items. They err on the strict side: what they
+pass, moo accepts, but what they flag should be checked again with moo,
+which may accept it (a string matching a pattern only up to a trailing
+newline, for instance) and gives the error messages. Schemas using
+features that aren't covered (string formats, for instance) can't be
+compiled: compile_checker then raises UnsupportedSchema, and moo has to
+be used instead.
+"""
+
+import importlib
+import re
+
+INT_RANGES = {f"{kind}{size}": (-2 ** (8 * size - 1), 2 ** (8 * size - 1) - 1) if kind == "i" else (0, 2 ** (8 * size) - 1)
+              for kind in "iu" for size in (1, 2, 4, 8)}
+FLOAT_DTYPES = ("f4", "f8")
+
+CONSTRAINTS = {
+    "minimum": lambda value, limit: value >= limit,
+    "maximum": lambda value, limit: value <= limit,
+    "exclusiveMinimum": lambda value, limit: value > limit,
+    "exclusiveMaximum": lambda value, limit: value < limit,
+    "multipleOf": lambda value, limit: value % limit == 0,
+}
+
+
+class UnsupportedSchema(ValueError):
+    pass
+
+
+def type_ost(moo_type):
+    """The schema description (ost) of a moo type, given as a class or as its full name"""
+    if isinstance(moo_type, str):
+        module_name, _, name = moo_type.rpartition(".")
+        try:
+            moo_type = getattr(importlib.import_module(module_name), name)
+        except (ImportError, AttributeError) as e:
+            raise UnsupportedSchema(f"Unknown type {moo_type}") from e
+    ost = vars(moo_type).get("_ost")
+    if ost is None:
+        raise UnsupportedSchema(f"{moo_type!r} has no schema")
+    return ost
+
+
+def _full_name(ost):
+    path = ost.get("path", [])
+    if isinstance(path, str):
+        path = path.split(".")
+    return ".".join(list(path) + [ost["name"]])
+
+
+def _where(path):
+    return f"{path}: " if path else ""
+
+
+def _compile_number(ost):
+    dtype = ost.get("dtype")
+    constraints = ost.get("constraints") or {}
+    unknown = set(constraints) - set(CONSTRAINTS)
+    if unknown:
+        raise UnsupportedSchema(f"Unsupported constraints {sorted(unknown)} in {_full_name(ost)}")
+    if dtype in INT_RANGES:
+        low, high = INT_RANGES[dtype]
+        accepted = (int,)
+    elif dtype in FLOAT_DTYPES:
+        low, high = None, None
+        accepted = (int, float)
+    else:
+        raise UnsupportedSchema(f"Unsupported dtype {dtype} in {_full_name(ost)}")
+    limits = [(name, CONSTRAINTS[name], limit) for name, limit in constraints.items()]
+
+    def check(value, path, problems):
+        if isinstance(value, bool) or not isinstance(value, accepted):
+            problems.append(f"{_where(path)}{value!r} is not a number of type {dtype}")
+            return
+        if low is not None and not low <= value <= high:
+            problems.append(f"{_where(path)}{value} is out of the range of {dtype}")
+        for name, satisfied, limit in limits:
+            if not satisfied(value, limit):
+                problems.append(f"{_where(path)}{value} does not satisfy {name} {limit}")
+    return check
+
+
+def _compile_string(ost):
+    if ost.get("format"):
+        raise UnsupportedSchema(f"Unsupported string format {ost['format']} in {_full_name(ost)}")
+    pattern = re.compile(ost["pattern"]) if ost.get("pattern") else None
+
+    def check(value, path, problems):
+        if not isinstance(value, str):
+            problems.append(f"{_where(path)}{value!r} is not a string")
+        elif pattern is not None and not pattern.fullmatch(value):
+            problems.append(f"{_where(path)}{value!r} does not match {pattern.pattern}")
+    return check
+
+
+def _compile_boolean(ost):
+    def check(value, path, problems):
+        if not isinstance(value, bool):
+            problems.append(f"{_where(path)}{value!r} is not a boolean")
+    return check
+
+
+def _compile_enum(ost):
+    symbols = tuple(ost["symbols"])
+
+    def check(value, path, problems):
+        if not isinstance(value, str) or value not in symbols:
+            problems.append(f"{_where(path)}{value!r} is not one of {', '.join(symbols)}")
+    return check
+
+
+def _compile_any(ost):
+    def check(value, path, problems):
+        pass
+    return check
+
+
+def _compile_record(ost, compiled):
+    fields = []
+    required = []
+    for field in ost.get("fields", []):
+        fields.append((field["name"], _reference(field["item"], compiled)))
+        if field.get("default") is None and not field.get("optional", False):
+            required.append(field["name"])
+    names = {name for name, _ in fields}
+
+    def check(value, path, problems):
+        if not isinstance(value, dict):
+            problems.append(f"{_where(path)}{value!r} is not an object")
+            return
+        prefix = f"{path}." if path else ""
+        for name in value.keys() - names:
+            problems.append(f"{prefix}{name}: unknown field")
+        for name in required:
+            if name not in value:
+                problems.append(f"{prefix}{name}: missing field")
+        for name, item_check in fields:
+            if name in value:
+                item_check[0](value[name], prefix + name, problems)
+    return check
+
+
+def _compile_sequence(ost, compiled):
+    item_check = _reference(ost["items"], compiled)
+
+    def check(value, path, problems):
+        if not isinstance(value, (list, tuple)):
+            problems.append(f"{_where(path)}{value!r} is not a sequence")
+            return
+        for index, item in enumerate(value):
+            item_check[0](item, f"{path}[{index}]", problems)
+    return check
+
+
+COMPILERS = {
+    "number": _compile_number,
+    "string": _compile_string,
+    "boolean": _compile_boolean,
+    "enum": _compile_enum,
+    "any": _compile_any,
+}
+
+
+def _reference(item, compiled):
+    """The cell holding the check of `item` (an ost or a full type name), compiling it if needed"""
+    ost = item if isinstance(item, dict) else type_ost(item)
+    name = _full_name(ost)
+    if name not in compiled:
+        # The cell is registered before compiling, for types that refer to themselves
+        cell = compiled[name] = [None]
+        schema = ost.get("schema")
+        if schema == "record":
+            cell[0] = _compile_record(ost, compiled)
+        elif schema == "sequence":
+            cell[0] = _compile_sequence(ost, compiled)
+        elif schema in COMPILERS:
+            cell[0] = COMPILERS[schema](ost)
+        else:
+            raise UnsupportedSchema(f"Unsupported schema {schema} of {name}")
+    return compiled[name]
+
+
+def compile_checker(moo_type):
+    """A function returning the problems of plain data as an instance of `moo_type` (a class or a full type name), as a list of strings"""
+    try:
+        cell = _reference(type_ost(moo_type), {})
+    except KeyError as e:
+        raise UnsupportedSchema(f"Incomplete schema, no {e} in it") from e
+
+    def checker(value, path=""):
+        problems = []
+        cell[0](value, path, problems)
+        return problems
+    return checker
@@ -0,0 +1,126 @@
+import functools
+import json
+import socket
+import zlib
+
+from .conf_utils import resolve_localhost
+from .console import console
+
+
+@functools.lru_cache(maxsize=None)
+def normalise_host(host):
+    """
+    The name `host` is filed under in the port tables, so that the
+    different names of one machine share its ports: this machine's host
+    name for localhost, 127.x.x.x and its fully qualified name, and
+    `host` in lower case otherwise
+    """
+    host = resolve_localhost(host).lower()
+    if host == socket.getfqdn().lower():
+        return socket.gethostname().lower()
+    return host
+
+
+class PortAllocator:
+    """
+    Hands out TCP ports for network connections, separately for each
+    host. The port of a connection is derived from a hash of its uid.
+    If the preferred port is already taken on the host, the next free
+    one in the range is used and the collision is recorded. Ports
+    assigned together with assign_all have their collisions resolved
+    in uid order, so they only depend on which connections there are
+    on the host, not on the order in which they are made.
+
+    Ports handed out by next_free_port (the old sequential scheme) are
+    not tied to a host, and are kept free on all of them.
+    """
+
+    def __init__(self, first_port=12346, last_port=32767):
+        if last_port < first_port:
+            raise ValueError(f"Invalid port range {first_port}-{last_port}")
+        self.first_port = first_port
+        self.last_port = last_port
+        self.port_map = {}   # host -> {port: uid}, None for ports reserved on all hosts
+        self.uid_map = {}    # host -> {uid: port}
+        self.collisions = [] # (host, uid, preferred port, uid already holding it)
+        self._next_port = first_port - 1
+        self.debug = False
+
+    def n_ports(self):
+        return self.last_port - self.first_port + 1
+
+    def preferred_port(self, uid):
+        return self.first_port + zlib.crc32(uid.encode()) % self.n_ports()
+
+    def port_taken(self, host, port):
+        return port in self.port_map.get(host, {}) or port in self.port_map.get(None, {})
+
+    def assign(self, host, uid):
+        """Get the port of connection `uid` on `host`, assigning one if it doesn't have one yet"""
+        uids = self.uid_map.setdefault(host, {})
+        if uid in uids:
+            return uids[uid]
+
+        ports = self.port_map.setdefault(host, {})
+        if len(ports) + len(self.port_map.get(None, {})) >= self.n_ports():
+            raise RuntimeError(f"No free ports left in range {self.first_port}-{self.last_port} on host {host}")
+
+        port = self.preferred_port(uid)
+        if self.port_taken(host, port):
+            holder = ports.get(port, self.port_map.get(None, {}).get(port))
+            self.collisions.append((host, uid, port, holder))
+            if self.debug: console.log(f"Port {port} for {uid} on host {host} is already used by {holder}")
+            while self.port_taken(host, port):
+                port = self.first_port + (port - self.first_port + 1) % self.n_ports()
+
+        ports[port] = uid
+        uids[uid] = port
+        if self.debug: console.log(f"Assigned port {port} to {uid} on host {host}")
+        return port
+
+    def assign_all(self, requests):
+        """Assign ports to all the (host, uid) pairs `requests`, in uid order on each host"""
+        for host, uid in sorted(set(requests), key=lambda request: (str(request[0]), request[1])):
+            self.assign(host, uid)
+
+    def release(self, uid, keep=()):
+        """Free the port of connection `uid` on every host except the ones in `keep`"""
+        for host, uids in self.uid_map.items():
+            if host is None or host in keep or uid not in uids:
+                continue
+            del self.port_map[host][uids.pop(uid)]
+
+    def reserve(self, host, port, uid):
+        """Claim a specific `port` for `uid` on `host` (or on all hosts, if `host` is None)"""
+        if self.port_taken(host, port) and self.port_map.get(host, {}).get(port) != uid:
+            raise ValueError(f"Port {port} on host {host} is already assigned to {self.port_map.get(host, {}).get(port, self.port_map.get(None, {}).get(port))}")
+        if host is None and any(port in ports for other, ports in self.port_map.items() if other is not None):
+            raise ValueError(f"Port {port} is already assigned on some host, it can't be reserved on all of them")
+        self.port_map.setdefault(host, {})[port] = uid
+        self.uid_map.setdefault(host, {})[uid] = port
+
+    def next_free_port(self):
+        """The next port after the last one returned here that is free on all hosts, reserved on all of them"""
+        port = self._next_port + 1
+        while any(port in ports for ports in self.port_map.values()):
+            port += 1
+        if port > self.last_port:
+            raise RuntimeError(f"No free ports left in range {self.first_port}-{self.last_port}")
+        self._next_port = port
+        self.reserve(None, port, f"__unassigned_{port}")
+        return port
+
+    def table(self):
+        """The ports assigned on each host, as {host: {uid: port}} sorted by host and port"""
+        return {("*" if host is None else host): dict(sorted(uids.items(), key=lambda item: item[1]))
+                for host, uids in sorted(self.uid_map.items(), key=lambda item: "*" if item[0] is None else item[0])}
+
+    def report(self):
+        """The port table and the collisions met while filling it"""
+        return {"ports": self.table(),
+                "collisions": [{"host": host, "uid": uid, "port": port, "holder": holder}
+                               for host, uid, port, holder in self.collisions]}
+
+    def export(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=4)
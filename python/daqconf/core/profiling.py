@@ -0,0 +1,239 @@
+"""
+Timing of the phases of configuration generation.
+
+Phases are marked with the `phase` context manager or the `profiled`
+decorator:
+
+    with phase("readout apps"):
+        ...
+
+    @profiled("make_system_connections")
+    def make_system_connections(...):
+
+They do nothing until enable_profiling() is called. From then on, each
+phase records its wall time, CPU time and (with `memory`) the peak of
+the memory allocated through Python, using tracemalloc, which makes
+the code it traces noticeably slower. Phases can be nested.
+write_profile_report() then writes all of that to a JSON report, plus
+a speedscope (https://www.speedscope.app) timeline of the phases and,
+if enable_profiling was given `cprofile`, a cProfile dump that can be
+read with pstats or snakeviz.
+
+Phases should only be entered from the main thread: the ones entered
+in other threads are not recorded.
+"""
+
+import cProfile
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from .console import console
+
+PROFILE_REPORT_NAME = "profile.json"
+
+
+class PhaseProfiler:
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.cprofile = None
+        self.phases = []
+        self._stack = []  # open phases, as [record, running peak]
+        self._start = None
+
+    def enable(self, memory=True, cprofile=False, start=None):
+        """Start recording phases, with times counted from `start` (a time.perf_counter() value, now by default)"""
+        self.enabled = True
+        self.memory = memory
+        self.cprofile = None
+        self.phases = []
+        self._stack = []
+        self._start = time.perf_counter() if start is None else start
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def reconfigure(self, memory=False, cprofile=False):
+        """
+        Turn on memory tracing and/or cProfile in an enabled profiler,
+        keeping the phases recorded so far. The phases that are already
+        open don't get memory figures.
+        """
+        if memory and not self.memory:
+            self.memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if cprofile and self.cprofile is None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def add_phase(self, name, start, cpu_start):
+        """Record phase `name`, which started at `start` (time.perf_counter()) and `cpu_start` (time.process_time()) and just ended"""
+        if not self._recording():
+            return
+        self.phases.append({"name": name,
+                            "path": "/".join([open_phase["name"] for open_phase, _ in self._stack] + [name]),
+                            "depth": len(self._stack),
+                            "start": start - self._start,
+                            "wall": time.perf_counter() - start,
+                            "cpu": time.process_time() - cpu_start})
+
+    def disable(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+
+    def _recording(self):
+        return self.enabled and threading.current_thread() is threading.main_thread()
+
+    def enter(self, name):
+        if not self._recording():
+            return
+        record = {"name": name,
+                  "path": "/".join([open_phase["name"] for open_phase, _ in self._stack] + [name]),
+                  "depth": len(self._stack),
+                  "start": time.perf_counter() - self._start,
+                  "cpu_start": time.process_time()}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            record["memory_start"] = current
+        self.phases.append(record)
+        self._stack.append([record, 0])
+
+    def exit(self, name):
+        if not self._recording() or not self._stack:
+            return
+        record, running_peak = self._stack.pop()
+        if record["name"] != name:
+            raise RuntimeError(f"Profiling phase {name} ended while phase {record['name']} was still open")
+        record["wall"] = time.perf_counter() - self._start - record["start"]
+        record["cpu"] = time.process_time() - record.pop("cpu_start")
+        if "memory_start" in record:
+            current, peak = tracemalloc.get_traced_memory()
+            record["peak_memory"] = max(running_peak, peak)
+            record["memory_delta"] = current - record.pop("memory_start")
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], record["peak_memory"])
+
+    def totals(self):
+        """The number of times each phase ran, with its total wall and CPU time, as {name: {"count", "wall", "cpu"}}"""
+        totals = {}
+        for record in self.phases:
+            if "wall" not in record:
+                continue
+            total = totals.setdefault(record["name"], {"count": 0, "wall": 0., "cpu": 0.})
+            total["count"] += 1
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"]
+        return totals
+
+    def speedscope(self):
+        """The phases as a speedscope "evented" profile"""
+        frames = []
+        frame_index = {}
+        events = []
+        for record in self.phases:
+            if "wall" not in record:
+                continue
+            if record["name"] not in frame_index:
+                frame_index[record["name"]] = len(frames)
+                frames.append({"name": record["name"]})
+            frame = frame_index[record["name"]]
+            events.append((record["start"], 1, -record["depth"], {"type": "O", "frame": frame, "at": record["start"]}))
+            events.append((record["start"] + record["wall"], 0, record["depth"], {"type": "C", "frame": frame, "at": record["start"] + record["wall"]}))
+        # At equal times, close inner phases first, then open outer ones first
+        events = [event for *_, event in sorted(events, key=lambda event: event[:3])]
+        end = max((event["at"] for event in events), default=0.)
+        return {"$schema": "https://www.speedscope.app/file-format-schema.json",
+                "shared": {"frames": frames},
+                "profiles": [{"type": "evented", "name": "daqconf generation", "unit": "seconds",
+                              "startValue": 0., "endValue": end, "events": events}],
+                "exporter": "daqconf"}
+
+    def write_report(self, output_dir, name=PROFILE_REPORT_NAME):
+        """
+        Write the report to `output_dir`/`name`, the speedscope timeline
+        next to it (as <name>.speedscope.json) and the cProfile dump (as
+        <name>.prof) if there is one. Returns the path of the report.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / name
+        stem = report_path.stem
+        report = {"phases": [record for record in self.phases if "wall" in record],
+                  "totals": self.totals(),
+                  "memory": self.memory}
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(output_dir / f"{stem}.prof")
+            report["cprofile"] = f"{stem}.prof"
+            self.cprofile.enable()
+        with open(output_dir / f"{stem}.speedscope.json", "w") as f:
+            json.dump(self.speedscope(), f)
+        report["speedscope"] = f"{stem}.speedscope.json"
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=4)
+        console.log(f"Profiling report written to {report_path}")
+        return report_path
+
+
+# The profiler used by phase() and profiled()
+profiler = PhaseProfiler()
+
+
+class phase:
+    """Context manager recording the block it wraps as phase `name`, when profiling is enabled"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if profiler.enabled:
+            profiler.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        if profiler.enabled:
+            profiler.exit(self.name)
+        return False
+
+
+def profiled(name=None):
+    """Decorator recording each call of the function as a phase, named `name` or after the function"""
+    def decorator(function):
+        phase_name = name or function.__name__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with phase(phase_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable_profiling(memory=True, cprofile=False, start=None):
+    profiler.enable(memory, cprofile, start)
+
+
+def disable_profiling():
+    profiler.disable()
+
+
+def write_profile_report(output_dir, name=PROFILE_REPORT_NAME):
+    return profiler.write_report(output_dir, name)
@@ -0,0 +1,86 @@
+"""
+Moo record types made on the fly from configuration dicts.
+
+triggeralgs don't define schemas for the configuration of their
+algorithms, so the trigger generator makes a record type out of each
+configuration dict, with a field of the matching scalar type (4-byte
+int, 4-byte float, string or boolean) for each of its keys:
+
+    conf = record_type(ACTIVITY_CONFIG[j], 'ActivityConf')(ACTIVITY_CONFIG[j])
+
+Types are keyed by their signature, the names and types of their fields
+in order, and made once per process: configurations with the same
+signature share a type, and configurations with different signatures
+get different ones. A type is named after its prefix and a digest of
+its signature (e.g. ActivityConf_3f2a9c1e), which is the same from one
+run to the next.
+"""
+
+import hashlib
+import importlib
+import threading
+
+# Module of the scalar types and, by default, of the record types
+TEMP_TYPES_PATH = 'temptypes'
+
+# Python type -> (scalar type name, make_type arguments). bool comes first, as bools are also ints
+SCALAR_TYPES = {
+    bool: ('temp_boolean', dict(schema='boolean')),
+    int: ('temp_integer', dict(schema='number', dtype='i4')),
+    float: ('temp_float', dict(schema='number', dtype='f4')),
+    str: ('temp_string', dict(schema='string')),
+}
+
+_lock = threading.Lock()
+_scalar_types_made = False
+_record_types = {}
+
+
+def _make_scalar_types():
+    global _scalar_types_made
+    if _scalar_types_made:
+        return
+    import moo.otypes
+    for name, arguments in SCALAR_TYPES.values():
+        moo.otypes.make_type(name=name, path=TEMP_TYPES_PATH, **arguments)
+    _scalar_types_made = True
+
+
+def record_signature(conf_dict):
+    """The ((field name, item type name), ...) of the record type of `conf_dict`"""
+    signature = []
+    for pname, pvalue in conf_dict.items():
+        if type(pvalue) not in SCALAR_TYPES:
+            raise Exception(f'Invalid config argument type: {type(pvalue)}')
+        signature.append((pname, f'{TEMP_TYPES_PATH}.{SCALAR_TYPES[type(pvalue)][0]}'))
+    return tuple(signature)
+
+
+def record_type_name(prefix, signature):
+    return f"{prefix}_{hashlib.sha1(repr(signature).encode()).hexdigest()[:8]}"
+
+
+def record_type(conf_dict, prefix, path=TEMP_TYPES_PATH):
+    """The record type, in module `path`, that `conf_dict` is an instance of. It is made the first time its signature is seen"""
+    signature = record_signature(conf_dict)
+    key = (path, prefix, signature)
+    with _lock:
+        if key not in _record_types:
+            import moo.otypes
+            _make_scalar_types()
+            name = record_type_name(prefix, signature)
+            moo.otypes.make_type(schema='record', fields=[dict(name=pname, item=item) for pname, item in signature], name=name, path=path)
+            _record_types[key] = getattr(importlib.import_module(path), name)
+        return _record_types[key]
+
+
+def make_moo_record(conf_dict, name, path=TEMP_TYPES_PATH):
+    """
+    Make record type `name` in module `path` out of `conf_dict`,
+    replacing any type of that name. Prefer record_type(), which doesn't
+    have one config's type overwrite another's.
+    """
+    import moo.otypes
+    with _lock:
+        _make_scalar_types()
+        moo.otypes.make_type(schema='record', fields=[dict(name=pname, item=item) for pname, item in record_signature(conf_dict)], name=name, path=path)
@@ -0,0 +1,158 @@
+"""
+On-disk cache of evaluated moo schemas.
+
+moo.otypes.load_types evaluates a jsonnet schema file, which is slow,
+then makes the types it describes from the result, which is quick. The
+evaluated schema (a list of plain type descriptions) only changes with
+a release, so it is kept under the user cache directory
+(~/.cache/daqconf/schemas, or $XDG_CACHE_HOME/daqconf/schemas), and
+the types are made straight from it the next time.
+
+Entries are keyed by the resolved path of the schema file, a digest of
+its content and of the content of every file it imports (directly or
+not), the moo model path and DUNEDAQ_SHARE_PATH, so a changed file or a
+different release is compiled again.
+
+The DAQCONF_SCHEMA_CACHE environment variable sets another cache
+directory, or turns the cache off when set to "off".
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+CACHE_ENV = "DAQCONF_SCHEMA_CACHE"
+
+# Bump when the format of the entries changes
+CACHE_FORMAT = 2
+
+# import "file", importstr 'file' and importbin "file" in a jsonnet file
+IMPORT_RE = re.compile(rb"""\bimport(?:str|bin)?\s*(["'])([^"'\n]+)\1""")
+
+# Number of schemas loaded from the cache, and compiled (and cached), in this process
+stats = {"hits": 0, "misses": 0}
+
+
+def cache_dir():
+    """The cache directory, or None if the cache is off"""
+    setting = os.environ.get(CACHE_ENV)
+    if setting == "off":
+        return None
+    if setting:
+        return Path(setting)
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "daqconf" / "schemas"
+
+
+def resolve_schema(schema_file, search_path):
+    """The path of `schema_file` in the first directory of `search_path` that has it, or None"""
+    for directory in search_path:
+        candidate = Path(directory) / schema_file
+        if candidate.is_file():
+            return candidate.resolve()
+    return None
+
+
+def schema_files(schema_path, search_path):
+    """
+    {path: content} of `schema_path` and of every file it imports, directly
+    or not. As jsonnet does, imports are looked up next to the importing
+    file, then in `search_path`. Imports that can't be found are recorded
+    with a content of None, so that the key changes when they appear.
+    """
+    files = {}
+    pending = [Path(schema_path)]
+    while pending:
+        path = pending.pop()
+        if str(path) in files:
+            continue
+        try:
+            content = path.read_bytes()
+        except OSError:
+            files[str(path)] = None
+            continue
+        files[str(path)] = content
+        for _, name in IMPORT_RE.findall(content):
+            name = name.decode(errors="replace")
+            found = resolve_schema(name, [path.parent] + list(search_path))
+            pending.append(found if found is not None else Path(path.parent, name))
+    return files
+
+
+def cache_key(schema_path, search_path):
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"format": CACHE_FORMAT,
+                              "path": str(schema_path),
+                              "search_path": [str(directory) for directory in search_path],
+                              "share_path": os.environ.get("DUNEDAQ_SHARE_PATH", "")}).encode())
+    for path, content in sorted(schema_files(schema_path, search_path).items()):
+        digest.update(f"\0{path}\0{-1 if content is None else len(content)}\0".encode())
+        digest.update(content or b"")
+    return digest.hexdigest()
+
+
+class SchemaCache:
+    """The cache entries in `directory`, one JSON file per evaluated schema"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def get(self, key):
+        """The cached types of `key`, or None. A damaged entry counts as missing"""
+        try:
+            with open(self.directory / f"{key}.json") as f:
+                return json.load(f)["types"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key, schema_file, types):
+        """Store `types`. Failing to (e.g. in a read-only directory) only loses the speedup"""
+        from .json_output import _write_file
+        try:
+            content = json.dumps({"schema_file": schema_file, "types": types}).encode()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Renamed into place, so that concurrent processes never read half an entry
+            _write_file(self.directory / f"{key}.json", content, skip_unchanged=False)
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def clear(self):
+        """Remove every entry, and return how many there were"""
+        removed = 0
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+def load_types(schema_file):
+    """Does what moo.otypes.load_types(schema_file) does, through the cache"""
+    import moo.io
+    import moo.otypes
+
+    directory = cache_dir()
+    search_path = list(moo.io.default_load_path or [])
+    schema_path = resolve_schema(schema_file, search_path) if directory is not None else None
+    if schema_path is None:
+        # Let moo deal with (and report) whatever it is
+        return moo.otypes.load_types(schema_file)
+
+    cache = SchemaCache(directory)
+    key = cache_key(schema_path, search_path)
+    types = cache.get(key)
+    if types is None:
+        stats["misses"] += 1
+        types = moo.io.load(str(schema_path), search_path)
+        cache.put(key, schema_file, types)
+    else:
+        stats["hits"] += 1
+    return [moo.otypes.make_type(**one) for one in types]
+
+
+def clear_schema_cache():
+    """Empty the schema cache, and return the number of entries removed"""
+    directory = cache_dir()
+    if directory is None or not directory.is_dir():
+        return 0
+    return SchemaCache(directory).clear()
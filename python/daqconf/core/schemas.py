@@ -0,0 +1,102 @@
+"""
+Lazy loading of moo schemas.
+
+moo.otypes.load_types evaluates a jsonnet schema and generates its
+types, which is slow enough to add up when every module loads a dozen
+of them at import time. Modules declare the schemas they use instead:
+
+    mlt = lazy_schema('trigger/moduleleveltrigger.jsonnet')
+
+and the schema is only loaded the first time one of its types is used,
+as in mlt.ConfParams(...). The generated module is the one moo would
+give to `import dunedaq.trigger.moduleleveltrigger as mlt`; when a
+schema file generates a module with another name (for instance
+trigger/txbuffer.jsonnet, which generates dunedaq.trigger.txbufferconfig),
+that name is given as `module_name`.
+
+Each schema file is loaded at most once per process, whichever module
+asks for it first, and through the on-disk cache of schemacache.py.
+"""
+
+import importlib
+import threading
+
+from . import schemacache
+
+_lock = threading.RLock()
+_loaded = set()
+_search_path_set = False
+_schemas = {}
+
+
+def schema_module_name(schema_file):
+    """The name of the module moo generates from `schema_file`, e.g. dunedaq.rcif.cmd for rcif/cmd.jsonnet"""
+    return "dunedaq." + schema_file.replace(".jsonnet", "").replace("/", ".")
+
+
+def set_search_path():
+    """Point moo to the DUNE-DAQ schemas, once. Needed before using moo directly, or modules that do (such as appfwk.utils)"""
+    global _search_path_set
+    with _lock:
+        if not _search_path_set:
+            import moo.io
+            from dunedaq.env import get_moo_model_path
+            moo.io.default_load_path = get_moo_model_path()
+            _search_path_set = True
+
+
+def load_schema(schema_file):
+    """Load the types of `schema_file` with moo, unless they already were"""
+    with _lock:
+        if schema_file in _loaded:
+            return
+        set_search_path()
+        schemacache.load_types(schema_file)
+        _loaded.add(schema_file)
+
+
+def loaded_schemas():
+    """The schema files loaded so far"""
+    return sorted(_loaded)
+
+
+def declared_schemas():
+    """The LazySchemas made so far by lazy_schema(), loaded or not"""
+    with _lock:
+        return list(_schemas.values())
+
+
+class LazySchema:
+    """Stands for the module generated from a moo schema, which is loaded on first attribute access"""
+
+    __slots__ = ("schema_file", "module_name", "_module")
+
+    def __init__(self, schema_file, module_name=None):
+        self.schema_file = schema_file
+        self.module_name = module_name or schema_module_name(schema_file)
+        self._module = None
+
+    def load(self):
+        """Load the schema if needed, and return its module"""
+        if self._module is None:
+            load_schema(self.schema_file)
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazySchema {self.module_name} from {self.schema_file}, {state}>"
+
+
+def lazy_schema(schema_file, module_name=None):
+    """The LazySchema of module `module_name` (by default, the one named after `schema_file`) of `schema_file`"""
+    key = (schema_file, module_name or schema_module_name(schema_file))
+    with _lock:
+        if key not in _schemas:
+            _schemas[key] = LazySchema(*key)
+        return _schemas[key]
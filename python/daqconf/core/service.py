@@ -0,0 +1,427 @@
+"""
+A resident process running configuration generators on request.
+
+Generating a configuration starts with importing the DUNE-DAQ Python
+bindings, loading the moo schemas and parsing the input files, which
+the generation service does once and keeps warm between requests:
+
+    daqconf_service serve &
+    daqconf_service run fddaqconf_gen -c config.json -m dromap.json my_conf
+
+runs fddaqconf_gen in the service process, with the arguments, working
+directory and environment of the client, and prints its output, the
+output path and the time spent in each phase (see profiling.py). The
+client starts the service if it isn't running.
+
+The service profiles every request, recording only the times of the
+phases, since memory tracing slows generation down. boot.profile and
+boot.profile_cprofile in the configuration of a request still apply:
+they add memory tracing and cProfile to that request's profiling, and
+the report is written to the output directory, as when the generator
+runs on its own.
+
+Requests are JSON lines sent over a Unix socket, and are run one after
+the other. The socket is in a directory that only the user can access
+($XDG_RUNTIME_DIR/daqconf by default), and each side checks that the
+other runs as the same user before reading or sending anything. Input files are kept in the
+input cache (see inputcache.py), which makes them again when they
+change. If one of the Python modules or moo schemas the service loaded
+changes, or a client runs in another DUNE-DAQ environment, the service
+turns the request down and exits, and the client starts a new service
+and sends the request again.
+
+This module only imports the standard library at the top, to keep the
+client quick to start.
+"""
+
+import io
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SOCKET_ENV = "DAQCONF_SERVICE_SOCKET"
+
+# Variables that tell one DUNE-DAQ environment from another: a service only serves clients with the same ones
+ENVIRONMENT_KEYS = ("DUNEDAQ_SHARE_PATH", "PYTHONPATH", "DBT_AREA_ROOT")
+
+# Seconds without requests after which the service exits
+IDLE_TIMEOUT = 3600
+
+# Seconds a client waits for a service it started
+START_TIMEOUT = 60
+
+
+def default_socket_path():
+    """$DAQCONF_SERVICE_SOCKET, or $XDG_RUNTIME_DIR/daqconf/service.sock"""
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    if not os.environ.get("XDG_RUNTIME_DIR"):
+        # Not a guessable directory in /tmp, which another user could create first
+        raise RuntimeError(f"XDG_RUNTIME_DIR is not set: give the socket of the generation service with ${SOCKET_ENV} or --socket")
+    return Path(os.environ["XDG_RUNTIME_DIR"]) / "daqconf" / "service.sock"
+
+
+def make_socket_directory(socket_path):
+    """
+    Create the directory of `socket_path`, and its missing parents, with
+    mode 0700, and check that it belongs to the user and that no one else
+    can access it
+    """
+    directory = Path(os.path.abspath(socket_path)).parent
+    missing = []
+    while not directory.exists():
+        missing.append(directory)
+        directory = directory.parent
+    for created in reversed(missing):
+        try:
+            os.mkdir(created, 0o700)
+        except FileExistsError:
+            pass
+    for checked in missing + [Path(os.path.abspath(socket_path)).parent]:
+        info = os.lstat(checked)
+        if stat.S_ISLNK(info.st_mode) or not stat.S_ISDIR(info.st_mode):
+            raise RuntimeError(f"{checked} is not a directory")
+        if info.st_uid != os.getuid():
+            raise RuntimeError(f"{checked} belongs to another user")
+        if info.st_mode & 0o077:
+            raise RuntimeError(f"{checked} can be accessed by other users (mode {stat.S_IMODE(info.st_mode):o}, 700 needed)")
+
+
+def peer_uid(sock):
+    """The user id of the process at the other end of Unix socket `sock`, or None where the platform can't tell"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    import struct
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid
+
+
+def environment_key():
+    return {"executable": sys.executable, **{key: os.environ.get(key) for key in ENVIRONMENT_KEYS}}
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _receive(sock):
+    with sock.makefile("rb") as f:
+        line = f.readline()
+    if not line:
+        raise ConnectionError("The connection was closed without a reply")
+    return json.loads(line)
+
+
+########################################################################
+#
+# Service
+#
+########################################################################
+
+def _stdlib_dirs():
+    import sysconfig
+    paths = sysconfig.get_paths()
+    return tuple({paths["stdlib"], paths["platstdlib"]})
+
+
+class SourceWatch:
+    """The files of the loaded Python modules and moo schemas, and whether any of them changed since they were first seen"""
+
+    def __init__(self):
+        self.signatures = {}
+        self._stdlib = _stdlib_dirs()
+
+    def _paths(self):
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            # The standard library doesn't change, installed packages can
+            if path and (not path.startswith(self._stdlib) or "-packages" in path):
+                yield path
+        from . import schemacache, schemas
+        if schemas.loaded_schemas():
+            import moo.io
+            search_path = list(moo.io.default_load_path or [])
+            for schema_file in schemas.loaded_schemas():
+                path = schemacache.resolve_schema(schema_file, search_path)
+                if path is not None:
+                    # With the files it imports
+                    yield from schemacache.schema_files(path, search_path)
+
+    def update(self):
+        """Start watching the files loaded since the last update"""
+        from .inputcache import file_signature
+        for path in self._paths():
+            if path not in self.signatures:
+                self.signatures[path] = file_signature(path)
+
+    def changed(self):
+        """The watched files that changed"""
+        from .inputcache import file_signature
+        return [path for path, signature in self.signatures.items() if file_signature(path) != signature]
+
+
+def find_generator(generator, cwd):
+    """The path of generator script `generator`, given as a path or as a command on the PATH"""
+    path = Path(cwd) / generator
+    if os.sep in generator or path.is_file():
+        if not path.is_file():
+            raise RuntimeError(f"Generator {generator} not found")
+        return path
+    import shutil
+    found = shutil.which(generator)
+    if found is None:
+        raise RuntimeError(f"Generator {generator} not found on the PATH")
+    return Path(found)
+
+
+def run_generator(script, args, cwd, environ):
+    """
+    Run generator script `script` with command line arguments `args` in
+    this process, from directory `cwd`, with environment `environ`.
+    Returns its exit code and what it printed.
+    """
+    import runpy
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+
+    saved = (sys.argv, os.getcwd(), dict(os.environ))
+    log = io.StringIO()
+    try:
+        sys.argv = [str(script)] + list(args)
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        with redirect_stdout(log), redirect_stderr(log):
+            try:
+                runpy.run_path(str(script), run_name="__main__")
+                exit_code = 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        sys.argv = saved[0]
+        os.chdir(saved[1])
+        os.environ.clear()
+        os.environ.update(saved[2])
+    return exit_code, log.getvalue()
+
+
+class GenerationService:
+    """Serves generation requests on Unix socket `socket_path` until stopped, idle for `idle_timeout` seconds, or out of date"""
+
+    def __init__(self, socket_path, idle_timeout=IDLE_TIMEOUT):
+        self.socket_path = Path(socket_path)
+        self.idle_timeout = idle_timeout
+        self.environment = environment_key()
+        self.watch = SourceWatch()
+        self.n_requests = 0
+        self.started = time.time()
+        self.running = False
+
+    def _bind(self):
+        make_socket_directory(self.socket_path)
+        if is_running(self.socket_path):
+            raise RuntimeError(f"A generation service is already listening on {self.socket_path}")
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Requests run code: the socket must only be reachable by the user
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(str(self.socket_path))
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        sock.settimeout(self.idle_timeout)
+        return sock
+
+    def serve(self):
+        from .console import console
+        from .inputcache import input_cache
+
+        input_cache.enabled = True
+        self.watch.update()
+        sock = self._bind()
+        console.log(f"Generation service listening on {self.socket_path}")
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    console.log(f"No request for {self.idle_timeout} s, stopping")
+                    break
+                with conn:
+                    conn.settimeout(None)
+                    if peer_uid(conn) not in (None, os.getuid()):
+                        continue
+                    try:
+                        request = _receive(conn)
+                        _send(conn, self.handle(request))
+                    except (OSError, ValueError) as e:
+                        console.log(f"Bad request: {e}")
+        finally:
+            sock.close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+            input_cache.enabled = False
+
+    def handle(self, request):
+        """The reply to `request`"""
+        command = request.get("command")
+        if command == "status":
+            from .inputcache import input_cache
+            from .schemas import loaded_schemas
+            return {"ok": True, "pid": os.getpid(), "uptime": time.time() - self.started,
+                    "requests": self.n_requests, "schemas": len(loaded_schemas()),
+                    "input_cache": dict(input_cache.stats)}
+        if command == "stop":
+            self.running = False
+            return {"ok": True}
+        if command != "generate":
+            return {"ok": False, "error": f"Unknown command {command}"}
+
+        # Not reusable: let the client start a service that is
+        error = None
+        changed = self.watch.changed()
+        if request.get("environment") != self.environment:
+            error = "The service runs in another environment"
+        elif changed:
+            error = f"{len(changed)} files changed since the service started, e.g. {changed[0]}"
+        if error:
+            from .console import console
+            console.log(f"{error}, stopping")
+            self.running = False
+            return {"ok": False, "restart": True, "error": error}
+
+        return self.generate(request)
+
+    def generate(self, request):
+        from .profiling import profiler, enable_profiling, disable_profiling
+        from .inputcache import input_cache
+
+        cwd = request["cwd"]
+        try:
+            script = find_generator(request["generator"], cwd)
+        except RuntimeError as e:
+            return {"ok": False, "error": str(e)}
+        hits, misses = input_cache.stats["hits"], input_cache.stats["misses"]
+
+        self.n_requests += 1
+        # The generator may add memory tracing and cProfile if its boot.profile asks for them
+        enable_profiling(memory=False)
+        start = time.perf_counter()
+        exit_code, log = run_generator(script, request.get("args", []), cwd, request.get("environ", os.environ))
+        elapsed = time.perf_counter() - start
+        phases = profiler.totals()
+        disable_profiling()
+        self.watch.update()
+
+        output = request.get("output")
+        return {"ok": exit_code == 0,
+                "exit_code": exit_code,
+                "log": log,
+                "output": str(Path(cwd) / output) if output else None,
+                "elapsed": elapsed,
+                "phases": phases,
+                "input_cache": {"hits": input_cache.stats["hits"] - hits,
+                                "misses": input_cache.stats["misses"] - misses}}
+
+
+########################################################################
+#
+# Client
+#
+########################################################################
+
+def request(message, socket_path=None, timeout=None):
+    """
+    Send `message` to the service and return its reply. Raises OSError
+    if no service is listening, and PermissionError if the one listening
+    runs as another user
+    """
+    socket_path = socket_path or default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        # The request holds the environment of the client: only for a service of the same user
+        if peer_uid(sock) not in (None, os.getuid()):
+            raise PermissionError(f"The service listening on {socket_path} runs as another user")
+        _send(sock, message)
+        return _receive(sock)
+
+
+def is_running(socket_path=None):
+    try:
+        return request({"command": "status"}, socket_path, timeout=5)["ok"]
+    except OSError:
+        return False
+
+
+def start_service(socket_path=None, idle_timeout=IDLE_TIMEOUT):
+    """Start a service in the background, with the environment of this process, and wait until it listens"""
+    socket_path = Path(socket_path or default_socket_path())
+    make_socket_directory(socket_path)
+    log_path = socket_path.with_suffix(".log")
+    with open(log_path, "a") as log:
+        subprocess.Popen([sys.executable, "-m", "daqconf.core.service", str(socket_path), str(idle_timeout)],
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if is_running(socket_path):
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f"The generation service didn't start, see {log_path}")
+
+
+def _wait_for_exit(socket_path):
+    """Wait for a service that is stopping to close its socket"""
+    deadline = time.monotonic() + START_TIMEOUT
+    while socket_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def generate(generator, args, output=None, socket_path=None, start=True):
+    """
+    Have the service run `generator` with command line arguments `args`
+    from the current directory and environment, starting the service
+    if needed (and `start`). `output` is the output directory the reply
+    reports, by default the last of `args` when it isn't an option.
+    """
+    socket_path = Path(socket_path or default_socket_path())
+    if output is None and args and not args[-1].startswith("-"):
+        output = args[-1]
+    message = {"command": "generate", "generator": generator, "args": list(args), "output": output,
+               "cwd": os.getcwd(), "environ": dict(os.environ), "environment": environment_key()}
+    for _ in range(2):
+        try:
+            reply = request(message, socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not start:
+                raise RuntimeError(f"No generation service is listening on {socket_path}")
+            start_service(socket_path)
+            reply = request(message, socket_path)
+        if not reply.get("restart"):
+            return reply
+        _wait_for_exit(socket_path)
+    return reply
+
+
+if __name__ == "__main__":
+    GenerationService(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else IDLE_TIMEOUT).serve()
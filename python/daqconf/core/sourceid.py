@@ -1,16 +1,11 @@
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
-from rich.console import Console
 from enum import Enum
 from collections import namedtuple, defaultdict
 
 from .console import console
+from .profiling import profiled
 
 
 from daqdataformats import SourceID
-from detchannelmaps import *
 from detdataformats import DetID
 
 TAID = namedtuple('TAID', ['detector', 'crate'])
@@ -103,6 +98,7 @@ class SourceIDBroker:
     #     #         if self.debug: console.log(f"Adding Detector_Readout SourceID {sid} for FW TP OUT ID {tp_out_id}")
     #     #         self.register_source_id("Detector_Readout", sid, tp_out_id)
 
+    @profiled()
     def register_readout_source_ids(self, dro_streams):
         if self.debug: console.log(f"Registering {len(dro_streams)} Detector-Readout Source IDs ")
         for stream in dro_streams:
@@ -1,5 +1,6 @@
-from daqconf.core.conf_utils import Direction
-import networkx as nx
+from daqconf.core.conf_utils import Direction, update_app_connections
+from daqconf.core.ports import PortAllocator, normalise_host
+from collections import defaultdict
 
 class System:
     """
@@ -13,16 +14,21 @@ class System:
     specify this, and leave the mapping to be automatically generated.
 
     The same is true for application start order.
+
+    Network ports are assigned per host by `port_allocator`, from the
+    range (first_port, last_port], based on the connection uid.
     """
 
     def __init__(self, apps=None, connections=None, app_start_order=None,
-                 first_port=12345, queues=None):
+                 first_port=12345, queues=None, last_port=32767):
         self.apps=apps if apps else dict()
         self.connections = connections if connections else dict()
         self.queues = queues if queues else dict()
         self.app_start_order = app_start_order
-        self._next_port = first_port
+        self.port_allocator = PortAllocator(first_port + 1, last_port)
         self.digraph = None
+        # Filled in by make_system_connections
+        self.connection_record = None
 
     def __rich_repr__(self):
         yield "apps", self.apps
@@ -31,6 +37,20 @@ class System:
         yield "app_connections", self.app_connections
         yield "app_start_order", self.app_start_order
 
+    def update_app(self, name, app):
+        """Add the app `name`, or replace it with `app`. If the
+        connections of the system have already been made, only the ones
+        involving this app are re-resolved"""
+        self.update_apps({name: app})
+
+    def update_apps(self, apps):
+        """Add or replace several apps at once, for changes that are
+        only consistent once all of them are in place (eg a new readout
+        app and the dataflow apps that request data from it)"""
+        self.apps.update(apps)
+        if self.connection_record is not None:
+            update_app_connections(self, list(apps.keys()))
+
     def get_fragment_producers(self):
         """Get a list of all the fragment producers in the system"""
         all_producers = []
@@ -45,33 +65,62 @@ class System:
         return all_producers
 
     def make_digraph(self, for_toposort=False):
+        import networkx as nx
         deps = nx.MultiDiGraph()
 
         for app_name in self.apps.keys():
             deps.add_node(app_name)
 
+        # Join OUT and IN endpoints on their external name
+        in_endpoints = defaultdict(list)
+        for to_app_n, to_app in self.apps.items():
+            for to_ep in to_app.modulegraph.endpoints:
+                if to_ep.direction == Direction.IN:
+                    in_endpoints[to_ep.external_name].append((to_app_n, to_ep))
+
         for from_app_n, from_app in self.apps.items():
             for from_ep in from_app.modulegraph.endpoints:
                 if from_ep.direction == Direction.OUT:
-                    for to_app_n, to_app in self.apps.items():
-                        for to_ep in to_app.modulegraph.endpoints:
-                            if to_ep.direction == Direction.IN:
-                                if from_ep.external_name == to_ep.external_name:
-                                    color="red"
-                                    if from_ep.toposort or to_ep.toposort:
-                                        color="blue"
-                                    elif for_toposort:
-                                        continue
-                                    deps.add_edge(from_app_n, to_app_n, label=to_ep.external_name, color=color)
-
+                    for to_app_n, to_ep in in_endpoints.get(from_ep.external_name, []):
+                        color="red"
+                        if from_ep.toposort or to_ep.toposort:
+                            color="blue"
+                        elif for_toposort:
+                            continue
+                        deps.add_edge(from_app_n, to_app_n, label=to_ep.external_name, color=color)
 
         return deps
 
 
     def export(self, filename):
         self.digraph = self.make_digraph()
+        import networkx as nx
         nx.drawing.nx_pydot.write_dot(self.digraph, filename)
 
     def next_unassigned_port(self):
-        self._next_port += 1
-        return self._next_port
+        """A port that is free on every host, handed out in increasing order"""
+        return self.port_allocator.next_free_port()
+
+    def port_host(self, app, use_k8s=False):
+        """The host whose ports `app` uses (see normalise_host). With k8s
+        each app gets its own address, so ports are only unique per app"""
+        return app if use_k8s else normalise_host(self.apps[app].host)
+
+    def assign_port(self, app, uid, use_k8s=False):
+        """The port for connection `uid` served by `app`"""
+        return self.port_allocator.assign(self.port_host(app, use_k8s), uid)
+
+    def assign_ports(self, requests, use_k8s=False, release=()):
+        """Assign ports to the (app, uid) pairs `requests` together (see
+        PortAllocator.assign_all). The connections in `release` first
+        lose their ports on the hosts they are not requested on"""
+        requests = [(self.port_host(app, use_k8s), uid) for app, uid in requests]
+        hosts = defaultdict(set)
+        for host, uid in requests:
+            hosts[uid].add(host)
+        for uid in release:
+            self.port_allocator.release(uid, keep=hosts[uid])
+        self.port_allocator.assign_all(requests)
+
+    def export_ports(self, filename):
+        self.port_allocator.export(filename)
@@ -8,16 +8,10 @@ Open questions:
 - General vs specific validation (ETH, FLX) - delegate to spedific classes?
 - Streams mapping to readout unit applications, consistency checks: delegate to a dedicated class?
 """
-# Set moo schema search path
-from dunedaq.env import get_moo_model_path
-import moo.io
-moo.io.default_load_path = get_moo_model_path()
+from daqconf.core.schemas import lazy_schema
 
-moo.otypes.load_types('daqconf/detreadoutmap.jsonnet')
-moo.otypes.load_types('hdf5libs/hdf5rawdatafile.jsonnet')
-
-import dunedaq.daqconf.detreadoutmap as dromap
-import dunedaq.hdf5libs.hdf5rawdatafile as hdf5rdf
+dromap = lazy_schema('daqconf/detreadoutmap.jsonnet')
+hdf5rdf = lazy_schema('hdf5libs/hdf5rawdatafile.jsonnet')
 
 import collections
 import json
@@ -30,8 +24,10 @@ from collections import namedtuple, defaultdict
 
 import sys
 
-from rich import print
-from rich.table import Table
+
+from daqconf.core.console import console
+from daqconf.core.inputcache import input_cache, file_signature, copy_pod, ValidationCache
+from daqconf.core.ostcheck import compile_checker, UnsupportedSchema
 
 
 ### Move to utility module
@@ -48,16 +44,27 @@ def group_by_key(coll, key):
 ### HORROR!
 thismodule = sys.modules[__name__]
 
-# Turn moo object into named tuples
-for c in [
-    hdf5rdf.GeoID,
-    dromap.DROStreamEntry,
-    dromap.EthStreamParameters,
-    dromap.FelixStreamParameters,
-]: 
-    c_ost = c.__dict__['_ost']
-    c_name = c_ost['name']
-    setattr(thismodule, c_name, namedtuple(c_name, [f['name'] for f in c_ost['fields']]))
+# Turn moo object into named tuples, the first time one of them is needed
+_TUPLE_TYPES = {
+    'GeoID': (hdf5rdf, 'GeoID'),
+    'DROStreamEntry': (dromap, 'DROStreamEntry'),
+    'EthStreamParameters': (dromap, 'EthStreamParameters'),
+    'FelixStreamParameters': (dromap, 'FelixStreamParameters'),
+}
+
+def _make_tuple_types():
+    if 'GeoID' in thismodule.__dict__:
+        return
+    for schema, type_name in _TUPLE_TYPES.values():
+        c_ost = getattr(schema, type_name).__dict__['_ost']
+        c_name = c_ost['name']
+        setattr(thismodule, c_name, namedtuple(c_name, [f['name'] for f in c_ost['fields']]))
+
+def __getattr__(name):
+    if name in _TUPLE_TYPES:
+        _make_tuple_types()
+        return thismodule.__dict__[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ReadoutUnitDescriptor:
@@ -92,50 +99,57 @@ StreamKindTraits = namedtuple("StreamKindTraits", [
 class DetReadoutMapService:
     """Detector - Readout Link mapping"""
 
-    _traits_map = {
-        'flx': StreamKindTraits(FelixStreamParameters, dromap.FelixStreamParameters, 'host', 'card'),
-        'eth': StreamKindTraits(EthStreamParameters, dromap.EthStreamParameters, 'rx_host', 'rx_iface'),
-    }
+    # Built by _traits(), as it needs the schemas
+    _traits_map = None
+
+    # Map files that passed _check_json
+    _validation_cache = ValidationCache()
+
+    # Built by _compiled_checkers(), as they need the schemas. False if they can't be compiled
+    _checkers = None
+
+    @classmethod
+    def _traits(cls, kind: str) -> StreamKindTraits:
+        if cls._traits_map is None:
+            _make_tuple_types()
+            cls._traits_map = {
+                'flx': StreamKindTraits(FelixStreamParameters, dromap.FelixStreamParameters, 'host', 'card'),
+                'eth': StreamKindTraits(EthStreamParameters, dromap.EthStreamParameters, 'rx_host', 'rx_iface'),
+            }
+        return cls._traits_map[kind]
 
     @classmethod
     def _get_host_label(cls, kind: str) -> str:
-        return cls._traits_map[kind].host_label
+        return cls._traits(kind).host_label
 
     @classmethod
     def _get_iflabel(cls, kind: str) -> str:
-        return cls._traits_map[kind].iflable
+        return cls._traits(kind).iflable
     
     @classmethod
     def _get_moo_class(cls, kind: str) -> str:
-        return cls._traits_map[kind].moo_class
+        return cls._traits(kind).moo_class
     
 
     @classmethod
     def _get_tuple_class(cls, kind: str) -> str:
-        return cls._traits_map[kind].tuple_class
+        return cls._traits(kind).tuple_class
     
 
     def __init__(self):
+        _make_tuple_types()
         self._map = {}
+        # (map items, as_json() result) of the last as_json() call
+        self._json_cache = None
 
 
     def load(self, map_path: str, merge: bool = False, offset: int = 0) -> None:
         
         map_fp = pathlib.Path(map_path)
 
-        # Opening JSON file
-        with open(map_fp) as f:
-        
-            # returns JSON object as 
-            # a dictionary
-            data = json.load(f)
-
-        self._validate_json(data)
-        
+        streams = input_cache.get(map_fp, 'dromap', self._load_streams)
 
-        streams = self._build_streams(data)
-
-        print(f"Offset = {offset}")
+        console.print(f"Offset = {offset}")
         if offset:
             streams = [s._replace(src_id = s.src_id + offset) for s in streams]
 
@@ -145,7 +159,7 @@ class DetReadoutMapService:
             shifted_streams = []
 
             if src_id_max > new_src_id_min:
-                print(f"WARNING: source id overlap detected, loaded source ids will be shifted by {src_id_max - new_src_id_min}")
+                console.print(f"WARNING: source id overlap detected, loaded source ids will be shifted by {src_id_max - new_src_id_min}")
                 for s in streams:
                     shifted_streams.append(s._replace(src_id = s.src_id - new_src_id_min + src_id_max))
                 streams = shifted_streams
@@ -159,7 +173,74 @@ class DetReadoutMapService:
         self._map = {s.src_id:s for s in streams}
     
     @classmethod
-    def _validate_json(cls, data) -> None:
+    def _load_streams(cls, map_fp) -> list:
+        """The streams of map file map_fp, validated"""
+
+        signature = file_signature(map_fp)
+
+        # Opening JSON file
+        with open(map_fp) as f:
+        
+            # returns JSON object as 
+            # a dictionary
+            data = json.load(f)
+
+        # Not again for a file that didn't change since it passed
+        cls._validation_cache.validate(map_fp, signature, cls._check_json, data)
+
+        return cls._build_streams(data)
+
+    @classmethod
+    def _compiled_checkers(cls):
+        """The plain-data checkers of a stream entry and of the parameters of each kind, or None if the schema can't be compiled"""
+        if cls._checkers is None:
+            try:
+                cls._traits('eth')
+                cls._checkers = (compile_checker(dromap.DROStreamEntry),
+                                 {kind: compile_checker(traits.moo_class) for kind, traits in cls._traits_map.items()})
+            except UnsupportedSchema:
+                cls._checkers = False
+        return cls._checkers or None
+
+    @classmethod
+    def _check_json(cls, data) -> None:
+        """
+        Check the entries of map data against the schema, with checkers
+        compiled from it. The checkers only pass entries that moo accepts,
+        and entries they flag are checked again with moo, which has the
+        last word: the data is accepted or rejected as by moo alone. When
+        entries are invalid, each one is logged and the moo exception of
+        the first is raised, as moo would have.
+        """
+        checkers = cls._compiled_checkers()
+        if checkers is None or not isinstance(data, list):
+            cls._check_json_with_moo(data)
+            return
+        check_entry, check_parameters = checkers
+
+        first_error = None
+        for index, entry in enumerate(data):
+            problems = check_entry(entry)
+            if not problems:
+                check = check_parameters.get(entry.get('kind'))
+                # Kinds without a checker, or entries without parameters, are left to moo
+                problems = check(entry['parameters'], 'parameters') if check and 'parameters' in entry else ['unchecked']
+            if not problems:
+                continue
+            try:
+                cls._check_json_with_moo([entry])
+            except Exception as e:
+                src_id = entry.get('src_id') if isinstance(entry, dict) else None
+                console.log(f"Invalid detector readout map entry {index} (src_id {src_id}): {e}")
+                if first_error is None:
+                    first_error = e
+
+        if first_error is not None:
+            raise first_error
+
+    @classmethod
+    def _check_json_with_moo(cls, data) -> None:
+        """Check map data by making it into moo objects"""
 
         # Make a copy to work locally
         data = copy.deepcopy(data)
@@ -389,6 +470,7 @@ class DetReadoutMapService:
 
     def as_table(self):
         """Export the table as a rich table"""
+        from rich.table import Table
         m = self._map
 
         t = Table()
@@ -424,6 +506,11 @@ class DetReadoutMapService:
         """Convert the map into a moo-json object"""
         m = self._map
 
+        # The streams are immutable tuples, so the map is unchanged as long as its items are
+        key = tuple(m.items())
+        if self._json_cache is not None and self._json_cache[0] == key:
+            return copy_pod(self._json_cache[1])
+
         dro_seq = []
         for _,en in m.items():
 
@@ -438,7 +525,8 @@ class DetReadoutMapService:
             dro_seq.append(dro_en)
 
         dlmap = dromap.DROStreamMap(dro_seq)
-        return dlmap.pod()
+        self._json_cache = (key, dlmap.pod())
+        return copy_pod(self._json_cache[1])
     
 
     def remove_srcid(self, srcid):